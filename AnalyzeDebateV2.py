@@ -4,12 +4,19 @@
 # - Reuse transcript / no-gpt supported
 # - Friendly logs for the Streamlit GUI progress parser
 
-import os, sys, time, subprocess, argparse, pathlib, json
+import os, sys, time, subprocess, argparse, pathlib, json, hashlib
 import importlib, importlib.metadata
-from typing import Optional
-import requests
+from collections import OrderedDict
+from functools import lru_cache
+from typing import List, Optional
 from openai import OpenAI
 
+import aai_client
+import manifest as run_manifest
+import stt_cache
+import stt_journal
+import stt_shards
+
 # ─── tweakables ─────────────────────────────────────────────────────
 STYLE2_MODEL   = {"lay": "small", "flay": "small", "tech": "small", "prog": "small"}  # kept only for display parity
 PROMPT_FILE    = {"lay":  "lay_judge_prompt.txt",
@@ -20,7 +27,13 @@ PROMPT_FILE    = {"lay":  "lay_judge_prompt.txt",
 # Align default with GUI’s OpenRouter catalog; OpenAI default can stay generic
 DEFAULT_OR_MODEL  = "openai/gpt-4o-2024-11-20"   # for provider=openrouter
 DEFAULT_OAI_MODEL = "gpt-4o"                     # for provider=openai
-AAI_POLL_SECS     = 3.0                          # polling cadence for transcript job
+AAI_TRANSCRIPT_OPTS = {
+    "speaker_labels": False,         # diarization not required for debate judging
+    "punctuate": True,
+    "format_text": True,
+    "disfluencies": True,            # keeps ums/uhs if present
+    # You can add "language_code": "en" to hard-pin, but AAI auto-detects well
+}
 # ────────────────────────────────────────────────────────────────────
 
 SCRIPT_DIR = pathlib.Path(__file__).parent.resolve()
@@ -67,13 +80,19 @@ def _write_run_manifest(work_dir: pathlib.Path, payload: dict, start_time: float
         "git": _git_state(),
     }
     (work_dir / "run.json").write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    run_manifest.record(work_dir / "run.json", "finalize")
     print("🧾  wrote run.json", flush=True)
 
+@lru_cache(maxsize=16)
+def _read_template(path: str, mtime_ns: int) -> str:
+    # keyed on mtime so long-lived workers (workers.py) still pick up edits
+    return pathlib.Path(path).read_text(encoding="utf-8")
+
 def load_prompt(style: str, topic: str, first: str, transcript: str) -> str:
     prompt_path = SCRIPT_DIR / PROMPT_FILE[style]
     if not prompt_path.exists():
         sys.exit(f"❌ prompt file missing: {prompt_path}")
-    template = prompt_path.read_text(encoding="utf-8")
+    template = _read_template(str(prompt_path), prompt_path.stat().st_mtime_ns)
     return (template
             .replace("[insert topic here]", topic)
             .replace("[insert team name here]", first)
@@ -102,87 +121,106 @@ def _is_gpt5(normalized_model: str) -> bool:
 
 def aai_upload_file(file_path: pathlib.Path, api_key: str) -> str:
     """
-    Streams the local file to AssemblyAI's /upload and returns the 'upload_url'.
+    Encodes the file for upload (AAI_UPLOAD_CODEC, FLAC by default), streams it
+    to AssemblyAI's /upload and returns the 'upload_url'.
     """
-    url = "https://api.assemblyai.com/v2/upload"
-    headers = {"authorization": api_key}
-    chunk_size = 5 * 1024 * 1024  # 5 MB
-
     print("📤 Uploading to AssemblyAI…", flush=True)
-    def _read_chunks():
-        with open(file_path, "rb") as f:
-            while True:
-                chunk = f.read(chunk_size)
-                if not chunk:
-                    break
-                yield chunk
-
-    r = requests.post(url, headers=headers, data=_read_chunks())
-    if r.status_code != 200:
-        raise SystemExit(f"❌ Upload failed: {r.status_code} {r.text[:300]}")
-    upload_url = r.json().get("upload_url")
-    if not upload_url:
-        raise SystemExit("❌ Upload response missing upload_url.")
-    return upload_url
+    try:
+        return aai_client.client(api_key).upload_encoded(file_path)
+    except aai_client.AAIError as e:
+        raise SystemExit(f"❌ Upload failed: {e.status} {e.body[:300]}")
 
 def aai_request_transcription(upload_url: str, api_key: str) -> str:
     """
-    Creates a transcription job and returns the transcript id.
+    Creates a transcription job and returns the transcript id. AAIError is left
+    to the caller, so stt_journal can replace a refused earlier upload.
     """
-    url = "https://api.assemblyai.com/v2/transcript"
-    headers = {"authorization": api_key, "content-type": "application/json"}
-    payload = {
-        "audio_url": upload_url,
-        "speaker_labels": False,         # diarization not required for debate judging
-        "punctuate": True,
-        "format_text": True,
-        "disfluencies": True,            # keeps ums/uhs if present
-        # You can add "language_code": "en" to hard-pin, but AAI auto-detects well
-    }
-    r = requests.post(url, headers=headers, json=payload)
-    if r.status_code not in (200, 201):
-        raise SystemExit(f"❌ Transcription create failed: {r.status_code} {r.text[:300]}")
-    tid = r.json().get("id")
-    if not tid:
-        raise SystemExit("❌ No transcript id returned by AssemblyAI.")
+    tid = aai_client.client(api_key).create_transcript(upload_url, **AAI_TRANSCRIPT_OPTS)
     print("⏳ Queued at AssemblyAI…", flush=True)
     return tid
 
-def aai_poll_transcript(transcript_id: str, api_key: str) -> dict:
+def aai_poll_transcript(transcript_id: str, api_key: str, audio_sec: Optional[float] = None) -> dict:
     """
-    Polls transcript status until 'completed' or 'error'. Returns the JSON.
+    Waits for 'completed' or 'error' (adaptive polling or webhook, see aai_client). Returns the JSON.
     """
-    headers = {"authorization": api_key}
-    url = f"https://api.assemblyai.com/v2/transcript/{transcript_id}"
-    while True:
-        r = requests.get(url, headers=headers)
-        if r.status_code != 200:
-            raise SystemExit(f"❌ Poll failed: {r.status_code} {r.text[:300]}")
-        js = r.json()
-        status = js.get("status")
-        print(f"Transcription status: {status}", flush=True)
-        if status == "completed":
-            return js
-        if status == "error":
-            raise SystemExit(f"❌ AssemblyAI error: {js.get('error')}")
-        time.sleep(AAI_POLL_SECS)
-
-def aai_transcribe_to_file(audio_path: pathlib.Path, api_key: str, work_dir: pathlib.Path) -> str:
+    try:
+        js = aai_client.client(api_key).wait(
+            transcript_id, audio_sec,
+            on_status=lambda status: print(f"Transcription status: {status}", flush=True))
+    except aai_client.AAIError as e:
+        raise SystemExit(f"❌ Poll failed: {e.status} {e.body[:300]}")
+    if js.get("status") == "error":
+        raise SystemExit(f"❌ AssemblyAI error: {js.get('error')}")
+    return js
+
+def aai_transcribe_to_file(audio_path: pathlib.Path, api_key: Optional[str], work_dir: pathlib.Path,
+                           audio_sha: Optional[str] = None, shards: int = 1) -> str:
     """
     Full AAI pipeline: upload → create job → poll → write transcript.txt
+    Consults stt_cache first, so the same audio is only transcribed once, and
+    stt_journal, so a job interrupted mid-way resumes its AssemblyAI transcript.
+    With shards > 1, long recordings are split at silences and the pieces
+    transcribed concurrently (stt_shards).
     Returns the transcript text.
     """
     t0 = time.time()
-    upload_url = aai_upload_file(audio_path, api_key)
-    tid = aai_request_transcription(upload_url, api_key)
-    js = aai_poll_transcript(tid, api_key)
+    audio_sec = aai_client.audio_seconds(audio_path)
+    shards = stt_shards.count(audio_sec or 0, shards)
+    params = {"provider": "assemblyai", **AAI_TRANSCRIPT_OPTS}
+    if shards > 1:
+        params["shards"] = shards          # stitched text can differ slightly from one pass
+    if audio_sha is None:
+        audio_sha = stt_cache.file_sha256(audio_path)
+    cache_key = stt_cache.key_for(audio_path, params, audio_sha)
+    js = stt_cache.get(cache_key)
+    if js is not None:
+        print("♻️  Reusing cached AssemblyAI transcript", flush=True)
+    else:
+        if not api_key:
+            raise SystemExit("❌ AssemblyAI key required (pass --aai-key or set ASSEMBLYAI_API_KEY).")
+        job_key = cache_key or stt_cache.content_key(audio_path, params, audio_sha)
+
+        def transcribe_one(path: pathlib.Path, key: str, seconds: Optional[float]) -> dict:
+            try:
+                return stt_journal.transcribe(
+                    aai_client.client(api_key), key,
+                    upload=lambda: aai_upload_file(path, api_key),
+                    create=lambda url: aai_request_transcription(url, api_key),
+                    wait=lambda tid: aai_poll_transcript(tid, api_key, seconds),
+                )
+            except aai_client.AAIError as e:
+                raise SystemExit(f"❌ Transcription create failed: {e.status} {e.body[:300]}")
+
+        if shards > 1:
+            js = stt_shards.transcribe(
+                audio_path, shards,
+                lambda sh, wav: transcribe_one(wav, f"{job_key}:shard{sh.index}", sh.end - sh.start))
+        else:
+            js = transcribe_one(audio_path, job_key, audio_sec)
+        stt_cache.put(cache_key, js, audio_sha)
     text = js.get("text") or ""
     (work_dir / "transcript.txt").write_text(text, encoding="utf-8")
+    run_manifest.record(work_dir / "transcript.txt", "transcribe")
     print("📝  wrote transcript.txt", flush=True)
     print(f"⏱️  Completed transcription in {round(time.time() - t0, 1)}s", flush=True)
     return text
 
-# ───────────────────────── LLM judging (unchanged) ─────────────────────────
+# ───────────────────────── LLM judging ─────────────────────────
+
+_llm_clients: "OrderedDict[tuple, OpenAI]" = OrderedDict()
+LLM_CLIENTS_MAX = 8
+
+def _llm_client(api_key: str, base_url: Optional[str]) -> OpenAI:
+    # reused across runs inside a warm worker; keeps the HTTP pool alive.
+    # Keyed by a hash so the user's key isn't kept as a cache key.
+    k = (hashlib.sha256(api_key.encode("utf-8")).hexdigest(), base_url)
+    client = _llm_clients.pop(k, None)
+    if client is None:
+        client = OpenAI(api_key=api_key, base_url=base_url) if base_url else OpenAI(api_key=api_key)
+    _llm_clients[k] = client
+    while len(_llm_clients) > LLM_CLIENTS_MAX:
+        _llm_clients.popitem(last=False)[1].close()
+    return client
 
 def gpt_judge(prompt: str, work_dir: pathlib.Path, provider: str, model_name: str) -> dict:
     t0 = time.time()
@@ -191,14 +229,14 @@ def gpt_judge(prompt: str, work_dir: pathlib.Path, provider: str, model_name: st
         key = os.getenv("OPENROUTER_API_KEY")
         if not key:
             raise SystemExit("❌ OPENROUTER_API_KEY missing. Provide it in the GUI or env.")
-        client = OpenAI(api_key=key, base_url="https://openrouter.ai/api/v1")
+        client = _llm_client(key, "https://openrouter.ai/api/v1")
         model = model_name  # e.g., "openai/gpt-4o-2024-11-20"
         provider_label = f"OpenRouter:{model}"
     else:
         key = os.getenv("OPENAI_API_KEY")
         if not key:
             raise SystemExit("❌ OPENAI_API_KEY missing. Provide it in the GUI or env.")
-        client = OpenAI(api_key=key)  # OpenAI default base_url
+        client = _llm_client(key, None)  # OpenAI default base_url
         model = model_name           # e.g., "gpt-4o"
         provider_label = f"OpenAI:{model}"
 
@@ -211,6 +249,7 @@ def gpt_judge(prompt: str, work_dir: pathlib.Path, provider: str, model_name: st
             temperature=0, max_tokens=3500)
         out_text = rsp.choices[0].message.content or ""
         (work_dir / "judging_feedback.txt").write_text(out_text, encoding="utf-8")
+        run_manifest.record(work_dir / "judging_feedback.txt", "judge")
         print("📄  wrote judging_feedback.txt", flush=True)
 
         usage = getattr(rsp, "usage", None)
@@ -223,6 +262,7 @@ def gpt_judge(prompt: str, work_dir: pathlib.Path, provider: str, model_name: st
         }
         jf_json = {"provider": provider, "model": model_name, "feedback": out_text, "usage": meta, "error": None}
         (work_dir / "judge_feedback.json").write_text(json.dumps(jf_json, indent=2), encoding="utf-8")
+        run_manifest.record(work_dir / "judge_feedback.json", "judge")
         print("📊  wrote judge_feedback.json", flush=True)
         print(f"⏱️  Completed LLM analysis in {round(time.time() - t0, 1)}s", flush=True)
         return jf_json
@@ -238,18 +278,19 @@ def gpt_judge(prompt: str, work_dir: pathlib.Path, provider: str, model_name: st
         err_json = {"provider": provider, "model": model_name, "feedback": "", "usage": None,
                     "error": {"message": msg, "hint": hint}}
         (work_dir / "judge_feedback.json").write_text(json.dumps(err_json, indent=2), encoding="utf-8")
+        run_manifest.record(work_dir / "judge_feedback.json", "judge")
         print(f"❌ LLM error: {msg}\n   Hint: {hint}", flush=True)
         raise
 
 # ───────────────────────── main ─────────────────────────
 
-def main():
+def main(argv: Optional[List[str]] = None):
     ap = argparse.ArgumentParser(description="Debate judging pipeline (AssemblyAI + LLM).")
     ap.add_argument("--audio", required=True, help="Path to .m4a/.wav (or any common audio file)")
     ap.add_argument("--topic", required=True, help="Debate topic")
     ap.add_argument("--first", required=True, choices=["Aff", "Neg"], help="Who speaks first")
     ap.add_argument("--style", required=True, choices=list(STYLE2_MODEL.keys()), help="Judging style")
-    ap.add_argument("--aai-key", help="AssemblyAI API key (required unless --reuse-transcript).")
+    ap.add_argument("--aai-key", help="AssemblyAI API key (required unless the transcript is reused or cached).")
     ap.add_argument("--work-dir", default=".", help="Output directory")
     ap.add_argument("--provider", choices=["openrouter","openai"], default="openrouter",
                     help="LLM provider for judging")
@@ -257,7 +298,11 @@ def main():
     ap.add_argument("--no-gpt", action="store_true", help="Skip LLM judging (transcript-only)")
     ap.add_argument("--reuse-transcript", action="store_true",
                     help="Reuse existing transcript.txt in work dir (skip transcription)")
-    args = ap.parse_args()
+    ap.add_argument("--audio-sha256", default=None,
+                    help="Precomputed SHA-256 of --audio (transcript cache key; hashed if omitted)")
+    ap.add_argument("--shards", type=int, default=1,
+                    help="Split long recordings at silences into up to N pieces transcribed concurrently")
+    args = ap.parse_args(argv)
 
     work_dir = pathlib.Path(args.work_dir).expanduser().resolve()
     work_dir.mkdir(parents=True, exist_ok=True)
@@ -268,6 +313,7 @@ def main():
         if f.exists():
             try: f.unlink()
             except Exception: pass
+            else: run_manifest.forget(f, "cleanup")
 
     style = args.style.lower()
     if style not in STYLE2_MODEL:
@@ -278,9 +324,7 @@ def main():
     need_transcribe = True
     if args.reuse_transcript and transcript_path.exists() and transcript_path.stat().st_size > 0:
         need_transcribe = False
-    aai_key = args.aai_key or os.getenv("ASSEMBLYAI_API_KEY")
-    if need_transcribe and not aai_key:
-        sys.exit("❌ AssemblyAI key required (pass --aai-key or set ASSEMBLYAI_API_KEY).")
+    aai_key = args.aai_key or os.getenv("ASSEMBLYAI_API_KEY")   # checked on an stt_cache miss
 
     # Provider/model normalization
     model_name = _normalize_model(args.provider, args.model)
@@ -306,7 +350,7 @@ def main():
             audio_path = pathlib.Path(args.audio).expanduser().resolve()
             if not audio_path.exists():
                 raise SystemExit(f"❌ Audio file not found: {audio_path}")
-            transcript = aai_transcribe_to_file(audio_path, aai_key, work_dir)
+            transcript = aai_transcribe_to_file(audio_path, aai_key, work_dir, args.audio_sha256, args.shards)
         else:
             print("🔁  Reusing existing transcript.txt", flush=True)
             transcript = transcript_path.read_text(encoding="utf-8")
@@ -321,6 +365,7 @@ def main():
                 print("🧩  Added GPT-5 directive: 'Think Deeply.'", flush=True)
 
             (work_dir / "prompt_used.txt").write_text(prompt, encoding="utf-8")
+            run_manifest.record(work_dir / "prompt_used.txt", "prompt")
             print("🧾  wrote prompt_used.txt", flush=True)
 
             judge_json = gpt_judge(prompt, work_dir, args.provider, model_name)
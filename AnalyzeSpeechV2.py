@@ -23,9 +23,11 @@ import argparse, json, math, subprocess
 from collections import defaultdict
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 
 import numpy as np, librosa
+import manifest
+from RunDiarizationAAI import is_16k_mono_wav
 try:
     import parselmouth      # optional
 except Exception:
@@ -40,7 +42,8 @@ HOP_LENGTH    = 512
 # Helper — run diarization when JSON not supplied, testing comment
 # ───────────────────────────────────────────────────────────────────────────────
 def run_diarization(audio: Path, work_dir: Path,
-                    aai_key: str, max_speakers: int) -> Path:
+                    aai_key: str, max_speakers: int,
+                    audio_sha: Optional[str] = None) -> Path:
     """
     Calls an external AssemblyAI diarization helper and returns the JSON path.
     Adjust the command below if your helper script differs.
@@ -54,6 +57,8 @@ def run_diarization(audio: Path, work_dir: Path,
     ]
     if aai_key:
         cmd += ["--aai-key", aai_key]
+    if audio_sha:
+        cmd += ["--audio-sha256", audio_sha]
     subprocess.check_call(cmd)
     if not diar_path.exists():
         raise RuntimeError("Diarization failed — JSON not created.")
@@ -77,12 +82,15 @@ def log(msg: str) -> None: print(msg, flush=True)
 
 def ensure_16k_wav(src: Path) -> Path:
     """Convert to 16 kHz mono WAV without altering duration."""
+    if is_16k_mono_wav(src):
+        return src          # already normalized (e.g. from server.py's content store)
     out = src.with_suffix(".wav") if src.suffix.lower() != ".wav" else src
     subprocess.run(
         ["ffmpeg", "-hide_banner", "-loglevel", "error",
          "-i", str(src), "-ar", str(SAMPLE_RATE), "-ac", "1", "-y", str(out)],
         check=True
     )
+    manifest.record(out, "prepare")
     return out
 
 def load_audio(wav: Path) -> Tuple[np.ndarray, int]:
@@ -210,7 +218,7 @@ def delivery_labels(avg_db: float, pvar: float, pause: float) -> Tuple[str,str]:
 # ───────────────────────────────────────────────────────────────────────────────
 # Main
 # ───────────────────────────────────────────────────────────────────────────────
-def main() -> None:
+def main(argv: Optional[List[str]] = None) -> None:
     ap = argparse.ArgumentParser(
     description="Speech-delivery metrics (AAI only).",
     add_help=True
@@ -225,7 +233,9 @@ def main() -> None:
     ap.add_argument("--segments-per-speaker", type=int, default=2)
     ap.add_argument("--min-seg-sec", type=float, default=60.0)
     ap.add_argument("--alt-single-min-seg-sec", type=float, default=90.0)
-    args, _ = ap.parse_known_args()
+    ap.add_argument("--audio-sha256", default=None,
+                    help="Precomputed SHA-256 of the audio (diarization cache key)")
+    args, _ = ap.parse_known_args(argv)
     audio_path = Path(args.audio).expanduser().resolve()
     work_dir   = Path(args.work_dir).expanduser().resolve(); work_dir.mkdir(parents=True, exist_ok=True)
     report_out = work_dir / "analyze_speech.txt"
@@ -246,7 +256,7 @@ def main() -> None:
     else:
         log("🔍  STEP 2  Running AssemblyAI diarization…")
         diar_json = run_diarization(audio_path, work_dir,
-                                    args.aai_key, args.max_speakers)
+                                    args.aai_key, args.max_speakers, args.audio_sha256)
 
     speakers = parse_aai_json(diar_json)
     if not speakers: raise SystemExit("No speech segments in diarization JSON.")
@@ -256,6 +266,7 @@ def main() -> None:
     y, sr     = load_audio(wav_path)
 
     # STEP 3 — metrics & report
+    log("📊  STEP 3  Measuring delivery metrics…")
     lines: List[str] = []
 
     for sp in selected:
@@ -284,6 +295,7 @@ def main() -> None:
         ])
 
     report_out.write_text("\n".join(lines)+"\n", encoding="utf-8")
+    manifest.record(report_out, "report")
     print("\n".join(lines), "\n")
     log(f"✅  Wrote {report_out}")
 
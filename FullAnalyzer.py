@@ -1,155 +1,163 @@
 """
 FullAnalyzer: A unified entrypoint for debate and speech analysis.
 
-This script orchestrates two independent analysis pipelines – Debate Judging Feedback
-and Speech Delivery Feedback – against a single input audio recording.  It prompts
-the user for the necessary contextual information, duplicates the recording so
-that each pipeline can operate on its own copy, and then executes both analyses
-in parallel.  Results are written to the same output files (`judging_feedback.txt`
-and `analyze_speech.txt`) as produced by the original scripts.
+This script runs both analyses – Debate Judging Feedback and Speech Delivery
+Feedback – against a single input audio recording.  It prompts the user for the
+necessary contextual information, then:
+
+1. decodes the recording once to 16 kHz mono WAV,
+2. makes a single diarized AssemblyAI request (``RunDiarizationAAI.py
+   --transcript-out``) whose text becomes ``transcript.txt`` and whose speaker
+   turns become ``diarization.json``,
+3. runs the judging path (``AnalyzeDebateV2.py --reuse-transcript``) and the
+   delivery path (``AnalyzeSpeechV2.py --diarization-json``) on those shared
+   outputs.
+
+Results are written to ``judging_feedback.txt`` and ``analyze_speech.txt`` in
+the work directory, as produced by the individual scripts.
 
 Notes:
 
-* The original `AnalyzeDebate.py` and `AnalyzeSpeech.py` scripts must be present in
-  the same directory as this file.  Their internal logic is untouched and
-  preserved; this wrapper simply invokes them.
-* Each script performs its own silence trimming and resampling.  To avoid
-  interfering with that behaviour, the input audio is copied twice prior to
-  analysis.
-* All prompts required by the underlying scripts are surfaced here.  If the
-  underlying scripts are extended with additional interactive prompts, you may
-  need to extend the `debate_inputs` or `speech_inputs` lists accordingly.
+* ``AnalyzeDebateV2.py``, ``AnalyzeSpeechV2.py`` and ``RunDiarizationAAI.py``
+  must be present in the same directory as this file.
+* AssemblyAI is called once per recording rather than once per pipeline, which
+  halves upload bandwidth and transcription cost.  The AssemblyAI key comes from
+  ``--aai-key`` or ``ASSEMBLYAI_API_KEY``; judging reads ``OPENROUTER_API_KEY``.
 * Concurrency is implemented using `concurrent.futures.ThreadPoolExecutor`.  If
-  concurrent execution causes issues on your system (for example, due to GPU
-  resource contention), set `USE_CONCURRENCY` to ``False`` below to fall back
-  to serial execution.
+  concurrent execution causes issues on your system, set `USE_CONCURRENCY` to
+  ``False`` below to run the two analyses one after the other.
 
 Example usage:
 
     python FullAnalyzer.py /path/to/debate_recording.m4a
 
-The program will then ask for the debate topic, who speaks first, judging style
-and any other required information, copy the recording twice, and run both
-analysis pipelines.  Once complete, `judging_feedback.txt` and
-`analyze_speech.txt` will appear in the working directory.
+The program will then ask for the debate topic, who speaks first and judging
+style, transcribe the recording once, and run both analysis pipelines.  Once
+complete, `judging_feedback.txt` and `analyze_speech.txt` will appear in the
+work directory (the current directory by default).
 """
 
 import argparse
 import concurrent.futures
 import os
-import shutil
 import subprocess
 import sys
 
 
 # Toggle this constant to ``False`` to force the analyses to run one after the
 # other.  Parallel execution can drastically reduce overall runtime on
-# multi‑core machines but may contend for resources (e.g. GPU memory) on
-# machines with limited resources.
+# multi‑core machines but may contend for resources on machines with limited
+# resources.
 USE_CONCURRENCY: bool = True
 
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _run(script: str, args: list[str]) -> None:
+    """Run one of the sibling pipeline scripts, streaming its output."""
+    process = subprocess.run(
+        [sys.executable, "-u", os.path.join(SCRIPT_DIR, script), *args],
+        stdout=sys.stdout,
+        stderr=sys.stderr,
+    )
+    if process.returncode != 0:
+        raise RuntimeError(f"{script} exited with code {process.returncode}")
+
 
-def duplicate_audio(input_path: str, suffix: str) -> str:
-    """Copy an audio file and return the new path.
+def normalize_audio(input_path: str, work_dir: str) -> str:
+    """Decode the recording once to 16 kHz mono WAV and return its path.
 
-    The copy will be placed next to the original with the given suffix
-    inserted before the file extension.  For example, if ``input_path`` is
-    ``recording.m4a`` and ``suffix`` is ``_debate``, the resulting path will
-    be ``recording_debate.m4a``.
+    Both pipelines (and the AssemblyAI upload) read this file, so nothing
+    downstream needs to transcode again.
 
     Args:
         input_path: The path to the original audio file.
-        suffix:     A short string to append to the base filename.
+        work_dir:   Directory that receives the WAV.
 
     Returns:
-        The path to the duplicated file.
+        The path to the normalized WAV.
     """
-    base, ext = os.path.splitext(input_path)
-    copy_path = f"{base}{suffix}{ext}"
-    # Perform the copy.  Any existing file will be overwritten.
-    shutil.copyfile(input_path, copy_path)
-    return copy_path
+    base = os.path.splitext(os.path.basename(input_path))[0]
+    wav_path = os.path.join(work_dir, f"{base}_16k.wav")
+    subprocess.run(
+        ["ffmpeg", "-hide_banner", "-loglevel", "error",
+         "-i", input_path, "-ar", "16000", "-ac", "1", "-y", wav_path],
+        check=True,
+    )
+    return wav_path
+
 
+def run_shared_transcription(wav_path: str, work_dir: str, aai_key: str) -> str:
+    """Make the single diarized AssemblyAI request both pipelines share.
 
-def run_analyze_debate(audio_path: str, topic: str, speak_first: str, judging_style: str) -> None:
-    """Invoke the original AnalyzeDebate.py script with pre‑supplied inputs.
+    Args:
+        wav_path: Normalized recording.
+        work_dir: Receives ``transcript.txt`` and ``diarization.json``.
+        aai_key:  AssemblyAI API key.
 
-    This function opens a subprocess running ``AnalyzeDebate.py`` and writes
-    answers to its interactive prompts via standard input.  The order of inputs
-    supplied here should match the order of ``input()`` calls within
-    ``AnalyzeDebate.py``.  If that script is updated to prompt for additional
-    values, extend the ``debate_inputs`` list accordingly.
+    Returns:
+        The path to ``diarization.json``.
+    """
+    diar_path = os.path.join(work_dir, "diarization.json")
+    _run("RunDiarizationAAI.py", [
+        wav_path,
+        "--out", diar_path,
+        "--transcript-out", os.path.join(work_dir, "transcript.txt"),
+        "--aai-key", aai_key,
+    ])
+    return diar_path
+
+
+def run_analyze_debate(wav_path: str, topic: str, speak_first: str, judging_style: str,
+                       work_dir: str, model: str | None) -> None:
+    """Judge the round from the shared ``transcript.txt``.
 
     Args:
-        audio_path:    Path to the audio file to analyze.
+        wav_path:      Normalized recording (recorded in run.json only).
         topic:         The debate topic as entered by the user.
         speak_first:   Which side speaks first (e.g. "Aff" or "Neg").
         judging_style: The judging style (e.g. "lay", "flay", "tech", "prog").
+        work_dir:      Directory holding ``transcript.txt``; receives the feedback.
+        model:         Optional OpenRouter model id.
     """
-    # Build the list of responses expected by AnalyzeDebate.py.  If the
-    # underlying script asks additional questions, you should append further
-    # responses here so that ``communicate()`` sends them in the correct order.
-    debate_inputs = [
-        audio_path,
-        topic,
-        speak_first,
-        judging_style,
+    args = [
+        "--audio", wav_path,
+        "--topic", topic,
+        "--first", speak_first,
+        "--style", judging_style,
+        "--work-dir", work_dir,
+        "--reuse-transcript",
     ]
-    # Join the inputs with newlines.  The trailing newline ensures the final
-    # prompt receives an empty line if no extra input is expected.
-    input_str = "\n".join(debate_inputs) + "\n"
-    # Run the script as a subprocess.  ``text=True`` ensures that the input
-    # string is treated as a unicode string rather than bytes.
-    process = subprocess.run(
-        [sys.executable, "AnalyzeDebate.py"],
-        input=input_str,
-        text=True,
-        stdout=sys.stdout,
-        stderr=sys.stderr,
-    )
-    # Optionally, check the return code and raise if unsuccessful.
-    if process.returncode != 0:
-        raise RuntimeError(f"AnalyzeDebate.py exited with code {process.returncode}")
+    if model:
+        args += ["--model", model]
+    _run("AnalyzeDebateV2.py", args)
 
 
-def run_analyze_speech(audio_path: str, speak_first: str, judging_style: str) -> None:
-    """Invoke the original AnalyzeSpeech.py script with pre‑supplied inputs.
-
-    This function runs ``AnalyzeSpeech.py`` in a subprocess and pipes answers to
-    its interactive prompts.  Adjust the ``speech_inputs`` list if the
-    underlying script expects more (or fewer) values.
+def run_analyze_speech(wav_path: str, speak_first: str, work_dir: str, diar_path: str) -> None:
+    """Measure delivery from the shared diarization.
 
     Args:
-        audio_path:    Path to the audio file for speech analysis.
-        speak_first:   Which side speaks first.
-        judging_style: The judging style.
+        wav_path:    Normalized recording.
+        speak_first: Which side speaks first.
+        work_dir:    Receives ``analyze_speech.txt``.
+        diar_path:   ``diarization.json`` from the shared AssemblyAI request.
     """
-    # Build inputs expected by AnalyzeSpeech.py.  We assume the script asks for
-    # the audio path followed by the speak order and judging style.  Update
-    # this list if AnalyzeSpeech.py's prompts change.
-    speech_inputs = [
-        audio_path,
-        speak_first,
-        judging_style,
-    ]
-    input_str = "\n".join(speech_inputs) + "\n"
-    process = subprocess.run(
-        [sys.executable, "AnalyzeSpeech.py"],
-        input=input_str,
-        text=True,
-        stdout=sys.stdout,
-        stderr=sys.stderr,
-    )
-    if process.returncode != 0:
-        raise RuntimeError(f"AnalyzeSpeech.py exited with code {process.returncode}")
+    _run("AnalyzeSpeechV2.py", [
+        wav_path,
+        "--work-dir", work_dir,
+        "--first", speak_first,
+        "--second", "Neg" if speak_first == "Aff" else "Aff",
+        "--diarization-json", diar_path,
+    ])
 
 
 def main(argv: list[str] | None = None) -> int:
     """Entry point for the FullAnalyzer program.
 
-    Parses command‑line arguments, prompts for any missing values, copies the
-    input audio file for each pipeline, and executes both analyses.  In case of
-    errors in either pipeline, the exception will be propagated to the caller.
+    Parses command‑line arguments, prompts for any missing values, decodes and
+    transcribes the recording once, and executes both analyses.  In case of
+    errors in either pipeline, the error is reported and a non‑zero code is
+    returned.
 
     Args:
         argv: Optional list of arguments to parse instead of ``sys.argv``.
@@ -180,12 +188,32 @@ def main(argv: list[str] | None = None) -> int:
         dest="judging_style",
         help="Judging style (lay, flay, tech, prog; optional; will prompt if omitted)",
     )
+    parser.add_argument(
+        "--aai-key",
+        dest="aai_key",
+        default=os.getenv("ASSEMBLYAI_API_KEY"),
+        help="AssemblyAI API key (defaults to ASSEMBLYAI_API_KEY)",
+    )
+    parser.add_argument(
+        "--model",
+        dest="model",
+        help="OpenRouter model id for judging (optional)",
+    )
+    parser.add_argument(
+        "--work-dir",
+        dest="work_dir",
+        default=".",
+        help="Directory for transcript, diarization and feedback files",
+    )
     args = parser.parse_args(argv)
     # Determine the audio file path.
     audio_path = args.audio_file or input("Enter the path to the audio file (.m4a or .wav): ").strip()
     if not os.path.isfile(audio_path):
         print(f"Error: File not found: {audio_path}", file=sys.stderr)
         return 1
+    if not args.aai_key:
+        print("Error: AssemblyAI key required (--aai-key or ASSEMBLYAI_API_KEY).", file=sys.stderr)
+        return 1
     # Prompt for the debate topic if not supplied.
     topic = args.topic or input("Enter the debate topic: ").strip()
     # Prompt for who speaks first.
@@ -194,17 +222,19 @@ def main(argv: list[str] | None = None) -> int:
     judging_style = args.judging_style or input(
         "Judging style (lay, flay, tech, prog): "
     ).strip()
-    # Duplicate the audio file for each pipeline.
-    debate_copy = duplicate_audio(audio_path, "_debate")
-    speech_copy = duplicate_audio(audio_path, "_speech")
-    print(f"Audio file copied to:\n  {debate_copy} (for debate analysis)\n  {speech_copy} (for speech analysis)")
-    # Define tasks to run.  Each task is a tuple of (callable, args, kwargs).
-    tasks = [
-        (run_analyze_debate, (debate_copy, topic, speak_first, judging_style), {}),
-        (run_analyze_speech, (speech_copy, speak_first, judging_style), {}),
-    ]
-    # Execute the analyses either concurrently or sequentially.
+    work_dir = os.path.abspath(args.work_dir)
+    os.makedirs(work_dir, exist_ok=True)
     try:
+        # One decode and one AssemblyAI request feed both analyses.
+        wav_path = normalize_audio(audio_path, work_dir)
+        diar_path = run_shared_transcription(wav_path, work_dir, args.aai_key)
+        print(f"Shared transcript and diarization written to {work_dir}")
+        # Define tasks to run.  Each task is a tuple of (callable, args, kwargs).
+        tasks = [
+            (run_analyze_debate, (wav_path, topic, speak_first, judging_style, work_dir, args.model), {}),
+            (run_analyze_speech, (wav_path, speak_first, work_dir, diar_path), {}),
+        ]
+        # Execute the analyses either concurrently or sequentially.
         if USE_CONCURRENCY:
             with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
                 futures = [
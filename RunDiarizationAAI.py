@@ -4,96 +4,69 @@ RunDiarizationAAI.py
 ────────────────────
 Helper for AnalyzeSpeechV2.py.
 
-• Converts any input to 16 kHz mono WAV.
-• Uploads the WAV as a raw binary stream (AssemblyAI’s preferred method).
+• Transcodes any input to 16 kHz mono (FLAC by default, AAI_UPLOAD_CODEC)
+  while streaming it to AssemblyAI as a raw binary upload; no intermediate
+  WAV is written (see aai_client.upload_encoded).
 • Waits until diarization is finished.
 • Writes a minimal “segments-only” JSON compatible with AnalyzeSpeechV2.
+• With --transcript-out, also writes the job's text as transcript.txt, so one
+  diarized request serves both judging and delivery (server.py /analyze/full).
 
 Usage
 -----
 python RunDiarizationAAI.py audio.m4a \
        --out diarization.json \
        --aai-key YOUR_ASSEMBLYAI_KEY \
-       [--max-speakers 4]
+       [--max-speakers 4] [--transcript-out transcript.txt]
 """
 
 from __future__ import annotations
 import argparse
 import json
-import subprocess
 import sys
-import time
+import wave
 from pathlib import Path
+from typing import List, Optional
 
-import requests
+import aai_client
+import manifest
+import stt_cache
+import stt_journal
 
-AAI_UPLOAD_URL = "https://api.assemblyai.com/v2/upload"
-AAI_TRANSCRIPT_URL = "https://api.assemblyai.com/v2/transcript"
 SAMPLE_RATE = 16_000  # Hz
+# Same text options as AnalyzeDebateV2, so the diarized text can be judged as-is.
+TEXT_OPTS = {"punctuate": True, "format_text": True, "disfluencies": True}
 
 
 # ────────────────────────────────────────────────────────────────
 # Helpers
 # ────────────────────────────────────────────────────────────────
-def ensure_16k_wav(src: Path) -> Path:
-    """Return a 16 kHz mono WAV version of *src* (in-place if already suitable)."""
-    wav_path = src.with_suffix(".wav") if src.suffix.lower() != ".wav" else src
-    cmd = [
-        "ffmpeg",
-        "-hide_banner",
-        "-loglevel",
-        "error",
-        "-i",
-        str(src),
-        "-ar",
-        str(SAMPLE_RATE),
-        "-ac",
-        "1",
-        "-y",
-        str(wav_path),
-    ]
-    subprocess.run(cmd, check=True)
-    return wav_path
-
-
-def upload_audio(wav_path: Path, api_key: str) -> str:
-    """Upload WAV as raw bytes, return AssemblyAI upload URL."""
-    with wav_path.open("rb") as f:
-        r = requests.post(
-            AAI_UPLOAD_URL,
-            headers={
-                "authorization": api_key,
-                "content-type": "application/octet-stream",
-            },
-            data=f,
-            timeout=120,
-        )
-    r.raise_for_status()
-    return r.json()["upload_url"]
+def is_16k_mono_wav(path: Path) -> bool:
+    if path.suffix.lower() != ".wav":
+        return False
+    try:
+        with wave.open(str(path), "rb") as w:
+            return w.getframerate() == SAMPLE_RATE and w.getnchannels() == 1 and w.getsampwidth() == 2
+    except Exception:
+        return False
+
+
+def upload_audio(src: Path, api_key: str) -> str:
+    """Transcode *src* while uploading it, return AssemblyAI upload URL."""
+    return aai_client.client(api_key).upload_encoded(src)
 
 
 def start_transcript(audio_url: str, api_key: str, speakers: int) -> str:
-    payload = {
-        "audio_url": audio_url,
-        "speaker_labels": True,
-        "speakers_expected": speakers,
-    }
-    r = requests.post(
-        AAI_TRANSCRIPT_URL, json=payload, headers={"authorization": api_key}, timeout=30
+    return aai_client.client(api_key).create_transcript(
+        audio_url,
+        speaker_labels=True,
+        speakers_expected=speakers,
+        **TEXT_OPTS,
     )
-    r.raise_for_status()
-    return r.json()["id"]
 
 
-def wait_for_done(job_id: str, api_key: str) -> dict:
-    url = f"{AAI_TRANSCRIPT_URL}/{job_id}"
-    while True:
-        r = requests.get(url, headers={"authorization": api_key}, timeout=30)
-        r.raise_for_status()
-        js = r.json()
-        if js["status"] in ("completed", "error"):
-            return js
-        time.sleep(4)
+def wait_for_done(job_id: str, api_key: str, audio_sec: Optional[float] = None) -> dict:
+    return aai_client.client(api_key).wait(job_id, audio_sec)
 
 
 def normalise_speaker(raw) -> str:
@@ -109,27 +82,50 @@ def normalise_speaker(raw) -> str:
 # ────────────────────────────────────────────────────────────────
 # Main
 # ────────────────────────────────────────────────────────────────
-def main() -> None:
+def main(argv: Optional[List[str]] = None) -> None:
     pa = argparse.ArgumentParser()
     pa.add_argument("audio", help="Input audio file (.m4a/.wav/.mp3 …)")
     pa.add_argument("--out", required=True, help="Path to write diarization JSON")
     pa.add_argument("--aai-key", required=True, help="AssemblyAI API key")
     pa.add_argument("--max-speakers", type=int, default=4)
-    args = pa.parse_args()
+    pa.add_argument("--audio-sha256", default=None,
+                    help="Precomputed SHA-256 of the input (diarization cache key)")
+    pa.add_argument("--transcript-out", default=None,
+                    help="Also write the transcript text here (e.g. for AnalyzeDebateV2 --reuse-transcript)")
+    args = pa.parse_args(argv)
 
     src = Path(args.audio).expanduser().resolve()
-    wav = ensure_16k_wav(src)
-
-    print(f"🆙  Uploading {wav.name} to AssemblyAI…", flush=True)
-    audio_url = upload_audio(wav, args.aai_key)
-
-    print("🚀  Starting diarization job…", flush=True)
-    job_id = start_transcript(audio_url, args.aai_key, args.max_speakers)
-
-    print("⏳  Waiting for AssemblyAI to finish (this can take a few mins)…", flush=True)
-    result = wait_for_done(job_id, args.aai_key)
-    if result["status"] != "completed":
-        sys.exit(f"AssemblyAI error: {result.get('error')}")
+    params = {"provider": "assemblyai", "speaker_labels": True, "speakers_expected": args.max_speakers,
+              **TEXT_OPTS}
+    audio_sha = args.audio_sha256 or stt_cache.file_sha256(src)
+    cache_key = stt_cache.key_for(src, params, audio_sha)
+    result = stt_cache.get(cache_key)
+    if result is not None:
+        print("♻️  Reusing cached AssemblyAI diarization", flush=True)
+    else:
+        audio_sec = aai_client.audio_seconds(src)
+
+        def upload() -> str:
+            print(f"🆙  Uploading {src.name} to AssemblyAI…", flush=True)
+            return upload_audio(src, args.aai_key)
+
+        def create(audio_url: str) -> str:
+            print("🚀  Starting diarization job…", flush=True)
+            return start_transcript(audio_url, args.aai_key, args.max_speakers)
+
+        def wait(job_id: str) -> dict:
+            print("⏳  Waiting for AssemblyAI to finish (this can take a few mins)…", flush=True)
+            return wait_for_done(job_id, args.aai_key, audio_sec)
+
+        # Journaled, so a run killed mid-way resumes the same AssemblyAI job.
+        result = stt_journal.transcribe(
+            aai_client.client(args.aai_key),
+            cache_key or stt_cache.content_key(src, params, audio_sha),
+            upload, create, wait,
+        )
+        if result["status"] != "completed":
+            sys.exit(f"AssemblyAI error: {result.get('error')}")
+        stt_cache.put(cache_key, result, audio_sha)
 
     # Build segments-only JSON expected by AnalyzeSpeechV2
     segments = []
@@ -144,6 +140,12 @@ def main() -> None:
 
     out_path = Path(args.out).expanduser().resolve()
     out_path.write_text(json.dumps({"segments": segments}, indent=2))
+    manifest.record(out_path, "diarize")
+    if args.transcript_out:
+        tr_path = Path(args.transcript_out).expanduser().resolve()
+        tr_path.write_text(result.get("text") or "", encoding="utf-8")
+        manifest.record(tr_path, "transcribe")
+        print("📝  wrote transcript.txt", flush=True)
     print(f"✅  Wrote diarization JSON → {out_path}")
 
 
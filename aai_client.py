@@ -0,0 +1,586 @@
+#!/usr/bin/env python3
+"""
+aai_client.py
+─────────────
+One AssemblyAI HTTP client for AnalyzeDebateV2, RunDiarizationAAI,
+compare_stt and guiLaunchV2.
+
+• A requests.Session per API key, so upload → create → poll reuse one
+  keep-alive TLS connection instead of handshaking on every call
+  (warm workers keep the session across runs).
+• Exponential backoff with jitter on 429/5xx and connection errors,
+  honouring Retry-After.  Creating a transcript is only retried on 429
+  or when the connection was never opened (connect timeout, refused), so
+  neither a 5xx nor a read timeout can start a duplicate paid job.
+• Connect/read timeouts from the environment:
+
+  AAI_CONNECT_TIMEOUT   (10 s)
+  AAI_READ_TIMEOUT      (60 s, API calls)
+  AAI_UPLOAD_TIMEOUT    (600 s, read timeout while uploading)
+  AAI_MAX_RETRIES       (5)
+  AAI_BACKOFF_SEC       (1.0, first retry delay; doubles, capped at 30 s)
+  AAI_BASE_URL          (https://api.assemblyai.com/v2)
+
+Uploads are transcoded to 16 kHz mono in AAI_UPLOAD_CODEC:
+flac (default, lossless, ~3x smaller than PCM WAV), opus at
+AAI_UPLOAD_OPUS_KBPS (~10x smaller), or raw to send the file unchanged.
+upload_encoded() pipes ffmpeg's stdout straight into the chunked upload
+through a bounded buffer (AAI_STREAM_BUFFER_CHUNKS × 256 KB), so transcoding
+overlaps the transfer and nothing is written to disk.
+bench_upload_codecs.py compares size, upload time and transcripts.
+
+Waiting for a transcript
+────────────────────────
+wait() predicts the finish time from the audio length and the processing
+rate observed on earlier jobs (an EWMA kept in AAI_HISTORY_PATH), backs off
+while the job is still queued, sleeps through most of the predicted
+processing time and polls tightly only around the expected finish.
+
+With AAI_WEBHOOK=1 the client instead asks AssemblyAI to POST to
+AAI_WEBHOOK_URL/aai-webhook when the job finishes, so a waiting job makes no
+requests until then.  Webhooks are received in one place per host, never
+once per worker: server.py serves POST /aai-webhook and checks a single
+AAI_WEBHOOK_SECRET (it makes one at startup unless set; set it yourself when
+several server processes share the URL), then drops a marker file into the
+shared AAI_WEBHOOK_INBOX directory that the waiting worker picks up.
+Standalone runs without the server set AAI_WEBHOOK_BIND to listen
+themselves.  Without a URL, or a secret/listener to receive with, webhook
+mode is off and wait() polls.  A slow safety poll (AAI_WEBHOOK_FALLBACK_SEC)
+covers lost deliveries.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import queue
+import random
+import secrets
+import subprocess
+import tempfile
+import threading
+import time
+import wave
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+# Environment settings and their defaults.  Read through setting() on every
+# use: a warm worker (workers.py) imports this module once but gets each job's
+# environment only when that job runs.
+SETTINGS: Dict[str, str] = {
+    "AAI_BASE_URL":             "https://api.assemblyai.com/v2",
+    "AAI_CONNECT_TIMEOUT":      "10",
+    "AAI_READ_TIMEOUT":         "60",
+    "AAI_UPLOAD_TIMEOUT":       "600",
+    "AAI_MAX_RETRIES":          "5",
+    "AAI_BACKOFF_SEC":          "1.0",
+    "AAI_UPLOAD_CODEC":         "flac",     # flac | opus | raw
+    "AAI_UPLOAD_OPUS_KBPS":     "32",
+    "AAI_STREAM_BUFFER_CHUNKS": "32",       # encoded data ffmpeg may run ahead
+    "AAI_POLL_MIN_SEC":         "1.0",
+    "AAI_POLL_MAX_SEC":         "30",
+    "AAI_QUEUED_MAX_SEC":       "15",       # back-off cap while queued
+    "AAI_HISTORY_PATH":         str(Path.home() / ".cache" / "vocius" / "aai_history.json"),
+    "AAI_WEBHOOK":              "",
+    "AAI_WEBHOOK_URL":          "",       # public base URL AssemblyAI can reach
+    "AAI_WEBHOOK_SECRET":       "",       # shared auth header value (server.py sets one)
+    "AAI_WEBHOOK_INBOX":        str(Path.home() / ".cache" / "vocius" / "aai_webhooks"),
+    "AAI_WEBHOOK_BIND":         "",       # host:port to listen on in standalone runs
+    "AAI_WEBHOOK_FALLBACK_SEC": "300",
+    "AAI_CLIENTS_MAX":          "32",       # per-key clients kept per process
+}
+
+MAX_BACKOFF_SEC     = 30.0
+UPLOAD_CHUNK        = 5 * 1024 * 1024
+RETRY_STATUSES      = {429, 500, 502, 503, 504}
+UPLOAD_CODECS       = ("flac", "opus", "raw")
+STREAM_CHUNK        = 256 * 1024
+DEFAULT_RATE        = 0.3     # processing seconds per audio second before any history
+MIN_ETA_SEC         = 5.0
+WEBHOOK_HEADER      = "x-vocius-webhook"
+INBOX_POLL_SEC      = 0.5     # local stat() of the marker file, not an API request
+INBOX_TTL_SEC       = 24 * 3600
+
+
+def setting(name: str, cast: Callable[[str], Any] = str) -> Any:
+    return cast(os.getenv(name, SETTINGS[name]))
+
+
+def upload_codec() -> str:
+    return setting("AAI_UPLOAD_CODEC").lower()
+
+
+def upload_opus_kbps() -> int:
+    return setting("AAI_UPLOAD_OPUS_KBPS", int)
+
+
+class AAIError(RuntimeError):
+    """A non-2xx AssemblyAI response (after retries)."""
+
+    def __init__(self, what: str, status: int, body: str):
+        super().__init__(f"AssemblyAI {what} error {status}: {body[:400]}")
+        self.what = what
+        self.status = status
+        self.body = body
+
+
+def audio_seconds(path: Union[Path, str]) -> Optional[float]:
+    """Duration from the WAV header, else from ffprobe; None when neither can tell."""
+    try:
+        with wave.open(str(path), "rb") as w:
+            return w.getnframes() / float(w.getframerate())
+    except Exception:
+        pass
+    try:
+        out = subprocess.run(["ffprobe", "-v", "error", "-show_entries", "format=duration",
+                              "-of", "default=noprint_wrappers=1:nokey=1", str(path)],
+                             capture_output=True, text=True, timeout=30)
+        return float(out.stdout.strip())
+    except Exception:
+        return None
+
+
+def codec_args(codec: str, opus_kbps: Optional[int] = None) -> tuple[list[str], str]:
+    """ffmpeg output args and file suffix for an upload codec (16 kHz mono)."""
+    opus_kbps = opus_kbps or upload_opus_kbps()
+    base = ["-vn", "-ar", "16000", "-ac", "1"]
+    if codec == "flac":
+        return base + ["-c:a", "flac", "-compression_level", "5", "-f", "flac"], ".flac"
+    if codec == "opus":
+        return base + ["-c:a", "libopus", "-b:a", f"{opus_kbps}k", "-application", "voip",
+                       "-f", "ogg"], ".ogg"
+    raise ValueError(f"unknown upload codec {codec!r} (expected one of {', '.join(UPLOAD_CODECS)})")
+
+
+def encode_for_upload(src: Union[Path, str], codec: Optional[str] = None,
+                      opus_kbps: Optional[int] = None) -> Path:
+    """Transcode *src* to a temporary file in *codec*; returns *src* itself for 'raw'.
+
+    The caller deletes the returned path when it differs from *src*.
+    """
+    codec = (codec or upload_codec()).lower()
+    src = Path(src)
+    if codec == "raw":
+        return src
+    args, suffix = codec_args(codec, opus_kbps)
+    fd, tmp = tempfile.mkstemp(prefix=f"{src.stem}.", suffix=suffix)
+    os.close(fd)
+    try:
+        subprocess.run(["ffmpeg", "-hide_banner", "-loglevel", "error", "-i", str(src), *args, "-y", tmp],
+                       check=True)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return Path(tmp)
+
+
+def transcode_stream(src: Union[Path, str], codec: Optional[str] = None,
+                     opus_kbps: Optional[int] = None,
+                     max_chunks: Optional[int] = None) -> Iterator[bytes]:
+    """Yield *src* encoded in *codec* as ffmpeg produces it.
+
+    A reader thread moves ffmpeg's stdout into a queue of at most *max_chunks*
+    chunks: ffmpeg runs ahead of a slow network by that much and then blocks,
+    while the upload never waits on a full encode. Raises if ffmpeg fails, so
+    a truncated body is never completed as a successful upload.
+    """
+    codec = (codec or upload_codec()).lower()
+    max_chunks = max_chunks or setting("AAI_STREAM_BUFFER_CHUNKS", int)
+    args, _ = codec_args(codec, opus_kbps)
+    proc = subprocess.Popen(
+        ["ffmpeg", "-hide_banner", "-loglevel", "error", "-i", str(src), *args, "pipe:1"],
+        stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+    )
+    buf: "queue.Queue[bytes]" = queue.Queue(maxsize=max(1, max_chunks))
+    stop = threading.Event()
+
+    def pump():
+        while not stop.is_set():
+            chunk = proc.stdout.read(STREAM_CHUNK)
+            while not stop.is_set():
+                try:
+                    buf.put(chunk, timeout=0.5)
+                    break
+                except queue.Full:
+                    continue
+            if not chunk:
+                return
+
+    reader = threading.Thread(target=pump, name="ffmpeg-upload", daemon=True)
+    reader.start()
+    try:
+        while True:
+            chunk = buf.get()
+            if not chunk:
+                break
+            yield chunk
+        if proc.wait() != 0:
+            err = proc.stderr.read().decode("utf-8", "replace").strip()
+            raise RuntimeError(f"ffmpeg failed ({proc.returncode}) encoding {src}: {err[-400:]}")
+    finally:
+        stop.set()
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        reader.join(timeout=1)
+        proc.stdout.close()
+        proc.stderr.close()
+
+
+class ThroughputHistory:
+    """EWMA of AssemblyAI processing seconds per audio second, shared across runs via a JSON file."""
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = path = Path(path or setting("AAI_HISTORY_PATH"))
+        self._lock = threading.Lock()
+        self.rate = DEFAULT_RATE
+        self.samples = 0
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+            self.rate = float(data["rate"])
+            self.samples = int(data.get("samples", 0))
+        except Exception:
+            pass
+
+    def predict(self, audio_sec: Optional[float]) -> Optional[float]:
+        if not audio_sec:
+            return None
+        return max(MIN_ETA_SEC, self.rate * audio_sec)
+
+    def record(self, processing_sec: float, audio_sec: Optional[float]) -> None:
+        if not audio_sec or audio_sec <= 0 or processing_sec <= 0:
+            return
+        sample = processing_sec / audio_sec
+        with self._lock:
+            self.rate = sample if self.samples == 0 else 0.8 * self.rate + 0.2 * sample
+            self.samples += 1
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                tmp = self.path.with_suffix(".tmp")
+                tmp.write_text(json.dumps({"rate": round(self.rate, 4), "samples": self.samples}),
+                               encoding="utf-8")
+                tmp.replace(self.path)
+            except OSError:
+                pass
+
+
+class PollSchedule:
+    """Next poll delay from the job status and the predicted processing time."""
+
+    def __init__(self, eta_sec: Optional[float]):
+        self.eta_sec = eta_sec
+        self.created = time.monotonic()
+        self.processing_since: Optional[float] = None
+        self.min_sec = setting("AAI_POLL_MIN_SEC", float)
+        self.max_sec = setting("AAI_POLL_MAX_SEC", float)
+        self.queued_max_sec = setting("AAI_QUEUED_MAX_SEC", float)
+        self._queued_delay = self.min_sec
+        self._late_delay = self.min_sec
+
+    def next_delay(self, status: Optional[str]) -> float:
+        now = time.monotonic()
+        if status == "queued":
+            delay, self._queued_delay = self._queued_delay, min(self.queued_max_sec, self._queued_delay * 2)
+            return delay
+        if self.processing_since is None:
+            self.processing_since = now
+        if self.eta_sec is None:
+            delay, self._late_delay = self._late_delay, min(self.max_sec / 3, self._late_delay * 1.5)
+            return delay
+        remaining = self.eta_sec - (now - self.processing_since)
+        if remaining > self.min_sec:
+            # Sleep most of the remaining time, then converge on the predicted finish.
+            return min(self.max_sec, max(self.min_sec, remaining * 0.7))
+        # Past the prediction: stay tight, widening slowly in case the estimate was far off.
+        delay, self._late_delay = self._late_delay, min(self.max_sec / 3, self._late_delay * 1.25)
+        return delay
+
+    def processing_sec(self) -> float:
+        return time.monotonic() - (self.processing_since or self.created)
+
+
+class WebhookReceiver:
+    """AssemblyAI completion notices, handed between processes through an inbox directory.
+
+    Whoever receives the POST (server.py's route, or serve() in a standalone
+    run) calls deliver(), which writes <inbox>/<transcript id>; the worker
+    waiting on that transcript, in any process on the host, sees the file.
+    """
+
+    def __init__(self, url: str, secret: str, inbox: Path):
+        self.url = url.rstrip("/") + "/aai-webhook"
+        self.secret = secret
+        self.inbox = Path(inbox)
+        self.inbox.mkdir(parents=True, exist_ok=True)
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def _marker(self, transcript_id: str) -> Path:
+        if not transcript_id or not all(c.isalnum() or c in "-_" for c in transcript_id):
+            raise ValueError(f"bad transcript id: {transcript_id!r}")
+        return self.inbox / transcript_id
+
+    def authorized(self, header_value: Optional[str]) -> bool:
+        return secrets.compare_digest((header_value or "").encode(), self.secret.encode())
+
+    def deliver(self, transcript_id: str, status: str) -> None:
+        marker = self._marker(transcript_id)
+        tmp = marker.with_name(f".{marker.name}.{secrets.token_hex(4)}")
+        tmp.write_text(status, encoding="utf-8")
+        os.replace(tmp, marker)
+        cutoff = time.time() - INBOX_TTL_SEC        # notices nobody waited for
+        for p in self.inbox.iterdir():
+            try:
+                if p.stat().st_mtime < cutoff:
+                    p.unlink()
+            except OSError:
+                pass
+
+    def params(self) -> Dict[str, str]:
+        return {"webhook_url": self.url, "webhook_auth_header_name": WEBHOOK_HEADER,
+                "webhook_auth_header_value": self.secret}
+
+    def wait(self, transcript_id: str, timeout: float) -> bool:
+        """True once AssemblyAI reported the job finished; False on timeout."""
+        marker = self._marker(transcript_id)
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                marker.unlink()
+                return True
+            except FileNotFoundError:
+                pass
+            left = deadline - time.monotonic()
+            if left <= 0:
+                return False
+            time.sleep(min(INBOX_POLL_SEC, left))
+
+    def serve(self, bind: str) -> "WebhookReceiver":
+        """Listen on *bind* (host:port) ourselves, for runs without server.py."""
+        host, _, port = bind.rpartition(":")
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("content-length") or 0))
+                if not receiver.authorized(self.headers.get(WEBHOOK_HEADER)):
+                    self.send_response(403); self.end_headers()
+                    return
+                try:
+                    data = json.loads(body or b"{}")
+                    receiver.deliver(str(data["transcript_id"]), str(data.get("status", "")))
+                except (ValueError, KeyError):
+                    self.send_response(400); self.end_headers()
+                    return
+                self.send_response(200); self.end_headers()
+
+        self._server = ThreadingHTTPServer((host or "0.0.0.0", int(port)), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="aai-webhook", daemon=True).start()
+        return self
+
+    def close(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+_histories: Dict[str, ThroughputHistory] = {}
+_webhooks: Dict[tuple, WebhookReceiver] = {}
+_standalone_secret = secrets.token_urlsafe(16)
+_shared_lock = threading.Lock()
+
+
+def history() -> ThroughputHistory:
+    path = setting("AAI_HISTORY_PATH")
+    with _shared_lock:
+        if path not in _histories:
+            _histories[path] = ThroughputHistory(Path(path))
+        return _histories[path]
+
+
+def webhook_receiver(listen: bool = True) -> Optional[WebhookReceiver]:
+    """The receiver when webhook mode is on and usable, else None (wait() polls).
+
+    With AAI_WEBHOOK_BIND set (and *listen*), this process listens itself;
+    otherwise deliveries must come from server.py, which requires
+    AAI_WEBHOOK_SECRET.
+    """
+    if setting("AAI_WEBHOOK").lower() not in ("1", "true", "yes"):
+        return None
+    url, bind = setting("AAI_WEBHOOK_URL"), setting("AAI_WEBHOOK_BIND") if listen else ""
+    secret = setting("AAI_WEBHOOK_SECRET") or (_standalone_secret if bind else "")
+    if not url or not secret:
+        return None
+    key = (url, secret, setting("AAI_WEBHOOK_INBOX"), bind)
+    with _shared_lock:
+        if key not in _webhooks:
+            receiver = WebhookReceiver(url, secret, Path(key[2]))
+            _webhooks[key] = receiver.serve(bind) if bind else receiver
+        return _webhooks[key]
+
+
+class AAIClient:
+    def __init__(self, api_key: str, base_url: Optional[str] = None,
+                 max_retries: Optional[int] = None, backoff_sec: Optional[float] = None):
+        self.base_url = (base_url or setting("AAI_BASE_URL")).rstrip("/")
+        self.max_retries = setting("AAI_MAX_RETRIES", int) if max_retries is None else max_retries
+        self.backoff_sec = setting("AAI_BACKOFF_SEC", float) if backoff_sec is None else backoff_sec
+        self.key_id = hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]   # names the key without storing it
+        self.session = requests.Session()
+        self.session.headers["authorization"] = api_key
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    # ── transport ─────────────────────────────────────────────
+    @staticmethod
+    def _never_sent(e: requests.RequestException) -> bool:
+        """Whether the request failed before reaching the server, so even a non-idempotent call can be resent."""
+        if isinstance(e, requests.ConnectTimeout):
+            return True
+        reason = getattr(e.args[0], "reason", None) if e.args else None
+        return isinstance(reason, (NewConnectionError, ConnectionRefusedError))
+
+    def _delay(self, attempt: int, resp: Optional[requests.Response]) -> float:
+        if resp is not None:
+            try:
+                return min(MAX_BACKOFF_SEC, float(resp.headers.get("retry-after", "")))
+            except ValueError:
+                pass
+        base = min(MAX_BACKOFF_SEC, self.backoff_sec * (2 ** attempt))
+        return base * (0.5 + random.random() / 2)
+
+    def request(self, method: str, path: str, what: str, *, idempotent: bool = True,
+                read_timeout: Optional[float] = None,
+                body: Optional[Callable[[], Any]] = None, **kwargs) -> requests.Response:
+        """Send with retries. *body* re-creates `data` per attempt (file streams can't be replayed)."""
+        url = path if path.startswith("http") else f"{self.base_url}/{path.lstrip('/')}"
+        timeout = (setting("AAI_CONNECT_TIMEOUT", float), read_timeout or setting("AAI_READ_TIMEOUT", float))
+        attempt = 0
+        while True:
+            if body is not None:
+                kwargs["data"] = body()
+            resp = None
+            try:
+                resp = self.session.request(method, url, timeout=timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt >= self.max_retries or not (idempotent or self._never_sent(e)):
+                    raise
+            else:
+                retryable = resp.status_code == 429 or (idempotent and resp.status_code in RETRY_STATUSES)
+                if resp.status_code < 400:
+                    return resp
+                if not retryable or attempt >= self.max_retries:
+                    raise AAIError(what, resp.status_code, resp.text)
+            finally:
+                # A body generator abandoned mid-stream would keep its ffmpeg running
+                # until GC; closing it runs transcode_stream's cleanup (kill + wait) now.
+                if body is not None and hasattr(kwargs["data"], "close"):
+                    kwargs["data"].close()
+            time.sleep(self._delay(attempt, resp))
+            attempt += 1
+
+    # ── API ───────────────────────────────────────────────────
+    def upload(self, source: Union[Path, str, Callable[[], Iterable[bytes]]]) -> str:
+        """Stream a file (or a callable returning a fresh chunk iterator) to /upload."""
+        if callable(source):
+            body = source
+        else:
+            path = Path(source)
+
+            def body():
+                def chunks():
+                    with path.open("rb") as f:
+                        while True:
+                            chunk = f.read(UPLOAD_CHUNK)
+                            if not chunk:
+                                return
+                            yield chunk
+                return chunks()
+        r = self.request("POST", "upload", "upload", body=body, read_timeout=setting("AAI_UPLOAD_TIMEOUT", float),
+                         headers={"content-type": "application/octet-stream"})
+        upload_url = r.json().get("upload_url")
+        if not upload_url:
+            raise AAIError("upload", r.status_code, "response missing upload_url")
+        return upload_url
+
+    def upload_encoded(self, path: Union[Path, str], codec: Optional[str] = None,
+                       opus_kbps: Optional[int] = None) -> str:
+        """Upload *path* in *codec*, transcoding while uploading (the file itself for 'raw')."""
+        codec = (codec or upload_codec()).lower()
+        opus_kbps = opus_kbps or upload_opus_kbps()
+        if codec == "raw":
+            return self.upload(path)
+        codec_args(codec, opus_kbps)          # reject an unknown codec before starting ffmpeg
+        # A fresh ffmpeg per attempt, so a retried upload re-encodes from the start.
+        return self.upload(lambda: transcode_stream(path, codec, opus_kbps))
+
+    def create_transcript(self, audio_url: str, **opts) -> str:
+        receiver = webhook_receiver()
+        if receiver is not None:
+            opts = {**receiver.params(), **opts}
+        r = self.request("POST", "transcript", "create", idempotent=False,
+                         json={"audio_url": audio_url, **opts})
+        tid = r.json().get("id")
+        if not tid:
+            raise AAIError("create", r.status_code, "no transcript id returned")
+        return tid
+
+    def get_transcript(self, transcript_id: str) -> Dict[str, Any]:
+        return self.request("GET", f"transcript/{transcript_id}", "poll").json()
+
+    def wait(self, transcript_id: str, audio_sec: Optional[float] = None,
+             on_status: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+        """Wait until the transcript is completed or errored; returns the final JSON.
+
+        *audio_sec* (the recording length) drives the predicted finish time.
+        """
+        hist = history()
+        schedule = PollSchedule(hist.predict(audio_sec))
+        receiver = webhook_receiver()
+        while True:
+            js = self.get_transcript(transcript_id)
+            status = js.get("status")
+            if on_status is not None:
+                on_status(status)
+            if status in ("completed", "error"):
+                if status == "completed":
+                    hist.record(schedule.processing_sec(), audio_sec or js.get("audio_duration"))
+                return js
+            if receiver is not None:
+                receiver.wait(transcript_id, setting("AAI_WEBHOOK_FALLBACK_SEC", float))
+            else:
+                time.sleep(schedule.next_delay(status))
+
+    def account(self, timeout: float = 10.0) -> requests.Response:
+        """GET /account once, without raising on status, for key validation."""
+        return self.session.get(f"{self.base_url}/account", timeout=timeout)
+
+
+# Keyed by a hash of the API key, so the cache never holds a user's key as a
+# plain dict key; bounded, because warm workers serve many users' keys.
+_clients: "OrderedDict[tuple[str, str], AAIClient]" = OrderedDict()
+_clients_lock = threading.Lock()
+
+
+def client(api_key: str) -> AAIClient:
+    """Shared client for *api_key* (one connection pool per key per process, least recently used dropped)."""
+    key = (hashlib.sha256(api_key.encode("utf-8")).hexdigest(), setting("AAI_BASE_URL"))
+    with _clients_lock:
+        c = _clients.pop(key, None) or AAIClient(api_key)
+        _clients[key] = c
+        while len(_clients) > max(1, setting("AAI_CLIENTS_MAX", int)):
+            _, old = _clients.popitem(last=False)
+            old.session.close()
+        return c
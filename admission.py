@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+admission.py
+────────────
+Per-resource admission control for server.py.
+
+Each pipeline step needs one of three scarce resources:
+
+• cpu — local audio work (ffmpeg, librosa/parselmouth metrics)
+• stt — an outbound AssemblyAI transcription/diarization
+• llm — an outbound OpenRouter/OpenAI judging call
+
+Every resource has a Gate: a FIFO semaphore with VOCIUS_<RES>_SLOTS slots,
+so steps run in arrival order and a burst can't oversubscribe the CPU or
+trip provider rate limits.  A job reserves its resources when it is
+submitted; once a gate's backlog (reserved + waiting) reaches
+VOCIUS_GATE_MAX_QUEUE, new submissions are refused with GateFull and an
+estimated Retry-After instead of queueing without bound.
+"""
+
+from __future__ import annotations
+
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Deque, Dict, Iterable, Iterator, Optional, Set
+
+CPU_SLOTS      = int(os.getenv("VOCIUS_CPU_SLOTS", str(max(1, (os.cpu_count() or 2) // 2))))
+STT_SLOTS      = int(os.getenv("VOCIUS_STT_SLOTS", "4"))
+LLM_SLOTS      = int(os.getenv("VOCIUS_LLM_SLOTS", "2"))
+GATE_MAX_QUEUE = int(os.getenv("VOCIUS_GATE_MAX_QUEUE", "100"))   # per resource
+DEFAULT_HOLD_SEC = 30.0                                           # Retry-After guess before any history
+
+RESOURCES = ("cpu", "stt", "llm")
+
+
+class GateFull(Exception):
+    """Raised by Admission.admit when a resource's backlog is at its limit."""
+
+    def __init__(self, resource: str, retry_after: int):
+        super().__init__(f"{resource} queue is full")
+        self.resource = resource
+        self.retry_after = retry_after
+
+
+class Gate:
+    """FIFO counting semaphore with queue-depth and hold-time stats."""
+
+    def __init__(self, name: str, slots: int, max_queue: int = GATE_MAX_QUEUE):
+        self.name = name
+        self.slots = max(1, slots)
+        self.max_queue = max_queue
+        self.active = 0
+        self.reserved = 0                 # admitted jobs that haven't reached this gate yet
+        self.served = 0
+        self._avg_hold: Optional[float] = None
+        self._waiters: Deque[object] = deque()
+        self._cond = threading.Condition()
+
+    @property
+    def depth(self) -> int:
+        return self.reserved + len(self._waiters)
+
+    def retry_after(self) -> int:
+        hold = self._avg_hold or DEFAULT_HOLD_SEC
+        return max(1, min(600, math.ceil((self.depth + 1) / self.slots * hold)))
+
+    @contextmanager
+    def slot(self, check: Callable[[], None] = lambda: None,
+             on_wait: Optional[Callable[[], None]] = None) -> Iterator[None]:
+        """Hold one slot, waiting in arrival order. *check* may raise to abandon the wait."""
+        ticket = object()
+        with self._cond:
+            self._waiters.append(ticket)
+            try:
+                waited = False
+                while self._waiters[0] is not ticket or self.active >= self.slots:
+                    if not waited and on_wait is not None:
+                        waited = True
+                        on_wait()
+                    check()
+                    self._cond.wait(timeout=0.5)
+            except BaseException:
+                self._waiters.remove(ticket)
+                self._cond.notify_all()
+                raise
+            self._waiters.popleft()
+            self.active += 1
+            self._cond.notify_all()       # the next waiter may fit in a free slot too
+        t0 = time.monotonic()
+        try:
+            yield
+        finally:
+            held = time.monotonic() - t0
+            with self._cond:
+                self.active -= 1
+                self.served += 1
+                self._avg_hold = held if self._avg_hold is None else 0.8 * self._avg_hold + 0.2 * held
+                self._cond.notify_all()
+
+    def stats(self) -> Dict[str, float]:
+        with self._cond:
+            return {"slots": self.slots, "active": self.active, "waiting": len(self._waiters),
+                    "reserved": self.reserved, "max_queue": self.max_queue, "served": self.served,
+                    "avg_hold_sec": round(self._avg_hold, 2) if self._avg_hold is not None else None}
+
+
+class Reservation:
+    """A job's claim on the gates it will pass through; close() drops unused claims."""
+
+    def __init__(self, admission: "Admission", resources: Set[str]):
+        self._admission = admission
+        self._pending = set(resources)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def slot(self, resource: str, check: Callable[[], None] = lambda: None,
+             on_wait: Optional[Callable[[], None]] = None) -> Iterator[None]:
+        gate = self._admission.gates[resource]
+        self._consume(resource)
+        with gate.slot(check, on_wait):
+            yield
+
+    def _consume(self, resource: str) -> None:
+        with self._lock:
+            if resource not in self._pending:
+                return
+            self._pending.discard(resource)
+        gate = self._admission.gates[resource]
+        with gate._cond:
+            gate.reserved -= 1
+
+    def close(self) -> None:
+        for resource in list(self._pending):
+            self._consume(resource)
+
+
+class Admission:
+    def __init__(self, cpu: int = CPU_SLOTS, stt: int = STT_SLOTS, llm: int = LLM_SLOTS,
+                 max_queue: int = GATE_MAX_QUEUE):
+        self.gates: Dict[str, Gate] = {
+            "cpu": Gate("cpu", cpu, max_queue),
+            "stt": Gate("stt", stt, max_queue),
+            "llm": Gate("llm", llm, max_queue),
+        }
+        self._lock = threading.Lock()
+
+    @property
+    def total_slots(self) -> int:
+        return sum(g.slots for g in self.gates.values())
+
+    def admit(self, resources: Iterable[str]) -> Reservation:
+        """Reserve a place at each gate, or raise GateFull if any backlog is at its limit."""
+        wanted = set(resources)
+        with self._lock:
+            for name in sorted(wanted):
+                gate = self.gates[name]
+                if gate.depth >= gate.max_queue:
+                    raise GateFull(name, gate.retry_after())
+            for name in wanted:
+                gate = self.gates[name]
+                with gate._cond:
+                    gate.reserved += 1
+        return Reservation(self, wanted)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        return {name: g.stats() for name, g in self.gates.items()}
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+artifacts.py
+────────────
+One place for per-run output folders (server jobs and GUI runs alike).
+
+• Runs live under VOCIUS_ARTIFACT_DIR/<kind>_<timestamp>_<rand>/ and are
+  recorded in a small SQLite index (id → path, bytes, timestamps, pin), so
+  lookups and eviction never walk the filesystem.
+• When a run is finalized its size is recorded and the store is trimmed:
+  runs idle longer than VOCIUS_ARTIFACT_TTL_SEC go first, then least-recently
+  used runs until the total fits VOCIUS_ARTIFACT_QUOTA_MB.
+• Pinned runs, the VOCIUS_ARTIFACT_KEEP_RECENT newest runs and runs still in
+  progress are never evicted.
+• Download bundles (.zip) are cached per run and evicted with it.
+• Given the server's ContentStore, its blobs and WAVs count against the
+  quota too: finalize records which of them a run hard-links (content_refs),
+  so the total is a query rather than a walk of the store.  Passes that
+  delete runs then collect the ones that no remaining run links.
+• Runs created for a signed-in user record their owner (user_id).
+"""
+
+from __future__ import annotations
+
+import os
+import secrets
+import shutil
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from content_store import ContentStore
+
+ARTIFACT_DIR         = Path(os.getenv("VOCIUS_ARTIFACT_DIR", str(Path(__file__).resolve().parent / "runs")))
+ARTIFACT_QUOTA_MB    = int(os.getenv("VOCIUS_ARTIFACT_QUOTA_MB", "5120"))
+ARTIFACT_TTL_SEC     = int(os.getenv("VOCIUS_ARTIFACT_TTL_SEC", str(7 * 24 * 3600)))
+ARTIFACT_KEEP_RECENT = int(os.getenv("VOCIUS_ARTIFACT_KEEP_RECENT", "20"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id          TEXT PRIMARY KEY,
+    kind        TEXT NOT NULL,
+    path        TEXT NOT NULL,
+    bytes       INTEGER NOT NULL DEFAULT 0,
+    status      TEXT NOT NULL DEFAULT 'active',   -- active | done
+    pinned      INTEGER NOT NULL DEFAULT 0,
+    created_at  REAL NOT NULL,
+    last_access REAL NOT NULL,
+    user_id     INTEGER
+);
+CREATE INDEX IF NOT EXISTS runs_last_access ON runs (last_access);
+CREATE TABLE IF NOT EXISTS content_refs (
+    run_id  TEXT NOT NULL,
+    inode   TEXT NOT NULL,                        -- "<st_dev>:<st_ino>" of a content-store file
+    bytes   INTEGER NOT NULL,
+    PRIMARY KEY (run_id, inode)
+);
+CREATE INDEX IF NOT EXISTS content_refs_inode ON content_refs (inode);
+"""
+
+
+@dataclass
+class Run:
+    id: str
+    kind: str
+    path: Path
+    bytes: int
+    status: str
+    pinned: bool
+    created_at: float
+    last_access: float
+    user_id: Optional[int] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {**self.__dict__, "path": str(self.path)}
+
+
+def _scan(p: Path) -> Tuple[int, Dict[str, int]]:
+    """(bytes owned by the run, inode → size of the hard links it holds into content_store)."""
+    total, linked = 0, {}
+    for root, _dirs, files in os.walk(p):
+        for name in files:
+            try:
+                st = os.stat(os.path.join(root, name))
+            except OSError:
+                continue
+            if st.st_nlink <= 1:
+                total += st.st_size
+            else:                         # hard links into content_store don't free space here
+                linked[f"{st.st_dev}:{st.st_ino}"] = st.st_size
+    return total, linked
+
+
+def _dir_bytes(p: Path) -> int:
+    return _scan(p)[0]
+
+
+class ArtifactStore:
+    def __init__(self, root: Path = ARTIFACT_DIR, quota_mb: int = ARTIFACT_QUOTA_MB,
+                 ttl_sec: int = ARTIFACT_TTL_SEC, keep_recent: int = ARTIFACT_KEEP_RECENT,
+                 content: Optional["ContentStore"] = None):
+        self.root = Path(root)
+        self.content = content
+        self.bundles_dir = self.root / ".bundles"
+        self.bundles_dir.mkdir(parents=True, exist_ok=True)
+        self.quota_bytes = quota_mb * 1024 * 1024
+        self.ttl_sec = ttl_sec
+        self.keep_recent = keep_recent
+        self._lock = threading.Lock()
+        with self._db() as db:
+            db.executescript(_SCHEMA)
+            if "user_id" not in {c["name"] for c in db.execute("PRAGMA table_info(runs)")}:
+                db.execute("ALTER TABLE runs ADD COLUMN user_id INTEGER")   # index from before owners
+
+    @contextmanager
+    def _db(self) -> Iterator[sqlite3.Connection]:
+        db = sqlite3.connect(self.root / "index.db", timeout=30)
+        db.row_factory = sqlite3.Row
+        try:
+            with db:                 # commit on success, roll back on error
+                yield db
+        finally:
+            db.close()
+
+    @staticmethod
+    def _row(r: sqlite3.Row) -> Run:
+        return Run(r["id"], r["kind"], Path(r["path"]), r["bytes"], r["status"],
+                   bool(r["pinned"]), r["created_at"], r["last_access"], r["user_id"])
+
+    # ---------- lifecycle ------------------------------------------------------
+    def create(self, kind: str, user_id: Optional[int] = None) -> Run:
+        ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+        run_id = f"{kind}_{ts}_{secrets.token_hex(3)}"
+        path = self.root / run_id
+        path.mkdir(parents=True)
+        now = time.time()
+        with self._db() as db:
+            db.execute("INSERT INTO runs (id, kind, path, created_at, last_access, user_id) VALUES (?,?,?,?,?,?)",
+                       (run_id, kind, str(path), now, now, user_id))
+        return Run(run_id, kind, path, 0, "active", False, now, now, user_id)
+
+    def finalize(self, run_id: str) -> Optional[Run]:
+        """Record the finished run's size, then trim the store to quota."""
+        run = self.get(run_id, touch=False)
+        if run is None:
+            return None
+        size, linked = _scan(run.path) if run.path.exists() else (0, {})
+        with self._db() as db:
+            db.execute("UPDATE runs SET bytes=?, status='done', last_access=? WHERE id=?",
+                       (size, time.time(), run_id))
+            if self.content is not None:
+                db.executemany("INSERT OR REPLACE INTO content_refs (run_id, inode, bytes) VALUES (?,?,?)",
+                               [(run_id, ino, n) for ino, n in linked.items()])
+        self.evict()
+        return self.get(run_id, touch=False)
+
+    def get(self, run_id: str, touch: bool = True) -> Optional[Run]:
+        with self._db() as db:
+            if touch:
+                db.execute("UPDATE runs SET last_access=? WHERE id=?", (time.time(), run_id))
+            r = db.execute("SELECT * FROM runs WHERE id=?", (run_id,)).fetchone()
+        return self._row(r) if r else None
+
+    def discard(self, run_id: str) -> None:
+        """Delete a run that turned out to be unneeded (e.g. a coalesced duplicate submission)."""
+        run = self.get(run_id, touch=False)
+        if run is None:
+            return
+        with self._db() as db:
+            self._forget(db, run_id)
+        self._delete(run)
+        if self.content is not None:
+            self.content.gc()
+
+    def pin(self, run_id: str, pinned: bool = True) -> Optional[Run]:
+        with self._db() as db:
+            db.execute("UPDATE runs SET pinned=? WHERE id=?", (int(pinned), run_id))
+        return self.get(run_id, touch=False)
+
+    def bundle(self, run_id: str) -> Optional[Path]:
+        """Zip of the run folder, built once and counted against the quota."""
+        run = self.get(run_id)
+        if run is None or not run.path.exists():
+            return None
+        zip_path = self.bundles_dir / f"{run_id}.zip"
+        if not zip_path.exists() or zip_path.stat().st_mtime < run.path.stat().st_mtime:
+            tmp = self.bundles_dir / f"{run_id}.{secrets.token_hex(3)}"
+            archive = Path(shutil.make_archive(str(tmp), "zip", root_dir=str(run.path)))
+            os.replace(archive, zip_path)
+            with self._db() as db:
+                db.execute("UPDATE runs SET bytes=? WHERE id=?",
+                           (_dir_bytes(run.path) + zip_path.stat().st_size, run_id))
+        return zip_path
+
+    # ---------- eviction -------------------------------------------------------
+    def evict(self) -> List[str]:
+        """Drop expired runs, then LRU runs until under quota. Returns evicted ids."""
+        with self._lock, self._db() as db:
+            now = time.time()
+            recent = {r["id"] for r in db.execute(
+                "SELECT id FROM runs WHERE status='done' ORDER BY created_at DESC LIMIT ?", (self.keep_recent,))}
+            candidates = [self._row(r) for r in db.execute(
+                "SELECT * FROM runs WHERE pinned=0 ORDER BY last_access ASC")]
+            total = db.execute("SELECT COALESCE(SUM(bytes), 0) FROM runs").fetchone()[0] + self._content_bytes(db)
+
+            evicted: List[str] = []
+            for run in candidates:
+                if run.id in recent:
+                    continue
+                expired = now - run.last_access > self.ttl_sec
+                if run.status == "active" and not expired:
+                    continue                       # still being written (stale ones expire)
+                if not expired and total <= self.quota_bytes:
+                    continue
+                total -= run.bytes + self._forget(db, run.id)
+                self._delete(run)
+                evicted.append(run.id)
+        if self.content is not None and evicted:
+            self.content.gc()
+        return evicted
+
+    @staticmethod
+    def _content_bytes(db: sqlite3.Connection) -> int:
+        """Bytes of content-store files linked by at least one finalized run."""
+        return db.execute("SELECT COALESCE(SUM(bytes), 0) FROM "
+                          "(SELECT MAX(bytes) bytes FROM content_refs GROUP BY inode)").fetchone()[0]
+
+    @staticmethod
+    def _forget(db: sqlite3.Connection, run_id: str) -> int:
+        """Drop the run from the index; returns the content-store bytes only it linked."""
+        shared = db.execute(
+            "SELECT COALESCE(SUM(bytes), 0) FROM content_refs c WHERE run_id=? AND NOT EXISTS "
+            "(SELECT 1 FROM content_refs o WHERE o.inode=c.inode AND o.run_id<>c.run_id)",
+            (run_id,)).fetchone()[0]
+        db.execute("DELETE FROM content_refs WHERE run_id=?", (run_id,))
+        db.execute("DELETE FROM runs WHERE id=?", (run_id,))
+        return shared
+
+    def _delete(self, run: Run) -> None:
+        shutil.rmtree(run.path, ignore_errors=True)
+        bundle = self.bundles_dir / f"{run.id}.zip"
+        if bundle.exists():
+            bundle.unlink()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._db() as db:
+            r = db.execute("SELECT COUNT(*) n, COALESCE(SUM(bytes),0) b, COALESCE(SUM(pinned),0) p FROM runs").fetchone()
+            content = self._content_bytes(db)
+        return {"runs": r["n"], "bytes": r["b"], "content_bytes": content,
+                "pinned": r["p"], "quota_bytes": self.quota_bytes,
+                "ttl_sec": self.ttl_sec, "keep_recent": self.keep_recent}
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+audio_fingerprint.py
+────────────────────
+Perceptual fingerprints for recordings, so a round that arrives twice (as an
+.m4a from one coach and a re-exported .wav from another) reuses the first
+upload's transcript and diarization instead of paying for STT again.
+
+Byte hashes (content_store / stt_cache) only catch identical files.  This
+module works on the 16 kHz mono WAV the pipelines already produce:
+
+• fingerprint(): log spectrogram (NumPy, processed in blocks), the strongest
+  local peak per speech band (250 Hz–4 kHz), and hashes of peak pairs
+  (f1, f2, Δt).  Peaks are relative to their neighbourhood, so gain changes
+  and codec artefacts leave most hashes intact.
+• Index: SQLite table of hash → (recording, frame).  match() votes on the
+  frame offset between query and indexed hashes, so a trimmed copy still lines
+  up (the winning offset is reported as offset_sec; timed results such as
+  diarization are only reused when it is under VOCIUS_FP_MAX_SHIFT_SEC and
+  the durations differ by at most VOCIUS_FP_MAX_TIMED_TRIM_SEC).
+• resolve(): the canonical content hash for a recording — an earlier upload's
+  sha when the fingerprint matches, otherwise its own (and it gets indexed).
+  Pipelines pass that sha as --audio-sha256, so stt_cache hits.
+
+Usage:
+  python audio_fingerprint.py round.wav other.wav          # compare two recordings
+  python audio_fingerprint.py --index fp.db round.wav ...  # match against / add to an index
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sqlite3
+import time
+import wave
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+
+SAMPLE_RATE = 16_000
+N_FFT       = 1024                       # 15.6 Hz bins
+HOP         = 512                        # 32 ms frames
+BLOCK_SEC   = 60                         # audio decoded and transformed per block
+BAND_EDGES  = (16, 26, 40, 64, 100, 160, 256)   # FFT bins: 250 Hz … 4 kHz, log-spaced
+PEAK_RADIUS = 12                         # frames: a peak is the band max within ±0.38 s
+PEAK_MIN_DB = 6.0                        # above the band's median level in its block
+FAN_OUT     = 3                          # pairs per anchor peak
+MAX_DT      = 63                         # frames (~2 s) between paired peaks
+
+MIN_HITS      = int(os.getenv("VOCIUS_FP_MIN_HITS", "20"))        # aligned hashes for a match
+MIN_RATIO     = float(os.getenv("VOCIUS_FP_MIN_RATIO", "0.08"))   # of the query's hashes
+MAX_TRIM_SEC  = float(os.getenv("VOCIUS_FP_MAX_TRIM_SEC", "10"))  # duration difference tolerated
+MAX_SHIFT_SEC = float(os.getenv("VOCIUS_FP_MAX_SHIFT_SEC", "0.25")) # timestamps still usable as-is
+MAX_TIMED_TRIM_SEC = float(os.getenv("VOCIUS_FP_MAX_TIMED_TRIM_SEC", "0.5"))  # ... if the lengths agree too
+QUERY_HASHES  = 20_000                                            # hashes sampled per lookup
+
+FRAME_SEC = HOP / SAMPLE_RATE
+
+
+@dataclass
+class Fingerprint:
+    hashes: np.ndarray      # uint32, one per peak pair
+    frames: np.ndarray      # int32, anchor frame of each hash
+    seconds: float
+
+
+@dataclass
+class Match:
+    sha256: str             # canonical content hash of the matched recording
+    score: float            # aligned hashes / query hashes
+    hits: int
+    offset_sec: float       # query time + offset_sec = matched recording's time
+    trim_sec: float = 0.0   # query duration - matched recording's duration
+
+    @property
+    def aligned(self) -> bool:
+        """Whether the match's word/speaker timestamps fit this recording without shifting."""
+        return abs(self.offset_sec) <= MAX_SHIFT_SEC and abs(self.trim_sec) <= MAX_TIMED_TRIM_SEC
+
+
+def read_wav(path: Path) -> Iterator[np.ndarray]:
+    """Yield float32 blocks of a 16 kHz mono 16-bit WAV (what ensure_16k_wav / normalized_wav write)."""
+    with wave.open(str(path), "rb") as w:
+        if w.getframerate() != SAMPLE_RATE or w.getnchannels() != 1 or w.getsampwidth() != 2:
+            raise ValueError(f"{path} is not 16 kHz mono 16-bit PCM")
+        while True:
+            raw = w.readframes(BLOCK_SEC * SAMPLE_RATE)
+            if not raw:
+                return
+            yield np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768.0
+
+
+def _peaks(y: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """(frame, bin) of spectral peaks in one block of audio."""
+    frames = np.lib.stride_tricks.sliding_window_view(y, N_FFT)[::HOP]
+    spec = np.abs(np.fft.rfft(frames * np.hanning(N_FFT).astype(np.float32), axis=1))
+    db = 20.0 * np.log10(spec[:, BAND_EDGES[0]:BAND_EDGES[-1]] + 1e-6)
+
+    ts, fs = [], []
+    for lo, hi in zip(BAND_EDGES, BAND_EDGES[1:]):
+        band = db[:, lo - BAND_EDGES[0]:hi - BAND_EDGES[0]]
+        level = band.max(axis=1)
+        pad = np.pad(level, PEAK_RADIUS, constant_values=-np.inf)
+        local = np.lib.stride_tricks.sliding_window_view(pad, 2 * PEAK_RADIUS + 1).max(axis=1)
+        t = np.flatnonzero((level == local) & (level > np.median(level) + PEAK_MIN_DB))
+        ts.append(t)
+        fs.append(band[t].argmax(axis=1) + lo - BAND_EDGES[0])
+    t, f = np.concatenate(ts), np.concatenate(fs)
+    order = np.lexsort((f, t))
+    return t[order], f[order]
+
+
+def fingerprint(wav: Path) -> Fingerprint:
+    ts, fs = [], []
+    offset = 0                                     # frames before the current block
+    carry = np.zeros(0, dtype=np.float32)
+    samples = 0
+    for block in read_wav(wav):
+        samples += len(block)
+        y = np.concatenate([carry, block])
+        if len(y) >= N_FFT:
+            t, f = _peaks(y)
+            ts.append(t + offset)
+            fs.append(f)
+            n = (len(y) - N_FFT) // HOP + 1
+            offset += n
+            carry = y[n * HOP:]
+        else:
+            carry = y
+    if not ts:
+        return Fingerprint(np.zeros(0, np.uint32), np.zeros(0, np.int32), samples / SAMPLE_RATE)
+    t, f = np.concatenate(ts), np.concatenate(fs)
+
+    # Pair each anchor with the next FAN_OUT peaks: hash = f1 | f2 | Δt in 22 bits.
+    hashes, anchors = [], []
+    for k in range(1, FAN_OUT + 1):
+        dt = t[k:] - t[:-k]
+        ok = (dt > 0) & (dt <= MAX_DT)
+        hashes.append((f[:-k][ok].astype(np.uint32) << 14) | (f[k:][ok].astype(np.uint32) << 6)
+                      | dt[ok].astype(np.uint32))
+        anchors.append(t[:-k][ok])
+    return Fingerprint(np.concatenate(hashes), np.concatenate(anchors).astype(np.int32),
+                       samples / SAMPLE_RATE)
+
+
+def compare(a: Fingerprint, b: Fingerprint) -> Tuple[float, float]:
+    """(score, offset_sec) of *a* aligned against *b*, without an index."""
+    order = np.argsort(b.hashes, kind="stable")
+    bh, bt = b.hashes[order], b.frames[order]
+    lo = np.searchsorted(bh, a.hashes, "left")
+    hi = np.searchsorted(bh, a.hashes, "right")
+    reps = hi - lo
+    if not reps.sum():
+        return 0.0, 0.0
+    idx = np.repeat(lo - np.cumsum(reps) + reps, reps) + np.arange(reps.sum())
+    deltas = bt[idx] - np.repeat(a.frames, reps)
+    hits, delta = _best_offset(deltas, np.ones(len(deltas), dtype=np.int64))
+    return hits / max(1, len(a.hashes)), delta * FRAME_SEC
+
+
+def _best_offset(deltas: np.ndarray, counts: np.ndarray) -> Tuple[int, int]:
+    """Vote on offsets, letting neighbours (±1 frame, from a trim that is not a multiple of HOP) count."""
+    uniq, inv = np.unique(deltas, return_inverse=True)
+    votes = np.bincount(inv, weights=counts)
+    smoothed = votes.copy()
+    for shift in (-1, 1):
+        j = np.minimum(np.searchsorted(uniq, uniq + shift), len(uniq) - 1)
+        smoothed += np.where(uniq[j] == uniq + shift, votes[j], 0)
+    best = int(smoothed.argmax())
+    return int(smoothed[best]), int(uniq[best])
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS fp_recordings (
+    id         INTEGER PRIMARY KEY,
+    sha256     TEXT NOT NULL UNIQUE,
+    canonical  TEXT NOT NULL,              -- sha256 whose transcripts this recording reuses
+    offset_sec REAL NOT NULL DEFAULT 0,    -- this recording's time + offset = canonical's time
+    seconds    REAL NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS fp_hashes (
+    hash      INTEGER NOT NULL,
+    recording INTEGER NOT NULL,
+    frame     INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_fp_hashes_hash ON fp_hashes (hash);
+"""
+
+
+class Index:
+    """Fingerprint lookup table; only canonical recordings store hashes, aliases just point at them."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path).expanduser()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._db() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(_SCHEMA)
+
+    @contextmanager
+    def _db(self) -> Iterator[sqlite3.Connection]:
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def known(self, sha: str) -> Optional[Match]:
+        """Earlier resolution of exactly these bytes, if any."""
+        with self._db() as db:
+            row = db.execute(
+                "SELECT r.canonical, r.offset_sec, r.seconds - COALESCE(c.seconds, r.seconds)"
+                " FROM fp_recordings r LEFT JOIN fp_recordings c ON c.sha256 = r.canonical"
+                " WHERE r.sha256 = ?", (sha,)).fetchone()
+        return Match(row[0], 1.0, 0, row[1], row[2]) if row else None
+
+    def match(self, fp: Fingerprint) -> Optional[Match]:
+        if len(fp.hashes) < MIN_HITS:
+            return None
+        step = max(1, len(fp.hashes) // QUERY_HASHES)
+        q = list(zip(fp.hashes[::step].tolist(), fp.frames[::step].tolist()))
+        with self._db() as db:
+            db.execute("CREATE TEMP TABLE q (hash INTEGER, frame INTEGER)")
+            db.executemany("INSERT INTO q VALUES (?, ?)", q)
+            rows = db.execute(
+                "SELECT h.recording, h.frame - q.frame AS delta, COUNT(*) FROM q"
+                " JOIN fp_hashes h ON h.hash = q.hash GROUP BY h.recording, delta").fetchall()
+            recs = {r[0]: r[1:] for r in db.execute(
+                "SELECT id, sha256, seconds FROM fp_recordings WHERE canonical = sha256")}
+        if not rows:
+            return None
+        arr = np.array(rows, dtype=np.int64)
+        best: Optional[Match] = None
+        for rec in np.unique(arr[:, 0]).tolist():
+            sha, seconds = recs.get(rec, (None, 0.0))
+            if sha is None or abs(seconds - fp.seconds) > MAX_TRIM_SEC:
+                continue
+            sel = arr[arr[:, 0] == rec]
+            hits, delta = _best_offset(sel[:, 1], sel[:, 2])
+            score = hits / len(q)
+            if hits >= MIN_HITS and score >= MIN_RATIO and (best is None or score > best.score):
+                best = Match(sha, score, hits, delta * FRAME_SEC, fp.seconds - seconds)
+        return best
+
+    def add(self, sha: str, fp: Fingerprint, alias: Optional[Match] = None) -> None:
+        with self._db() as db:
+            cur = db.execute(
+                "INSERT OR IGNORE INTO fp_recordings (sha256, canonical, offset_sec, seconds, created_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (sha, alias.sha256 if alias else sha, alias.offset_sec if alias else 0.0,
+                 fp.seconds, time.time()))
+            if cur.rowcount and alias is None:
+                db.executemany("INSERT INTO fp_hashes (hash, recording, frame) VALUES (?, ?, ?)",
+                               zip(fp.hashes.tolist(), [cur.lastrowid] * len(fp.hashes),
+                                   fp.frames.tolist()))
+
+    def resolve(self, wav: Path, sha: str) -> Match:
+        """Canonical recording for *wav* (content hash *sha*); indexes it when it is new."""
+        known = self.known(sha)
+        if known is not None:
+            return known
+        fp = fingerprint(wav)
+        m = self.match(fp)
+        self.add(sha, fp, m)
+        return m or Match(sha, 1.0, len(fp.hashes), 0.0)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Perceptual audio fingerprints (16 kHz mono WAV input)")
+    ap.add_argument("wavs", nargs="+", type=Path)
+    ap.add_argument("--index", type=Path, help="Match against (and add to) this index instead of comparing")
+    args = ap.parse_args()
+
+    if args.index:
+        import stt_cache
+        idx = Index(args.index)
+        for wav in args.wavs:
+            m = idx.resolve(wav, stt_cache.file_sha256(wav))
+            print(f"{wav}: {m.sha256[:12]}  score {m.score:.2f}  offset {m.offset_sec:+.2f}s")
+        return
+
+    if len(args.wavs) != 2:
+        ap.error("give two recordings to compare, or --index")
+    a, b = (fingerprint(w) for w in args.wavs)
+    score, offset = compare(a, b)
+    print(f"{len(a.hashes)} / {len(b.hashes)} hashes, score {score:.2f}, offset {offset:+.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,22 @@
 # auth.py
 from __future__ import annotations
+import asyncio
+import atexit
 import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
 
 import jwt
 from fastapi import APIRouter, Depends, HTTPException, Header, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import RedirectResponse
 from passlib.context import CryptContext
+from sqlalchemy import Index, and_, bindparam, case, event, func, or_, update
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlmodel import SQLModel, Field, Session, create_engine, select
 
 # ───────── Config ─────────
@@ -15,13 +24,68 @@ JWT_SECRET = os.getenv("JWT_SECRET", "dev-secret-change-me")
 JWT_ALG = "HS256"
 ACCESS_TOKEN_MIN = int(os.getenv("ACCESS_TOKEN_MIN", "120"))
 DB_URL = os.getenv("DB_URL", "sqlite:///./vocius.db")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))          # server databases only
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+SQLITE_BUSY_MS = int(os.getenv("SQLITE_BUSY_MS", "5000"))
 AUTH_REQUIRED = os.getenv("AUTH_REQUIRED", "false").lower() == "true"
-
-_engine_kwargs = {"connect_args": {"check_same_thread": False}} if DB_URL.startswith("sqlite") else {}
-engine = create_engine(DB_URL, echo=False, **_engine_kwargs)
-pwd = CryptContext(schemes=["bcrypt"], deprecated="auto")
+PRINCIPAL_TTL_SEC = int(os.getenv("PRINCIPAL_TTL_SEC", "60"))
+PRINCIPAL_CACHE_MAX = int(os.getenv("PRINCIPAL_CACHE_MAX", "10000"))
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", "2"))       # concurrent bcrypt calls
+LAST_LOGIN_FLUSH_SEC = float(os.getenv("LAST_LOGIN_FLUSH_SEC", "5"))
+LAST_LOGIN_BATCH = int(os.getenv("LAST_LOGIN_BATCH", "200"))
+
+_ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg",
+                  "postgres": "postgresql+asyncpg"}
+
+def _async_url(url: str) -> str:
+    scheme, sep, rest = url.partition("://")
+    return f"{_ASYNC_DRIVERS[scheme]}{sep}{rest}" if scheme in _ASYNC_DRIVERS else ""
+
+ASYNC_DB_URL = os.getenv("ASYNC_DB_URL") or _async_url(DB_URL)
+
+def _engine_kwargs(url: str) -> dict:
+    if url.startswith("sqlite"):
+        return {"connect_args": {"check_same_thread": False, "timeout": SQLITE_BUSY_MS / 1000}}
+    return {"pool_size": DB_POOL_SIZE, "max_overflow": DB_MAX_OVERFLOW,
+            "pool_timeout": DB_POOL_TIMEOUT, "pool_pre_ping": True}
+
+def _sqlite_pragmas(sync_engine) -> None:
+    """WAL lets readers run alongside the last_login writers; busy_timeout waits instead of 'database is locked'."""
+    @event.listens_for(sync_engine, "connect")
+    def _on_connect(dbapi_conn, _record):
+        cur = dbapi_conn.cursor()
+        cur.execute("PRAGMA journal_mode=WAL")
+        cur.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_MS}")
+        cur.execute("PRAGMA synchronous=NORMAL")
+        cur.close()
+
+engine = create_engine(DB_URL, echo=False, **_engine_kwargs(DB_URL))
+if DB_URL.startswith("sqlite"):
+    _sqlite_pragmas(engine)
+
+# Async engine for the async OAuth callbacks; needs aiosqlite / asyncpg, otherwise
+# those callbacks run the sync session in the threadpool.
+async_engine = None
+if ASYNC_DB_URL:
+    try:
+        from sqlalchemy.ext.asyncio import create_async_engine
+        from sqlmodel.ext.asyncio.session import AsyncSession
+        async_engine = create_async_engine(ASYNC_DB_URL, echo=False, **_engine_kwargs(ASYNC_DB_URL))
+        if ASYNC_DB_URL.startswith("sqlite"):
+            _sqlite_pragmas(async_engine.sync_engine)
+    except ImportError:
+        async_engine = None
+pwd = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+# bcrypt runs here rather than in Starlette's threadpool, so a login burst
+# queues behind HASH_WORKERS threads instead of starving the analysis routes.
+_hash_pool = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="bcrypt")
 
 class User(SQLModel, table=True):
+    # /auth/admin/users pages newest-first on (created_at, id)
+    __table_args__ = (Index("ix_user_created_at_id", "created_at", "id"),)
+
     id: int | None = Field(default=None, primary_key=True)
     username: str | None = Field(default=None, unique=True, index=True)
     email: str | None = Field(default=None, unique=True, index=True)
@@ -34,6 +98,8 @@ class User(SQLModel, table=True):
 
 def init_db():
     SQLModel.metadata.create_all(engine)
+    for ix in User.__table__.indexes:        # create_all skips indexes on a pre-existing table
+        ix.create(engine, checkfirst=True)
 
 init_db()
 
@@ -43,6 +109,15 @@ def _hash(pw: str) -> str:
 def _verify(pw: str, h: str | None) -> bool:
     return bool(h) and pwd.verify(pw, h)
 
+def _verify_and_update(pw: str, h: str | None) -> tuple[bool, str | None]:
+    """(ok, new_hash) — new_hash is set when *h* was made with a different BCRYPT_ROUNDS."""
+    if not h:
+        return False, None
+    return pwd.verify_and_update(pw, h)
+
+async def _in_hash_pool(fn, *args):
+    return await asyncio.wrap_future(_hash_pool.submit(fn, *args))
+
 def _make_token(user: User) -> str:
     payload = {
         "uid": user.id,
@@ -61,10 +136,182 @@ def _decode(token: str) -> dict:
     except Exception:
         raise HTTPException(status_code=401, detail="Invalid token")
 
+# ───────── Principal cache ─────────
+class _PrincipalCache:
+    """(uid, token iat) → User, bounded LRU with a TTL. Entries are read-only detached rows."""
+
+    def __init__(self, ttl_sec: int, max_entries: int):
+        self.ttl_sec = ttl_sec
+        self.max_entries = max_entries
+        self._items: "OrderedDict[tuple, tuple[float, User]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> Optional[User]:
+        with self._lock:
+            hit = self._items.get(key)
+            if hit is None:
+                return None
+            expires, user = hit
+            if expires < time.monotonic():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return user
+
+    def put(self, key: tuple, user: User) -> None:
+        if self.ttl_sec <= 0:
+            return
+        with self._lock:
+            self._items[key] = (time.monotonic() + self.ttl_sec, user)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def invalidate(self, uid: Optional[int] = None) -> None:
+        with self._lock:
+            if uid is None:
+                self._items.clear()
+            else:
+                for key in [k for k in self._items if k[0] == uid]:
+                    del self._items[key]
+
+_principals = _PrincipalCache(PRINCIPAL_TTL_SEC, PRINCIPAL_CACHE_MAX)
+
+def invalidate_principal(uid: Optional[int] = None) -> None:
+    """Drop cached principals for *uid* (or everyone). Call after changing a user's role or profile."""
+    _principals.invalidate(uid)
+
+# ───────── last_login write-behind ─────────
+class _LastLoginBuffer:
+    """Collects sign-in timestamps and writes them in one bulk UPDATE every
+    LAST_LOGIN_FLUSH_SEC or LAST_LOGIN_BATCH users, so sign-in has no write transaction."""
+
+    def __init__(self, flush_sec: float, batch: int):
+        self.flush_sec = flush_sec
+        self.batch = batch
+        self._pending: dict[int, datetime] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def touch(self, user: User) -> None:
+        now = datetime.utcnow()
+        user.last_login = now
+        with self._lock:
+            self._pending[user.id] = now
+            full = len(self._pending) >= self.batch
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="last-login-flush", daemon=True)
+                self._thread.start()
+        if full:
+            self._wake.set()
+
+    def pending(self, uid: int) -> Optional[datetime]:
+        with self._lock:
+            return self._pending.get(uid)
+
+    def flush(self) -> int:
+        with self._lock:
+            batch, self._pending = self._pending, {}
+        if not batch:
+            return 0
+        # Never move last_login backwards (an upsert may have stamped a newer one meanwhile).
+        stmt = (update(User)
+                .where(User.id == bindparam("uid"),
+                       or_(User.last_login.is_(None), User.last_login < bindparam("ts")))
+                .values(last_login=bindparam("ts")))
+        try:
+            with engine.begin() as conn:
+                conn.execute(stmt, [{"uid": uid, "ts": ts} for uid, ts in batch.items()])
+        except Exception as e:
+            print(f"[auth] last_login flush failed, will retry: {e}")
+            with self._lock:
+                for uid, ts in batch.items():
+                    if uid not in self._pending or self._pending[uid] < ts:
+                        self._pending[uid] = ts
+            return 0
+        return len(batch)
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait(self.flush_sec)
+            self._wake.clear()
+            self.flush()
+
+_last_logins = _LastLoginBuffer(LAST_LOGIN_FLUSH_SEC, LAST_LOGIN_BATCH)
+
+def flush_last_logins() -> int:
+    """Write buffered last_login stamps now; called on shutdown."""
+    return _last_logins.flush()
+
+atexit.register(flush_last_logins)
+
 def _get_user_by_identifier(session: Session, ident: str) -> Optional[User]:
     stmt = select(User).where((User.username == ident) | (User.email == ident))
     return session.exec(stmt).first()
 
+# ───────── Single-statement upserts ─────────
+_have_users = False   # flips once the table is non-empty; then new users skip the first-admin subquery
+
+def _insert():
+    """Dialect INSERT with ON CONFLICT support (SQLite ≥ 3.35 or Postgres)."""
+    return {"sqlite": sqlite.insert, "postgresql": postgresql.insert}[engine.dialect.name](User)
+
+def _new_user_role():
+    if _have_users:
+        return "user"
+    # Evaluated inside the INSERT, so two concurrent first sign-ups can't both become admin.
+    return case((select(User.id).exists(), "user"), else_="admin")
+
+def _insert_user_stmt(**values):
+    """INSERT … ON CONFLICT DO NOTHING RETURNING the row (None on a username/email clash)."""
+    values.setdefault("created_at", datetime.utcnow())
+    return (_insert().values(role=_new_user_role(), **values)
+            .on_conflict_do_nothing().returning(User))
+
+def _upsert_login_stmt(email: str, username: str, name: str | None, provider: str,
+                       refresh_profile: bool = False):
+    """Create the user or stamp last_login on the existing one, returning the row."""
+    now = datetime.utcnow()
+    stmt = _insert().values(username=username, email=email, name=name, provider=provider,
+                            role="user", created_at=now, last_login=now)
+    update = {"last_login": stmt.excluded.last_login}
+    if refresh_profile:
+        update["name"] = func.coalesce(User.name, stmt.excluded.name)
+        update["provider"] = stmt.excluded.provider
+    return (stmt.on_conflict_do_update(index_elements=[User.email], set_=update).returning(User)
+            .execution_options(populate_existing=True))
+
+def _oauth_login_sync(email: str, username: str, name: str | None, provider: str) -> User:
+    global _have_users
+    with Session(engine, expire_on_commit=False) as s:
+        user = s.exec(select(User).where(User.email == email)).first()
+        if user is None:
+            user = s.scalars(_upsert_login_stmt(email, username, name, provider)).one()
+            s.commit()
+            _have_users = True
+            return user
+    _last_logins.touch(user)
+    return user
+
+async def _oauth_login(email: str, username: str, name: str | None, provider: str) -> User:
+    """Find-or-create the OAuth user without blocking the event loop.
+
+    Returning users are a single read; last_login goes through the write-behind buffer.
+    """
+    global _have_users
+    if async_engine is None:
+        return await run_in_threadpool(_oauth_login_sync, email, username, name, provider)
+    async with AsyncSession(async_engine, expire_on_commit=False) as s:
+        user = (await s.exec(select(User).where(User.email == email))).first()
+        if user is None:
+            user = (await s.scalars(_upsert_login_stmt(email, username, name, provider))).one()
+            await s.commit()
+            _have_users = True
+            return user
+    _last_logins.touch(user)
+    return user
+
 def require_user(authorization: str = Header(None)) -> User:
     if not authorization:
         raise HTTPException(status_code=401, detail="Missing Authorization")
@@ -72,11 +319,16 @@ def require_user(authorization: str = Header(None)) -> User:
     if scheme.lower() != "bearer" or not token:
         raise HTTPException(status_code=401, detail="Invalid Authorization header")
     payload = _decode(token)
+    key = (payload.get("uid"), payload.get("iat"))
+    user = _principals.get(key)
+    if user is not None:
+        return user
     with Session(engine) as s:
         user = s.get(User, payload.get("uid"))
         if not user:
             raise HTTPException(status_code=401, detail="User not found")
-        return user
+    _principals.put(key, user)
+    return user
 
 def require_user_optional(authorization: str = Header(None)) -> Optional[User]:
     if not authorization:
@@ -94,8 +346,37 @@ def require_admin(user: User = Depends(require_user)) -> User:
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 # ───────── Local (optional) ─────────
+# Blocking DB work of the async password routes; run via run_in_threadpool so a
+# locked SQLite file (SQLITE_BUSY_MS) stalls only that request, not the event loop.
+def _register_sync(username: str, email: str, name: str | None, password_hash: str) -> User:
+    global _have_users
+    with Session(engine, expire_on_commit=False) as s:
+        user = s.scalars(_insert_user_stmt(
+            username=username,
+            email=email,
+            name=name,
+            provider="local",
+            password_hash=password_hash,
+        )).first()
+        s.commit()
+        if user is None:
+            if s.exec(select(User.id).where(User.username == username)).first():
+                raise HTTPException(status_code=409, detail="Username already taken")
+            raise HTTPException(status_code=409, detail="Email already registered")
+    _have_users = True
+    return user
+
+def _find_user_sync(ident: str) -> Optional[User]:
+    with Session(engine) as s:
+        return _get_user_by_identifier(s, ident)
+
+def _store_hash_sync(uid: int, password_hash: str) -> None:
+    with Session(engine) as s:
+        s.exec(update(User).where(User.id == uid).values(password_hash=password_hash))
+        s.commit()
+
 @router.post("/register")
-def register(payload: dict):
+async def register(payload: dict):
     username = (payload.get("username") or "").strip()
     email    = (payload.get("email") or "").strip().lower()
     name     = (payload.get("name") or "").strip() or None
@@ -103,44 +384,33 @@ def register(payload: dict):
     if not username or not email or not password:
         raise HTTPException(status_code=400, detail="username, email, password required")
 
-    with Session(engine) as s:
-        if s.exec(select(User).where(User.username == username)).first():
-            raise HTTPException(status_code=409, detail="Username already taken")
-        if s.exec(select(User).where(User.email == email)).first():
-            raise HTTPException(status_code=409, detail="Email already registered")
-
-        is_first = s.exec(select(User)).first() is None
-        user = User(
-            username=username,
-            email=email,
-            name=name,
-            provider="local",
-            password_hash=_hash(password),
-            role="admin" if is_first else "user",
-        )
-        s.add(user); s.commit(); s.refresh(user)
-        token = _make_token(user)
-        return {"ok": True, "token": token, "user": {
-            "id": user.id, "username": user.username, "email": user.email,
-            "name": user.name, "role": user.role,
-            "created_at": user.created_at.isoformat() + "Z",
-        }}
+    password_hash = await _in_hash_pool(_hash, password)
+    user = await run_in_threadpool(_register_sync, username, email, name, password_hash)
+    token = _make_token(user)
+    return {"ok": True, "token": token, "user": {
+        "id": user.id, "username": user.username, "email": user.email,
+        "name": user.name, "role": user.role,
+        "created_at": user.created_at.isoformat() + "Z",
+    }}
 
 @router.post("/login")
-def login(payload: dict):
+async def login(payload: dict):
     ident = (payload.get("identifier") or "").strip()
     password = payload.get("password") or ""
     if not ident or not password:
         raise HTTPException(status_code=400, detail="identifier and password required")
 
-    with Session(engine) as s:
-        user = _get_user_by_identifier(s, ident)
-        if not user or not _verify(password, user.password_hash):
-            raise HTTPException(status_code=401, detail="Invalid credentials")
-        user.last_login = datetime.utcnow()
-        s.add(user); s.commit()
-        token = _make_token(user)
-        return {"ok": True, "token": token, "user": {
+    user = await run_in_threadpool(_find_user_sync, ident)
+    ok, new_hash = await _in_hash_pool(_verify_and_update, password, user.password_hash if user else None)
+    if not ok:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+
+    if new_hash:
+        await run_in_threadpool(_store_hash_sync, user.id, new_hash)
+    _last_logins.touch(user)
+    invalidate_principal(user.id)
+    token = _make_token(user)
+    return {"ok": True, "token": token, "user": {
             "id": user.id, "username": user.username, "email": user.email,
             "name": user.name, "role": user.role,
             "created_at": user.created_at.isoformat() + "Z",
@@ -148,23 +418,57 @@ def login(payload: dict):
 
 @router.get("/me")
 def me(user: User = Depends(require_user)):
+    last_login = _last_logins.pending(user.id) or user.last_login
     return {"ok": True, "user": {
         "id": user.id, "username": user.username, "email": user.email,
         "name": user.name, "role": user.role,
         "created_at": user.created_at.isoformat() + "Z",
-        "last_login": user.last_login.isoformat() + "Z" if user.last_login else None,
+        "last_login": last_login.isoformat() + "Z" if last_login else None,
     }}
 
+def _user_filters(provider: Optional[str], role: Optional[str]) -> list:
+    conds = []
+    if provider:
+        conds.append(User.provider == provider)
+    if role:
+        conds.append(User.role == role)
+    return conds
+
+def _parse_user_cursor(before: str) -> tuple[datetime, int]:
+    """Cursor is "<created_at ISO>Z,<id>" as returned in `next`."""
+    try:
+        ts, _, uid = before.rpartition(",")
+        return datetime.fromisoformat(ts.rstrip("Z")), int(uid)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 @router.get("/admin/users")
-def list_users(_: User = Depends(require_admin)):
+def list_users(limit: int = 50, before: Optional[str] = None, provider: Optional[str] = None,
+               role: Optional[str] = None, _: User = Depends(require_admin)):
+    """Newest first; pass the previous page's `next` as *before* for the next page."""
+    limit = min(max(limit, 1), 200)
+    stmt = select(User).where(*_user_filters(provider, role))
+    if before:
+        ts, uid = _parse_user_cursor(before)
+        stmt = stmt.where(or_(User.created_at < ts, and_(User.created_at == ts, User.id < uid)))
+    stmt = stmt.order_by(User.created_at.desc(), User.id.desc()).limit(limit)
     with Session(engine) as s:
-        rows = s.exec(select(User).order_by(User.created_at.desc())).all()
+        rows = s.exec(stmt).all()
+        last = rows[-1] if len(rows) == limit else None
         return {"ok": True, "users": [{
             "id": u.id, "username": u.username, "email": u.email, "name": u.name,
             "role": u.role, "created_at": u.created_at.isoformat() + "Z",
             "last_login": u.last_login.isoformat() + "Z" if u.last_login else None,
             "provider": u.provider,
-        } for u in rows]}
+        } for u in rows],
+            "next": f"{last.created_at.isoformat()}Z,{last.id}" if last else None}
+
+@router.get("/admin/users/count")
+def count_users(provider: Optional[str] = None, role: Optional[str] = None,
+                _: User = Depends(require_admin)):
+    stmt = select(func.count()).select_from(User).where(*_user_filters(provider, role))
+    with Session(engine) as s:
+        return {"ok": True, "count": s.exec(stmt).one()}
 
 # ───────── OAuth (Google & GitHub via authlib) ─────────
 from authlib.integrations.starlette_client import OAuth, OAuthError
@@ -219,13 +523,8 @@ async def google_callback(request: Request):
     name = (userinfo.get("name") or userinfo.get("given_name") or "").strip()
     username_guess = email.split("@")[0]
 
-    with Session(engine) as s:
-        user = s.exec(select(User).where(User.email == email)).first()
-        if not user:
-            user = User(username=username_guess, email=email, name=name or None, provider="google", role="user")
-            s.add(user); s.commit(); s.refresh(user)
-        user.last_login = datetime.utcnow()
-        s.add(user); s.commit()
+    user = await _oauth_login(email, username_guess, name or None, "google")
+    invalidate_principal(user.id)
 
     jwt_token = _make_token(user)
     return RedirectResponse(url=f"{FRONTEND_URL}/auth/callback?token={jwt_token}")
@@ -261,13 +560,8 @@ async def github_callback(request: Request):
     username = user_data.get("login") or email.split("@")[0]
     name = user_data.get("name") or username
 
-    with Session(engine) as s:
-        user = s.exec(select(User).where(User.email == email)).first()
-        if not user:
-            user = User(username=username, email=email, name=name, provider="github", role="user")
-            s.add(user); s.commit(); s.refresh(user)
-        user.last_login = datetime.utcnow()
-        s.add(user); s.commit()
+    user = await _oauth_login(email, username, name, "github")
+    invalidate_principal(user.id)
 
     jwt_token = _make_token(user)
     return RedirectResponse(url=f"{FRONTEND_URL}/auth/callback?token={jwt_token}")
@@ -284,26 +578,21 @@ def oauth_upsert(payload: dict):
         raise HTTPException(status_code=400, detail="email required")
 
     name = (payload.get("name") or "").strip() or None
-    provider = (payload.get("provider") or "google").strip()
+    provider = (payload.get("provider") or "").strip() or "google"
 
-    with Session(engine) as s:
+    global _have_users
+    with Session(engine, expire_on_commit=False) as s:
         user = s.exec(select(User).where(User.email == email)).first()
-        if user:
-            user.name = user.name or name
-            user.provider = provider or user.provider
-            user.last_login = datetime.utcnow()
-            s.add(user); s.commit(); s.refresh(user)
+        if user is None or (name and not user.name) or user.provider != provider:
+            # New user or profile change: one upsert that also stamps last_login.
+            user = s.scalars(_upsert_login_stmt(
+                email, email.split("@")[0], name, provider, refresh_profile=True,
+            )).one()
+            s.commit()
+            _have_users = True
         else:
-            username = email.split("@")[0]
-            user = User(
-                username=username,
-                email=email,
-                name=name,
-                provider=provider,
-                role="user",
-                last_login=datetime.utcnow(),
-            )
-            s.add(user); s.commit(); s.refresh(user)
+            _last_logins.touch(user)
+    invalidate_principal(user.id)
 
     return {
         "ok": True,
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+batch.py
+────────
+Judge a whole tournament (dozens to hundreds of rounds) in one go.
+
+Input is either a directory of recordings (every round uses the --topic /
+--first / --style defaults) or a manifest with per-round settings:
+
+    CSV    audio,topic,first,style[,model][,id]
+    JSON   [{"audio": "...", "topic": "...", "first": "Aff", "style": "tech"}, …]
+    JSONL  one such object per line
+
+Relative audio paths are resolved against the manifest's folder.
+
+Each round runs AnalyzeDebateV2 in two steps on a warm worker pool: transcribe
+(--no-gpt) under the global STT gate, then judge (--reuse-transcript) under the
+global LLM gate (see admission.py), so a 200-round batch never has more than
+VOCIUS_STT_SLOTS / VOCIUS_LLM_SLOTS provider calls in flight.
+
+Progress is appended to <out>/checkpoint.jsonl as rounds are transcribed and
+judged; re-running the same command skips finished rounds and resumes transcribed-
+but-not-judged ones from their transcript.  <out>/index.json aggregates
+every round's status, timings and feedback location.
+
+Usage
+-----
+python batch.py rounds.csv --out runs/tournament_x
+python batch.py recordings/ --topic "Resolved: …" --first Aff --style tech --out runs/t
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+AUDIO_EXTS = {".m4a", ".mp3", ".wav", ".flac", ".ogg", ".opus", ".aac", ".mp4", ".webm"}
+DEFAULT_MODEL = "openai/gpt-4o-2024-11-20"
+SCRIPT_DIR = Path(__file__).resolve().parent
+
+
+@dataclass
+class Round:
+    id: str
+    audio: str
+    topic: str
+    first: str = "Aff"
+    style: str = "tech"
+    model: Optional[str] = None
+
+
+# ───────────────────────── loading rounds ─────────────────────────
+
+def _slug(s: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", s).strip("_") or "round"
+
+def _unique_ids(rounds: List[Round]) -> List[Round]:
+    seen: Dict[str, int] = {}
+    for r in rounds:
+        base = _slug(r.id)
+        n = seen.get(base, 0)
+        seen[base] = n + 1
+        r.id = base if n == 0 else f"{base}_{n + 1}"
+    return rounds
+
+def rounds_from_records(records: List[Dict[str, Any]], defaults: Dict[str, Any],
+                        base_dir: Optional[Path] = None) -> List[Round]:
+    """Build rounds from manifest-style dicts, filling gaps from *defaults*."""
+    rounds = []
+    for i, rec in enumerate(records):
+        audio = str(rec.get("audio") or rec.get("file") or "").strip()
+        if not audio:
+            raise ValueError(f"round {i + 1}: missing 'audio'")
+        if base_dir is not None and not Path(audio).is_absolute():
+            audio = str((base_dir / audio).resolve())
+        topic = rec.get("topic") or defaults.get("topic")
+        if not topic:
+            raise ValueError(f"round {i + 1} ({audio}): missing 'topic' and no --topic default")
+        rounds.append(Round(
+            id=str(rec.get("id") or Path(audio).stem),
+            audio=audio,
+            topic=topic,
+            first=rec.get("first") or defaults.get("first") or "Aff",
+            style=(rec.get("style") or defaults.get("style") or "tech").lower(),
+            model=rec.get("model") or defaults.get("model"),
+        ))
+    return _unique_ids(rounds)
+
+def load_rounds(source: Path, defaults: Dict[str, Any]) -> List[Round]:
+    """Rounds from a directory of recordings or a CSV / JSON / JSONL manifest."""
+    source = source.expanduser().resolve()
+    if source.is_dir():
+        files = sorted(p for p in source.iterdir() if p.suffix.lower() in AUDIO_EXTS)
+        return rounds_from_records([{"audio": str(p)} for p in files], defaults)
+    text = source.read_text(encoding="utf-8")
+    if source.suffix.lower() == ".csv":
+        records = [dict(row) for row in csv.DictReader(text.splitlines())]
+    elif source.suffix.lower() == ".jsonl":
+        records = [json.loads(line) for line in text.splitlines() if line.strip()]
+    else:
+        data = json.loads(text)
+        records = data.get("rounds", []) if isinstance(data, dict) else data
+    return rounds_from_records(records, defaults, base_dir=source.parent)
+
+
+# ───────────────────────── checkpoint & index ─────────────────────────
+
+class Checkpoint:
+    """Append-only progress log; the last record per round wins."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.state: Dict[str, Dict[str, Any]] = {}
+        if path.exists():
+            for line in path.read_text(encoding="utf-8").splitlines():
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    continue                     # torn line from an interrupted run
+                self.state.setdefault(rec["id"], {}).update(rec)
+
+    def status(self, round_id: str) -> Optional[str]:
+        return self.state.get(round_id, {}).get("status")
+
+    def record(self, round_id: str, **fields: Any) -> None:
+        rec = {"id": round_id, "time": time.time(), **fields}
+        with self._lock:
+            self.state.setdefault(round_id, {}).update(rec)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(rec) + "\n")
+
+def _feedback_summary(work_dir: Path) -> Dict[str, Any]:
+    out: Dict[str, Any] = {}
+    jf = work_dir / "judge_feedback.json"
+    if jf.exists():
+        try:
+            data = json.loads(jf.read_text(encoding="utf-8"))
+            out["model"] = data.get("model")
+            out["usage"] = data.get("usage")
+            out["error"] = data.get("error")
+            out["feedback_preview"] = (data.get("feedback") or "")[:600]
+        except Exception as e:
+            out["error"] = repr(e)
+    return out
+
+def write_index(out_dir: Path, rounds: List[Round], ckpt: Checkpoint) -> Path:
+    """One aggregated index.json for the whole batch (atomic replace)."""
+    entries = []
+    counts: Dict[str, int] = {}
+    for r in rounds:
+        st = ckpt.state.get(r.id, {})
+        status = st.get("status", "pending")
+        counts[status] = counts.get(status, 0) + 1
+        work_dir = out_dir / r.id
+        entries.append({
+            **asdict(r),
+            "status": status,
+            "work_dir": str(work_dir),
+            "transcribe_sec": st.get("transcribe_sec"),
+            "judge_sec": st.get("judge_sec"),
+            "error": st.get("error"),
+            "judging_feedback": str(work_dir / "judging_feedback.txt")
+                                if (work_dir / "judging_feedback.txt").exists() else None,
+            **({"judge": _feedback_summary(work_dir)} if status == "done" else {}),
+        })
+    index = {"generated_at": time.time(), "rounds": len(rounds), "counts": counts, "results": entries}
+    path = out_dir / "index.json"
+    tmp = path.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps(index, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+    return path
+
+
+# ───────────────────────── running ─────────────────────────
+
+def run_batch(rounds: List[Round], out_dir: Path, env: Dict[str, str],
+              run_step: Callable[[List[str], Dict[str, str]], Any],
+              admission, workers: int = 8,
+              log: Callable[[str], None] = print) -> Path:
+    """
+    Transcribe + judge every round not already done according to the checkpoint.
+
+    *run_step(argv, env)* runs AnalyzeDebateV2 with *argv* and returns an object
+    with .returncode/.stderr (workers.WorkerPool.run or a subprocess wrapper).
+    """
+    out_dir.mkdir(parents=True, exist_ok=True)
+    ckpt = Checkpoint(out_dir / "checkpoint.jsonl")
+    todo = [r for r in rounds if ckpt.status(r.id) != "done"]
+    log(f"📋  {len(rounds)} rounds, {len(rounds) - len(todo)} already done, {len(todo)} to run")
+
+    def one(r: Round) -> None:
+        work_dir = out_dir / r.id
+        work_dir.mkdir(parents=True, exist_ok=True)
+        argv = ["--audio", r.audio, "--topic", r.topic, "--first", r.first, "--style", r.style,
+                "--model", r.model or DEFAULT_MODEL, "--work-dir", str(work_dir)]
+        try:
+            # a round that failed while judging keeps its transcript
+            transcribed = "transcribe_sec" in ckpt.state.get(r.id, {})
+            if not transcribed or not (work_dir / "transcript.txt").exists():
+                t0 = time.time()
+                with admission.gates["stt"].slot():
+                    res = run_step(argv + ["--no-gpt"], env)
+                if res.returncode != 0:
+                    ckpt.record(r.id, status="failed", step="transcribe", error=(res.stderr or "")[-2000:])
+                    log(f"❌  {r.id}: transcription failed")
+                    return
+                ckpt.record(r.id, status="transcribed", transcribe_sec=round(time.time() - t0, 1))
+                log(f"📝  {r.id}: transcribed")
+            t0 = time.time()
+            with admission.gates["llm"].slot():
+                res = run_step(argv + ["--reuse-transcript"], env)
+            if res.returncode != 0:
+                ckpt.record(r.id, status="failed", step="judge", error=(res.stderr or "")[-2000:])
+                log(f"❌  {r.id}: judging failed")
+                return
+            ckpt.record(r.id, status="done", judge_sec=round(time.time() - t0, 1))
+            log(f"✅  {r.id}: judged")
+        except Exception as e:
+            ckpt.record(r.id, status="failed", error=repr(e))
+            log(f"❌  {r.id}: {e!r}")
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="vocius-batch") as ex:
+        for _ in ex.map(one, todo):
+            pass
+    return write_index(out_dir, rounds, ckpt)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from admission import Admission, LLM_SLOTS, STT_SLOTS
+    from jobs import ProcResult
+    from workers import WorkerPool
+
+    ap = argparse.ArgumentParser(description="Judge a batch of debate rounds (resumable).")
+    ap.add_argument("source", help="Directory of recordings, or a .csv/.json/.jsonl manifest")
+    ap.add_argument("--out", required=True, help="Batch output folder (checkpoint + index.json)")
+    ap.add_argument("--topic", help="Default topic for rounds that don't set one")
+    ap.add_argument("--first", default="Aff", choices=["Aff", "Neg"], help="Default first speaker")
+    ap.add_argument("--style", default="tech", choices=["lay", "flay", "tech", "prog"], help="Default style")
+    ap.add_argument("--model", default=None, help="Default OpenRouter model")
+    ap.add_argument("--aai-key", default=os.getenv("ASSEMBLYAI_API_KEY"), help="AssemblyAI key")
+    ap.add_argument("--or-key", default=os.getenv("OPENROUTER_API_KEY"), help="OpenRouter key")
+    ap.add_argument("--stt-slots", type=int, default=STT_SLOTS, help="Concurrent AssemblyAI jobs")
+    ap.add_argument("--llm-slots", type=int, default=LLM_SLOTS, help="Concurrent LLM calls")
+    ap.add_argument("--no-warm", action="store_true", help="Run each step as a fresh interpreter")
+    args = ap.parse_args(argv)
+
+    if not args.aai_key or not args.or_key:
+        print("❌ AssemblyAI and OpenRouter keys required (--aai-key/--or-key or env).", file=sys.stderr)
+        return 2
+    try:
+        rounds = load_rounds(Path(args.source), {"topic": args.topic, "first": args.first,
+                                                 "style": args.style, "model": args.model})
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 2
+    if not rounds:
+        print("❌ No rounds found.", file=sys.stderr)
+        return 2
+
+    out_dir = Path(args.out).expanduser().resolve()
+    env = {"ASSEMBLYAI_API_KEY": args.aai_key, "OPENROUTER_API_KEY": args.or_key}
+    admission = Admission(stt=args.stt_slots, llm=args.llm_slots)
+    workers = args.stt_slots + args.llm_slots
+
+    pool = None
+    if args.no_warm:
+        import subprocess
+        def run_step(step_argv: List[str], step_env: Dict[str, str]) -> ProcResult:
+            p = subprocess.run([sys.executable, "-u", str(SCRIPT_DIR / "AnalyzeDebateV2.py"), *step_argv],
+                               env={**os.environ, **step_env}, cwd=SCRIPT_DIR, capture_output=True, text=True)
+            return ProcResult(p.returncode, p.stdout, p.stderr)
+    else:
+        pool = WorkerPool(workers)
+        pool.start()
+        def run_step(step_argv: List[str], step_env: Dict[str, str]) -> ProcResult:
+            return pool.run("debate", step_argv, env=step_env, cwd=SCRIPT_DIR)
+
+    try:
+        index = run_batch(rounds, out_dir, env, run_step, admission, workers=workers)
+    except KeyboardInterrupt:
+        print("\n⏸  Interrupted — re-run the same command to resume.", flush=True)
+        return 130
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    print(f"🧾  wrote {index}", flush=True)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
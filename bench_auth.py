@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+bench_auth.py
+Measure password-hashing throughput so BCRYPT_ROUNDS / HASH_WORKERS can be
+picked for the login load a tournament produces.
+
+For each cost factor it hashes one password, then times N verifications
+(what /auth/login does per request) serially and through a HASH_WORKERS-sized
+pool, and prints ms per hash and logins/sec.
+
+Usage:
+  python bench_auth.py [--rounds 10 11 12 13] [--logins 40] [--workers 2]
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from passlib.context import CryptContext
+
+
+def bench(rounds: int, logins: int, workers: int) -> dict:
+    ctx = CryptContext(schemes=["bcrypt"], bcrypt__rounds=rounds)
+    t0 = time.perf_counter()
+    h = ctx.hash("correct horse battery staple")
+    hash_ms = (time.perf_counter() - t0) * 1000
+
+    t0 = time.perf_counter()
+    for _ in range(logins):
+        ctx.verify("correct horse battery staple", h)
+    serial = logins / (time.perf_counter() - t0)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        t0 = time.perf_counter()
+        list(pool.map(lambda _: ctx.verify("correct horse battery staple", h), range(logins)))
+        pooled = logins / (time.perf_counter() - t0)
+
+    return {"rounds": rounds, "hash_ms": hash_ms, "serial": serial, "pooled": pooled}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="bcrypt logins/sec per cost factor")
+    ap.add_argument("--rounds", type=int, nargs="+", default=[10, 11, 12, 13])
+    ap.add_argument("--logins", type=int, default=40, help="verifications per cost factor")
+    ap.add_argument("--workers", type=int, default=int(os.getenv("HASH_WORKERS", "2")),
+                    help="pool size for the pooled column (default HASH_WORKERS or 2)")
+    args = ap.parse_args()
+
+    print(f"{'rounds':>6}  {'ms/hash':>8}  {'logins/s':>9}  {f'x{args.workers} pool/s':>11}")
+    for r in args.rounds:
+        row = bench(r, args.logins, args.workers)
+        print(f"{row['rounds']:>6}  {row['hash_ms']:>8.1f}  {row['serial']:>9.1f}  {row['pooled']:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+bench_upload_codecs.py
+Encode one recording in each AssemblyAI upload codec (aai_client.py), then
+report file size, encode and upload time, and, unless --no-transcribe is
+given, how far each transcript drifts from the reference codec's (word error
+rate), so AAI_UPLOAD_CODEC / AAI_UPLOAD_OPUS_KBPS can be chosen with evidence.
+
+Outputs (in ./runs/codec_bench_YYYYmmdd_HHMMSS):
+  - <variant>_transcript.txt for every variant
+  - summary.txt
+
+Usage:
+  export ASSEMBLYAI_API_KEY=...
+  python bench_upload_codecs.py round.m4a [--codecs raw flac opus] [--opus-kbps 24 32 48] [--no-transcribe]
+
+Notes:
+- The first variant is the reference for WER (raw by default, i.e. the file as given).
+- Transcripts use the same text options as AnalyzeDebateV2.
+"""
+
+import argparse
+import os
+import pathlib
+import re
+import time
+from datetime import datetime
+
+import aai_client
+
+TEXT_OPTS = {"punctuate": True, "format_text": True, "disfluencies": True}
+
+
+def words(text: str) -> list:
+    return re.findall(r"[a-z0-9']+", text.lower())
+
+
+def wer(ref: list, hyp: list) -> float:
+    """Word error rate: word-level Levenshtein distance / reference length."""
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    prev = list(range(len(hyp) + 1))
+    for i, r in enumerate(ref, 1):
+        cur = [i] + [0] * len(hyp)
+        for j, h in enumerate(hyp, 1):
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (r != h))
+        prev = cur
+    return prev[-1] / len(ref)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Compare AssemblyAI upload codecs")
+    ap.add_argument("audio", help="Path to a sample recording")
+    ap.add_argument("--codecs", nargs="+", default=["raw", "flac", "opus"], choices=aai_client.UPLOAD_CODECS)
+    ap.add_argument("--opus-kbps", type=int, nargs="+", default=[aai_client.upload_opus_kbps()])
+    ap.add_argument("--no-transcribe", action="store_true", help="Only encode and measure sizes")
+    args = ap.parse_args()
+
+    key = os.getenv("ASSEMBLYAI_API_KEY")
+    if not args.no_transcribe and not key:
+        raise SystemExit("Missing ASSEMBLYAI_API_KEY (or pass --no-transcribe)")
+
+    src = pathlib.Path(args.audio).expanduser().resolve()
+    out_dir = pathlib.Path("runs") / f"codec_bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    variants = []
+    for codec in args.codecs:
+        for kbps in (args.opus_kbps if codec == "opus" else [None]):
+            variants.append((codec if kbps is None else f"opus{kbps}k", codec, kbps))
+
+    rows, ref_words = [], None
+    for label, codec, kbps in variants:
+        t0 = time.perf_counter()
+        encoded = aai_client.encode_for_upload(src, codec, kbps)
+        row = {"variant": label, "bytes": encoded.stat().st_size, "encode_s": time.perf_counter() - t0}
+        try:
+            if not args.no_transcribe:
+                aai = aai_client.client(key)
+                t0 = time.perf_counter()
+                url = aai.upload(encoded)
+                row["upload_s"] = time.perf_counter() - t0
+                t0 = time.perf_counter()
+                js = aai.wait(aai.create_transcript(url, **TEXT_OPTS), aai_client.audio_seconds(src))
+                row["transcribe_s"] = time.perf_counter() - t0
+                if js.get("status") == "error":
+                    raise RuntimeError(f"AssemblyAI failed for {label}: {js.get('error')}")
+                text = js.get("text") or ""
+                (out_dir / f"{label}_transcript.txt").write_text(text, encoding="utf-8")
+                w = words(text)
+                if ref_words is None:
+                    ref_words = w
+                row["wer"] = wer(ref_words, w)
+        finally:
+            if encoded != src:
+                encoded.unlink(missing_ok=True)
+        rows.append(row)
+        print(f"✓ {label}: {row['bytes'] / 1e6:.1f} MB", flush=True)
+
+    base = rows[0]["bytes"]
+    lines = [f"Source: {src}", f"Reference for WER: {rows[0]['variant']}", "",
+             f"{'variant':<10} {'MB':>8} {'x smaller':>9} {'encode s':>9} {'upload s':>9} {'stt s':>7} {'WER':>7}"]
+    for r in rows:
+        lines.append(
+            f"{r['variant']:<10} {r['bytes'] / 1e6:>8.2f} {base / r['bytes']:>9.1f} {r['encode_s']:>9.1f} "
+            f"{r.get('upload_s', float('nan')):>9.1f} {r.get('transcribe_s', float('nan')):>7.1f} "
+            f"{r.get('wer', float('nan')):>7.2%}"
+        )
+    summary = "\n".join(lines)
+    (out_dir / "summary.txt").write_text(summary + "\n", encoding="utf-8")
+    print(summary)
+    print(f"\nSaved to {out_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -23,7 +23,6 @@ Notes:
 
 import os
 import sys
-import time
 import json
 import math
 import mimetypes
@@ -34,6 +33,8 @@ from collections import defaultdict, Counter
 
 import requests
 
+import aai_client
+
 # ------------------------------ Helpers -------------------------------- #
 
 def hms(seconds: float) -> str:
@@ -205,14 +206,7 @@ def deepgram_transcribe(path: str, model: str = None):
 
 def aai_upload(filepath: str, key: str) -> str:
     """Upload local file to AssemblyAI and return the upload_url."""
-    url = "https://api.assemblyai.com/v2/upload"
-    headers = {"authorization": key}
-    CHUNK = 5 * 1024 * 1024
-    with open(filepath, "rb") as f:
-        resp = requests.post(url, headers=headers, data=iter(lambda: f.read(CHUNK), b""), timeout=None)
-    if resp.status_code >= 400:
-        raise RuntimeError(f"AssemblyAI upload error {resp.status_code}: {resp.text[:400]}")
-    return resp.json()["upload_url"]
+    return aai_client.client(key).upload(filepath)
 
 def assemblyai_transcribe(path: str, speakers_expected: int = None):
     """
@@ -226,9 +220,7 @@ def assemblyai_transcribe(path: str, speakers_expected: int = None):
 
     upload_url = aai_upload(path, key)
 
-    create_url = "https://api.assemblyai.com/v2/transcript"
     payload = {
-        "audio_url": upload_url,
         "speech_model": "universal",    # allowed: "best" | "slam-1" | "universal"
         "speaker_labels": True,         # enable diarization
         "punctuate": True,
@@ -239,26 +231,12 @@ def assemblyai_transcribe(path: str, speakers_expected: int = None):
     if speakers_expected and int(speakers_expected) > 0:
         payload["speakers_expected"] = int(speakers_expected)
 
-    headers = {"authorization": key, "content-type": "application/json"}
-    resp = requests.post(create_url, headers=headers, json=payload, timeout=None)
-    if resp.status_code >= 400:
-        raise RuntimeError(f"AssemblyAI create error {resp.status_code}: {resp.text[:400]}")
-
-    tid = resp.json()["id"]
-    # Poll
-    get_url = f"https://api.assemblyai.com/v2/transcript/{tid}"
-    while True:
-        time.sleep(3.0)
-        r = requests.get(get_url, headers=headers, timeout=None)
-        if r.status_code >= 400:
-            raise RuntimeError(f"AssemblyAI poll error {r.status_code}: {r.text[:400]}")
-        j = r.json()
-        status = j.get("status")
-        if status == "completed":
-            return j
-        if status == "error":
-            raise RuntimeError(f"AssemblyAI failed: {j.get('error')}")
-        # else: queued / processing -> continue
+    aai = aai_client.client(key)
+    tid = aai.create_transcript(upload_url, **payload)
+    j = aai.wait(tid, aai_client.audio_seconds(path))
+    if j.get("status") == "error":
+        raise RuntimeError(f"AssemblyAI failed: {j.get('error')}")
+    return j
 
 # ------------------------------- Main --------------------------------- #
 
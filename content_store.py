@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+content_store.py
+────────────────
+Content-addressed storage for uploaded recordings.
+
+• Uploads are hashed (SHA-256) while they stream to disk; identical bytes are
+  stored once under blobs/<sha[:2]>/<sha><ext>.
+• The 16 kHz mono WAV that the delivery pipeline needs is produced once per
+  recording under audio/<sha[:2]>/<sha>.16k.wav.
+• stt/ holds the transcript/diarization cache (see stt_cache.py).
+
+Run directories get hard links (or copies, across filesystems) of these files,
+so per-request folders stay self-contained without duplicating the audio.
+The link count doubles as a reference count: once artifacts.py has evicted
+every run that linked a blob or WAV, gc() deletes it (entries touched within
+VOCIUS_CONTENT_GC_GRACE_SEC are kept, so an upload that is still being
+staged is never collected).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Iterator
+
+STORE_DIR = Path(os.getenv("VOCIUS_STORE_DIR", str(Path(__file__).resolve().parent / "store")))
+SAMPLE_RATE = 16_000
+CHUNK_SIZE = 1024 * 1024
+GC_GRACE_SEC = int(os.getenv("VOCIUS_CONTENT_GC_GRACE_SEC", "3600"))
+
+
+@dataclass
+class Blob:
+    sha256: str
+    path: Path
+    size: int
+    deduplicated: bool   # True when these bytes were already stored
+
+
+def _clean_suffix(name: str) -> str:
+    suffix = Path(name or "").suffix.lower()
+    return suffix if re.fullmatch(r"\.[a-z0-9]{1,8}", suffix) else ".bin"
+
+
+class ContentStore:
+    def __init__(self, root: Path = STORE_DIR):
+        self.root = Path(root)
+        self.blobs_dir = self.root / "blobs"
+        self.audio_dir = self.root / "audio"
+        self.stt_dir = self.root / "stt"
+        self.tmp_dir = self.root / "tmp"
+        for d in (self.blobs_dir, self.audio_dir, self.stt_dir, self.tmp_dir):
+            d.mkdir(parents=True, exist_ok=True)
+
+    def ingest(self, src: BinaryIO, filename: str) -> Blob:
+        """Stream *src* into the store, hashing as we go. Returns the stored blob."""
+        h = hashlib.sha256()
+        size = 0
+        fd, tmp = tempfile.mkstemp(dir=self.tmp_dir, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                for chunk in iter(lambda: src.read(CHUNK_SIZE), b""):
+                    h.update(chunk)
+                    out.write(chunk)
+                    size += len(chunk)
+            sha = h.hexdigest()
+            dest = self.blobs_dir / sha[:2] / f"{sha}{_clean_suffix(filename)}"
+            if dest.exists():
+                os.unlink(tmp)
+                os.utime(dest)            # fresh again: keeps gc() off it until it is linked
+                return Blob(sha, dest, size, True)
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(tmp, dest)
+            return Blob(sha, dest, size, False)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+
+    def normalized_wav(self, src: Path, sha: str) -> Path:
+        """16 kHz mono WAV for the recording with hash *sha*, converted once."""
+        dest = self.audio_dir / sha[:2] / f"{sha}.16k.wav"
+        if dest.exists():
+            os.utime(dest)
+            return dest
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.tmp_dir, suffix=".wav")
+        os.close(fd)
+        try:
+            subprocess.run(
+                ["ffmpeg", "-hide_banner", "-loglevel", "error",
+                 "-i", str(src), "-ar", str(SAMPLE_RATE), "-ac", "1", "-y", tmp],
+                check=True,
+            )
+            os.replace(tmp, dest)
+        finally:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+        return dest
+
+    @staticmethod
+    def link(src: Path, dest: Path) -> Path:
+        """Hard-link *src* to *dest* (copy if the filesystem refuses)."""
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.link(src, dest)
+        except OSError:
+            shutil.copyfile(src, dest)
+        return dest
+
+    # ---------- garbage collection ---------------------------------------------
+    def _entries(self) -> Iterator[Path]:
+        for d in (self.blobs_dir, self.audio_dir):
+            yield from d.glob("*/*")
+
+    def gc(self, grace_sec: int = GC_GRACE_SEC) -> int:
+        """Delete blobs and WAVs no run links any more. Returns the bytes freed."""
+        cutoff = time.time() - grace_sec
+        freed = 0
+        for p in self._entries():
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            if st.st_nlink <= 1 and st.st_mtime < cutoff:
+                p.unlink(missing_ok=True)
+                freed += st.st_size
+        return freed
@@ -12,19 +12,22 @@ import sys
 import re
 import json
 import shutil
-import tempfile
 import subprocess
 import time
 import select
 from pathlib import Path
-from datetime import datetime
 from typing import Optional
 
 import requests
 import streamlit as st
 
+import aai_client
+from artifacts import ArtifactStore
+from progress import DEBATE_STAGES, SPEECH_STAGES, progress_for_line, status_for_line
+
 PROJ_ROOT = Path(__file__).resolve().parent
 RUNS_DIR = (PROJ_ROOT / "runs")
+ARTIFACTS = ArtifactStore(RUNS_DIR)   # quota/LRU-managed per-run folders
 
 # ───────────────────────────── Models (OpenRouter) ─────────────────────────────
 OPENROUTER_MODELS = [
@@ -179,6 +182,9 @@ def _render_model_desc(model: dict):
 
 def _zip_dir(dir_path: Path) -> Path:
     dir_path = dir_path.resolve()
+    bundled = ARTIFACTS.bundle(dir_path.name)   # cached per run, evicted with it
+    if bundled is not None:
+        return bundled
     archive = shutil.make_archive(str(dir_path.with_suffix("")), "zip", root_dir=str(dir_path))
     return Path(archive)
 
@@ -186,11 +192,11 @@ def _estimate_tokens_from_text(s: str) -> int:
     # ~5 chars/token (conservative)
     return max(1, int(len(s) / 5))
 
-def save_uploaded_file(uploaded_file) -> Path:
-    suffix = Path(uploaded_file.name).suffix
-    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-        tmp.write(uploaded_file.getvalue())
-        return Path(tmp.name).resolve()
+def save_uploaded_file(uploaded_file, dest_dir: Path) -> Path:
+    """Write the upload into the run folder so it is evicted together with the run."""
+    dest = (dest_dir / Path(uploaded_file.name).name).resolve()
+    dest.write_bytes(uploaded_file.getvalue())
+    return dest
 
 def _fresh_file_required(path: Path, start_ts: float, label: str):
     if not path.exists():
@@ -216,8 +222,7 @@ def _bin_exists(name: str) -> bool:
 
 def validate_assemblyai_key(key: str) -> dict:
     try:
-        r = requests.get("https://api.assemblyai.com/v2/account",
-                         headers={"Authorization": key}, timeout=10)
+        r = aai_client.client(key).account(timeout=10)
         if r.status_code == 200:
             return {"ok": True, "error": None}
         if r.status_code in (401,403):
@@ -262,39 +267,16 @@ def validate_openrouter_key(key: str) -> dict:
 # ───────────── Live streaming + progress + narrator (no auto-timeouts) ─────────
 
 def _progress_from_debate_line(line: str, prev: float) -> float:
-    if "Uploading to AssemblyAI" in line: return max(prev, 0.10)
-    if "Queued at AssemblyAI" in line:    return max(prev, 0.20)
-    if "Transcription status:" in line:   return max(prev, 0.40)
-    if "wrote transcript.txt" in line:    return max(prev, 0.80)
-    if "wrote judging_feedback.txt" in line or "Done" in line: return 1.0
-    return prev
+    return progress_for_line(DEBATE_STAGES, line, prev)
 
 def _status_from_debate_line(line: str, cur: Optional[str]) -> Optional[str]:
-    s = line.lower()
-    if "uploading to assemblyai" in s: return "Uploading audio to AssemblyAI…"
-    if "queued at assemblyai" in s: return "Queued; AssemblyAI is processing…"
-    if "transcription status" in s: return "Transcribing your audio…"
-    if "wrote transcript.txt" in s: return "Transcript ready."
-    if "calling" in s: return "Evaluating arguments and writing an RFD…"
-    if "wrote judging_feedback.txt" in s: return "Judging complete. Packaging outputs…"
-    return cur
+    return status_for_line(DEBATE_STAGES, line, cur)
 
 def _progress_from_speech_line(line: str, prev: float) -> float:
-    if "[1/5]" in line: return max(prev, 0.10)
-    if "[2/5]" in line: return max(prev, 0.30)
-    if "[3/5]" in line: return max(prev, 0.55)
-    if "[4/5]" in line: return max(prev, 0.80)
-    if "Report written" in line: return 1.0
-    return prev
+    return progress_for_line(SPEECH_STAGES, line, prev)
 
 def _status_from_speech_line(line: str, cur: Optional[str]) -> Optional[str]:
-    s = line.lower()
-    if "[1/5]" in s: return "Normalizing audio to 16 kHz mono…"
-    if "[2/5]" in s: return "Uploading to AssemblyAI…"
-    if "[3/5]" in s: return "AssemblyAI diarization & intelligence…"
-    if "[4/5]" in s: return "Analysing delivery metrics…"
-    if "report written" in s: return "Delivery analysis complete."
-    return cur
+    return status_for_line(SPEECH_STAGES, line, cur)
 
 def run_and_stream(
     cmd, cwd, env, log_placeholder, prog_placeholder, status_placeholder,
@@ -398,12 +380,9 @@ def run_debate_judge_only(topic: str, first_team: str, style: str,
     return run_and_stream(cmd, PROJ_ROOT, env, log_placeholder, prog_placeholder, status_placeholder,
                           _progress_from_debate_line, _status_from_debate_line)
 
-def run_analyze_speech(audio_path: Path, first_team: str, aai_key: Optional[str],
+def run_analyze_speech(audio_path: Path, first_team: str, aai_key: Optional[str], work_dir: Path,
                        log_placeholder, prog_placeholder, status_placeholder):
     env = _env_for_subprocess(None, aai_key)
-    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-    work_dir = (RUNS_DIR / f"speech_{ts}").resolve()
-    work_dir.mkdir(parents=True, exist_ok=True)
     cmd = [
         sys.executable, "-u", str(PROJ_ROOT / "AnalyzeSpeechV2.py"),
         str(audio_path), "--team1", "Aff", "--team2", "Neg",
@@ -416,6 +395,7 @@ def run_analyze_speech(audio_path: Path, first_team: str, aai_key: Optional[str]
     out_file = work_dir / "analyze_speech.txt"
     ok, why = _fresh_file_required(out_file, start_ts, "analyze_speech.txt")
     content = out_file.read_text(encoding="utf-8") if ok else ""
+    ARTIFACTS.finalize(work_dir.name)
     return {"ok": rc == 0 and ok, "logs": logs, "content": content, "work_dir": str(work_dir), "out_file": str(out_file) if ok else None, "why": None if ok else why}
 
 # ───────────────────────────── Setup ─────────────────────────
@@ -535,10 +515,8 @@ def run_page():
             elif not topic.strip():
                 st.error("Please enter a debate topic.")
             else:
-                tmp = save_uploaded_file(uploaded_file)
-                ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-                work_dir = (RUNS_DIR / f"debate_{ts}").resolve()
-                work_dir.mkdir(parents=True, exist_ok=True)
+                work_dir = ARTIFACTS.create("debate").path.resolve()
+                tmp = save_uploaded_file(uploaded_file, work_dir)
 
                 st.info("Step 1/2: Transcribing (AssemblyAI) to estimate cost…")
                 status_box = st.empty()
@@ -552,6 +530,7 @@ def run_page():
                 )
                 tr_path = work_dir / "transcript.txt"
                 if rc1 != 0 or not tr_path.exists():
+                    ARTIFACTS.finalize(work_dir.name)
                     st.error("Transcription failed. See logs below.")
                     st.text_area("Logs", value=logs1, height=420)
                 else:
@@ -599,6 +578,7 @@ def run_page():
                 Path(ctx["work_dir"]), log_box2, prog2, status_box2
             )
             out_file = Path(ctx["work_dir"]) / "judging_feedback.txt"
+            ARTIFACTS.finalize(Path(ctx["work_dir"]).name)
             if rc2 != 0 or not out_file.exists():
                 st.error("Judging step failed. See logs below.")
                 st.text_area("Logs (transcribe)", value=ctx["logs1"], height=220)
@@ -646,11 +626,12 @@ def run_page():
             if uploaded_file is None:
                 st.error("Please upload an audio file.")
             else:
-                tmp = save_uploaded_file(uploaded_file)
+                work_dir = ARTIFACTS.create("speech").path.resolve()
+                tmp = save_uploaded_file(uploaded_file, work_dir)
                 status_box = st.empty()
                 log_box = st.empty()
                 prog = st.progress(0.0)
-                result = run_analyze_speech(tmp, first_team.strip(), aai_key, log_box, prog, status_box)
+                result = run_analyze_speech(tmp, first_team.strip(), aai_key, work_dir, log_box, prog, status_box)
                 tabs = st.tabs(["Report", "Logs", "Downloads"])
                 with tabs[0]:
                     st.text_area("analyze_speech.txt", value=result.get("content", ""), height=420)
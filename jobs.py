@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""
+jobs.py
+───────
+Background job model for server.py.
+
+• Routes submit a pipeline callable and get a job id back immediately.
+• A bounded thread pool runs the pipelines (each one mostly waits on a child
+  process or the network), so the event loop never blocks on them.
+• Jobs can be polled for status/stage/result and cancelled while queued or
+  running; finished jobs are kept for VOCIUS_JOB_KEEP_SEC, then dropped.
+• Child output is read line by line: stage transitions (see progress.py)
+  become job events for SSE subscribers, and only a short tail is kept.
+• submit_once() de-duplicates: a submission whose coalescing key matches an
+  in-flight job, or whose idempotency key matches any retained job, gets
+  that job back instead of starting another pipeline.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import subprocess
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from progress import Stage, StageTracker
+
+JOB_WORKERS     = int(os.getenv("VOCIUS_JOB_WORKERS", "16"))      # pipeline threads (admission.py caps the real work)
+JOB_MAX_PENDING = int(os.getenv("VOCIUS_JOB_MAX_PENDING", "500"))  # queued jobs before we refuse
+JOB_KEEP_SEC    = int(os.getenv("VOCIUS_JOB_KEEP_SEC", "3600"))    # how long finished jobs stay visible
+JOB_TAIL_LINES  = 120                                              # stdout/stderr lines kept per job
+JOB_MAX_EVENTS  = 500                                              # event backlog kept per job
+
+FINISHED = ("succeeded", "failed", "cancelled")
+
+
+class JobCancelled(Exception):
+    """Raised inside a pipeline callable once its job has been cancelled."""
+
+
+class QueueFull(Exception):
+    """Raised by JobManager.submit when JOB_MAX_PENDING jobs are already queued."""
+
+
+@dataclass
+class ProcResult:
+    returncode: int
+    stdout: str
+    stderr: str
+
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    params: Dict[str, Any]
+    user_id: Optional[int] = None   # owner; None for anonymous submissions
+    status: str = "queued"          # queued | running | succeeded | failed | cancelled
+    stage: str = "queued"
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    percent: float = 0.0
+    future: Optional[Future] = field(default=None, repr=False)
+    events: List[Dict[str, Any]] = field(default_factory=list, repr=False)
+    _tracker: Optional[StageTracker] = field(default=None, repr=False)
+    _subscribers: List[Tuple[asyncio.AbstractEventLoop, "asyncio.Queue"]] = field(default_factory=list, repr=False)
+    _seq: int = 0
+    _proc: Optional[Any] = field(default=None, repr=False)   # Popen or leased worker
+    _cancel: threading.Event = field(default_factory=threading.Event, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+    _ev_lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @property
+    def done(self) -> bool:
+        return self.status in FINISHED
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    # ---------- progress & events ---------------------------------------------
+    def track(self, table: List[Stage], ceiling: float = 1.0) -> None:
+        """Parse subsequent child output against a progress.py stage table.
+
+        Steps of a split pipeline call this again with a higher *ceiling*;
+        the tracker (and its timings) carries over while the table is the same.
+        """
+        if self._tracker is None or self._tracker.table is not table:
+            self._tracker = StageTracker(table)
+        self._tracker.ceiling = ceiling
+
+    def set_stage(self, stage: str, percent: Optional[float] = None, label: Optional[str] = None) -> None:
+        self.stage = stage
+        if percent is not None:
+            self.percent = max(self.percent, percent)
+        self.publish("stage", stage=stage, label=label, percent=round(self.percent, 3))
+
+    def feed_line(self, line: str) -> None:
+        if self._tracker is None:
+            return
+        st = self._tracker.feed(line)
+        if st is not None:
+            self.set_stage(st.name, st.percent, st.label)
+
+    @property
+    def timings(self) -> Dict[str, float]:
+        return dict(self._tracker.timings) if self._tracker else {}
+
+    def publish(self, type_: str, **data: Any) -> None:
+        with self._ev_lock:
+            self._seq += 1
+            ev = {"seq": self._seq, "type": type_, "job_id": self.id, "time": time.time(),
+                  "elapsed": round(time.time() - (self.started_at or self.created_at), 3),
+                  "timings": self.timings, **data}
+            self.events.append(ev)
+            if len(self.events) > JOB_MAX_EVENTS:
+                del self.events[: len(self.events) - JOB_MAX_EVENTS]
+            subs = list(self._subscribers)
+        for loop, q in subs:
+            try: loop.call_soon_threadsafe(q.put_nowait, ev)
+            except RuntimeError: pass   # subscriber's loop already closed
+
+    def subscribe(self, loop: asyncio.AbstractEventLoop, since: int = 0) -> Tuple[List[Dict[str, Any]], "asyncio.Queue"]:
+        """Return the backlog after *since* plus a queue fed with every later event."""
+        q: asyncio.Queue = asyncio.Queue()
+        with self._ev_lock:
+            backlog = [e for e in self.events if e["seq"] > since]
+            self._subscribers.append((loop, q))
+        return backlog, q
+
+    def unsubscribe(self, q: "asyncio.Queue") -> None:
+        with self._ev_lock:
+            self._subscribers = [(l, s) for l, s in self._subscribers if s is not q]
+
+    # ---------- child processes -------------------------------------------------
+    def check_cancelled(self) -> None:
+        if self._cancel.is_set():
+            raise JobCancelled(self.id)
+
+    def run_process(self, cmd: List[str], env: Optional[Dict[str, str]] = None,
+                    cwd: Optional[Path] = None) -> ProcResult:
+        """subprocess.run equivalent that streams stdout into job events and can be cancelled."""
+        with self._lock:
+            self.check_cancelled()
+            proc = subprocess.Popen(cmd, env=env, cwd=cwd, text=True, bufsize=1,
+                                    stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            self._proc = proc
+        out_tail: Deque[str] = deque(maxlen=JOB_TAIL_LINES)
+        err_tail: Deque[str] = deque(maxlen=JOB_TAIL_LINES)
+        err_reader = threading.Thread(target=_drain, args=(proc.stderr, err_tail), daemon=True)
+        err_reader.start()
+        try:
+            assert proc.stdout is not None
+            for raw in proc.stdout:
+                line = raw.rstrip("\n")
+                out_tail.append(line)
+                self.feed_line(line)
+            proc.wait()
+            err_reader.join()
+        finally:
+            with self._lock:
+                self._proc = None
+        self.check_cancelled()
+        return ProcResult(proc.returncode, "\n".join(out_tail), "\n".join(err_tail))
+
+    def run_entry(self, pool, entry: str, argv: List[str], env: Optional[Dict[str, str]] = None,
+                  cwd: Optional[Path] = None) -> ProcResult:
+        """Like run_process, but on a warm worker from workers.WorkerPool."""
+        def _attach(handle) -> None:
+            with self._lock:
+                self.check_cancelled()
+                self._proc = handle
+
+        self.check_cancelled()
+        try:
+            res = pool.run(entry, argv, env=env, cwd=cwd, on_line=self.feed_line, on_start=_attach)
+        finally:
+            with self._lock:
+                self._proc = None
+        self.check_cancelled()
+        return res
+
+    def request_cancel(self) -> None:
+        with self._lock:
+            self._cancel.set()
+            if self._proc is not None and self._proc.poll() is None:
+                try: self._proc.terminate()
+                except Exception: pass
+
+    def snapshot(self, include_result: bool = True) -> Dict[str, Any]:
+        out: Dict[str, Any] = {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "stage": self.stage,
+            "percent": round(self.percent, 3),
+            "timings": self.timings,
+            "params": self.params,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+        }
+        if include_result:
+            out["result"] = self.result
+        return out
+
+
+def _drain(stream, sink: Deque[str]) -> None:
+    for raw in stream:
+        sink.append(raw.rstrip("\n"))
+
+
+class JobManager:
+    def __init__(self, workers: int = JOB_WORKERS, max_pending: int = JOB_MAX_PENDING,
+                 keep_sec: int = JOB_KEEP_SEC):
+        self.workers = max(1, workers)
+        self.max_pending = max_pending
+        self.keep_sec = keep_sec
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="vocius-job")
+        self._jobs: Dict[str, Job] = {}
+        self._keys: Dict[str, str] = {}          # coalescing / idempotency key → job id
+        self._lock = threading.Lock()
+
+    # ---------- public ---------------------------------------------------------
+    def submit(self, kind: str, params: Dict[str, Any], fn: Callable[[Job], Dict[str, Any]],
+               user_id: Optional[int] = None) -> Job:
+        return self.submit_once(kind, params, fn, user_id=user_id)[0]
+
+    def submit_once(self, kind: str, params: Dict[str, Any], fn: Callable[[Job], Dict[str, Any]],
+                    coalesce_key: Optional[str] = None,
+                    idempotency_key: Optional[str] = None,
+                    user_id: Optional[int] = None) -> Tuple[Job, bool]:
+        """Submit unless an equivalent job exists; returns (job, created).
+
+        *coalesce_key* matches jobs still queued or running; *idempotency_key*
+        matches any job still retained, finished ones included.
+        """
+        with self._lock:
+            self._prune()
+            existing = self._lookup(idempotency_key, include_finished=True) or self._lookup(coalesce_key)
+            if existing is not None:
+                if idempotency_key:
+                    self._keys[idempotency_key] = existing.id
+                return existing, False
+            pending = sum(1 for j in self._jobs.values() if j.status == "queued")
+            if pending >= self.max_pending:
+                raise QueueFull(f"{pending} jobs already queued")
+            job = Job(id=uuid.uuid4().hex, kind=kind, params=params, user_id=user_id)
+            self._jobs[job.id] = job
+            for key in (coalesce_key, idempotency_key):
+                if key:
+                    self._keys[key] = job.id
+        job.future = self._pool.submit(self._execute, job, fn)
+        return job, True
+
+    def find(self, key: str, include_finished: bool = False) -> Optional[Job]:
+        """The job registered under a coalescing or idempotency key, if any."""
+        with self._lock:
+            return self._lookup(key, include_finished)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        job = self.get(job_id)
+        if job is None or job.done:
+            return job
+        job.request_cancel()
+        if job.future is not None and job.future.cancel():
+            self._finish(job, "cancelled")
+        return job
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            counts: Dict[str, int] = {}
+            for j in self._jobs.values():
+                counts[j.status] = counts.get(j.status, 0) + 1
+        return {"workers": self.workers, "max_pending": self.max_pending, **counts}
+
+    def shutdown(self) -> None:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        for j in jobs:
+            if not j.done:
+                j.request_cancel()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    # ---------- internals ------------------------------------------------------
+    def _lookup(self, key: Optional[str], include_finished: bool = False) -> Optional[Job]:
+        job = self._jobs.get(self._keys.get(key, "")) if key else None
+        if job is None or job.status == "cancelled" or (job.done and not include_finished):
+            return None
+        return job
+
+    def _execute(self, job: Job, fn: Callable[[Job], Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        if job.cancelled:
+            self._finish(job, "cancelled")
+            return None
+        job.status = "running"
+        job.started_at = time.time()
+        job.set_stage("running")
+        try:
+            result = fn(job)
+        except JobCancelled:
+            self._finish(job, "cancelled")
+            return None
+        except Exception as e:
+            job.error = repr(e)
+            self._finish(job, "failed")
+            return None
+        if job.cancelled:
+            self._finish(job, "cancelled")
+            return None
+        job.result = result
+        self._finish(job, "succeeded" if result.get("ok") else "failed")
+        return result
+
+    def _finish(self, job: Job, status: str) -> None:
+        if job._tracker is not None:
+            job._tracker.finish()
+        job.status = status
+        job.stage = status
+        job.finished_at = job.finished_at or time.time()
+        if status == "succeeded":
+            job.percent = 1.0
+        job.publish("done", status=status, percent=round(job.percent, 3), error=job.error)
+
+    def _prune(self) -> None:
+        cutoff = time.time() - self.keep_sec
+        stale = [k for k, j in self._jobs.items() if j.done and (j.finished_at or 0) < cutoff]
+        for k in stale:
+            del self._jobs[k]
+        if stale:
+            self._keys = {k: v for k, v in self._keys.items() if v in self._jobs}
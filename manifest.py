@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+manifest.py
+───────────
+Per-run file manifest (manifest.jsonl at the run root).
+
+Every stage that writes an output appends one JSON line describing it:
+path (relative to the run root), size, SHA-256, producing stage and time.
+server.py serves file listings and metadata (sizes, hashes) from this
+manifest instead of walking the run directory on every response.  Deleting a
+manifested output appends a tombstone (forget()), and after a fallback script
+that doesn't record its own outputs server.py reconciles the manifest with
+the run directory once (sync()).  Only runs without a manifest are listed by
+walking the directory.
+
+The run root comes from VOCIUS_MANIFEST_ROOT (server.py sets it per job);
+standalone runs without it don't write a manifest at all, so nothing lands
+next to the user's audio.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+MANIFEST_NAME = "manifest.jsonl"
+ROOT_ENV = "VOCIUS_MANIFEST_ROOT"
+
+
+def _sha256(path: Path, chunk_size: int = 1024 * 1024) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _append(root: Path, entry: Dict[str, Any]) -> None:
+    # one short O_APPEND write per entry, so concurrent stages don't interleave
+    with open(root / MANIFEST_NAME, "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry) + "\n")
+
+
+def _rel(path: Path, root: Path) -> str:
+    try:
+        return str(path.relative_to(root))
+    except ValueError:
+        return str(path)
+
+
+def record(path: Path, stage: str, root: Optional[Path] = None,
+           sha256: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Append *path* (written by *stage*) to the run manifest. Never raises; no-op without a run root."""
+    root = root or os.getenv(ROOT_ENV)
+    if not root:
+        return None
+    try:
+        path = Path(path).resolve()
+        root = Path(root).resolve()
+        entry = {
+            "path": _rel(path, root),
+            "size": path.stat().st_size,
+            "sha256": sha256 or _sha256(path),
+            "stage": stage,
+            "time": time.time(),
+        }
+        _append(root, entry)
+        return entry
+    except Exception:
+        return None
+
+
+def forget(path: Path, stage: str, root: Optional[Path] = None) -> None:
+    """Record that *stage* deleted *path*. Never raises; no-op without a run root."""
+    root = root or os.getenv(ROOT_ENV)
+    if not root:
+        return
+    try:
+        root = Path(root).resolve()
+        _append(root, {"path": _rel(Path(path).resolve(), root), "deleted": True,
+                       "stage": stage, "time": time.time()})
+    except Exception:
+        pass
+
+
+@lru_cache(maxsize=256)
+def _parse(manifest_path: str, mtime_ns: int, size: int) -> Dict[str, Dict[str, Any]]:
+    entries: Dict[str, Dict[str, Any]] = {}
+    with open(manifest_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                e = json.loads(line)
+            except ValueError:
+                continue                 # torn last line from a killed writer
+            if e.get("deleted"):
+                entries.pop(e["path"], None)
+            else:
+                entries[e["path"]] = e   # latest write of a path wins
+    return entries
+
+
+def load(root: Path) -> Optional[Dict[str, Dict[str, Any]]]:
+    """path → entry for the run at *root*, or None if it has no manifest."""
+    p = Path(root) / MANIFEST_NAME
+    try:
+        st = p.stat()
+    except OSError:
+        return None
+    return _parse(str(p), st.st_mtime_ns, st.st_size)
+
+
+def _walk(root: Path) -> List[Path]:
+    return [c for c in root.rglob("*") if c.is_file() and c.name != MANIFEST_NAME]
+
+
+def files(root: Path) -> List[str]:
+    """Relative paths of the run's files: from the manifest, or a directory walk for runs without one."""
+    entries = load(root)
+    if entries is not None:
+        return sorted(entries)
+    root = Path(root)
+    if not root.exists():
+        return []
+    return sorted(str(c.relative_to(root)) for c in _walk(root))
+
+
+def sync(root: Path, stage: str) -> Dict[str, Dict[str, Any]]:
+    """Bring the manifest in line with *root* after a stage that doesn't record its outputs.
+
+    New or rewritten files are recorded under *stage*, vanished ones forgotten;
+    this is the one directory walk such a run costs.
+    """
+    root = Path(root).resolve()
+    entries = dict(load(root) or {})
+    on_disk = {str(c.relative_to(root)): c for c in _walk(root)} if root.exists() else {}
+    for rel, path in on_disk.items():
+        e = entries.get(rel)
+        try:
+            st = path.stat()
+        except OSError:
+            continue
+        if e is None or e["size"] != st.st_size or st.st_mtime > e["time"]:
+            record(path, stage, root=root)
+    for rel in set(entries) - set(on_disk):
+        if not (root / rel).is_file():
+            forget(root / rel, stage, root=root)
+    return load(root) or {}
+
+
+def current(root: Path) -> Optional[Dict[str, Dict[str, Any]]]:
+    """Manifest entries of files that still exist under *root*, or None without a manifest."""
+    entries = load(root)
+    if entries is None:
+        return None
+    return {k: e for k, e in entries.items() if (Path(root) / k).is_file()}
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+progress.py
+───────────
+Maps the log lines printed by AnalyzeDebateV2 / AnalyzeSpeechV2 (and the
+RunDiarizationAAI helper they call) onto named stages with a percent and a
+friendly status label.  Shared by the Streamlit GUI and the server's job
+event stream so both read the pipelines the same way.
+"""
+
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+
+@dataclass(frozen=True)
+class Stage:
+    marker: str      # case-insensitive substring of a pipeline log line
+    name: str
+    percent: float   # 0.0 – 1.0
+    label: str
+
+
+DEBATE_STAGES: List[Stage] = [
+    Stage("Pipeline Start",              "starting",     0.02, "Starting debate pipeline…"),
+    Stage("Uploading to AssemblyAI",     "uploading",    0.10, "Uploading audio to AssemblyAI…"),
+    Stage("Queued at AssemblyAI",        "queued",       0.20, "Queued; AssemblyAI is processing…"),
+    Stage("Transcription status",        "transcribing", 0.40, "Transcribing your audio…"),
+    Stage("wrote transcript.txt",        "transcribed",  0.80, "Transcript ready."),
+    Stage("Reusing existing transcript", "transcribed",  0.80, "Transcript ready."),
+    Stage("🤖  Calling ",                 "judging",      0.85, "Evaluating arguments and writing an RFD…"),
+    Stage("wrote judging_feedback.txt",  "judged",       0.95, "Judging complete. Packaging outputs…"),
+    Stage("Done ===",                    "done",         1.00, "Done."),
+]
+
+SPEECH_STAGES: List[Stage] = [
+    Stage("STEP 1",                      "preparing",    0.10, "Normalizing audio to 16 kHz mono…"),
+    Stage("STEP 2",                      "diarizing",    0.20, "Running AssemblyAI diarization…"),
+    Stage("to AssemblyAI",               "uploading",    0.25, "Uploading to AssemblyAI…"),
+    Stage("Starting diarization job",    "queued",       0.35, "Queued; AssemblyAI is processing…"),
+    Stage("Waiting for AssemblyAI",      "transcribing", 0.45, "AssemblyAI diarization in progress…"),
+    Stage("Wrote diarization JSON",      "diarized",     0.60, "Diarization ready."),
+    Stage("STEP 3",                      "measuring",    0.70, "Analysing delivery metrics…"),
+    Stage("analyze_speech.txt",          "done",         1.00, "Delivery analysis complete."),
+]
+
+# /analyze/full: one diarized AssemblyAI job, then delivery metrics, then judging.
+FULL_STAGES: List[Stage] = [
+    Stage("to AssemblyAI",               "uploading",    0.10, "Uploading audio to AssemblyAI…"),
+    Stage("Starting diarization job",    "queued",       0.20, "Queued; AssemblyAI is processing…"),
+    Stage("Waiting for AssemblyAI",      "transcribing", 0.30, "Transcribing and diarizing your audio…"),
+    Stage("wrote transcript.txt",        "transcribed",  0.50, "Transcript ready."),
+    Stage("Wrote diarization JSON",      "diarized",     0.55, "Diarization ready."),
+    Stage("STEP 3",                      "measuring",    0.60, "Analysing delivery metrics…"),
+    Stage("analyze_speech.txt",          "measured",     0.70, "Delivery analysis complete."),
+    Stage("🤖  Calling ",                 "judging",      0.75, "Evaluating arguments and writing an RFD…"),
+    Stage("wrote judging_feedback.txt",  "judged",       0.95, "Judging complete. Packaging outputs…"),
+    Stage("Done ===",                    "done",         1.00, "Done."),
+]
+
+STAGES: Dict[str, List[Stage]] = {"debate": DEBATE_STAGES, "speech": SPEECH_STAGES, "full": FULL_STAGES}
+
+
+def stage_percent(table: List[Stage], name: str) -> float:
+    return next(st.percent for st in table if st.name == name)
+
+
+def match_stage(table: List[Stage], line: str) -> Optional[Stage]:
+    s = line.lower()
+    for st in table:
+        if st.marker.lower() in s:
+            return st
+    return None
+
+
+def progress_for_line(table: List[Stage], line: str, prev: float) -> float:
+    st = match_stage(table, line)
+    return max(prev, st.percent) if st else prev
+
+
+def status_for_line(table: List[Stage], line: str, cur: Optional[str]) -> Optional[str]:
+    st = match_stage(table, line)
+    return st.label if st else cur
+
+
+@dataclass
+class StageTracker:
+    """Forward-only stage state with wall-clock seconds spent in each stage."""
+    table: List[Stage]
+    clock: Callable[[], float] = time.time
+    stage: Optional[Stage] = None
+    percent: float = 0.0
+    timings: Dict[str, float] = field(default_factory=dict)
+    ceiling: float = 1.0     # ignore stages past this while only part of the pipeline runs
+    _entered: float = 0.0
+
+    def feed(self, line: str) -> Optional[Stage]:
+        """Return the new stage if *line* advances the pipeline, else None."""
+        st = match_stage(self.table, line)
+        if st is None or st.percent <= self.percent or st.percent > self.ceiling:
+            return None
+        self._close()
+        self.stage, self.percent, self._entered = st, st.percent, self.clock()
+        return st
+
+    def finish(self) -> None:
+        self._close()
+        self.stage = None
+
+    def _close(self) -> None:
+        if self.stage is not None:
+            spent = self.clock() - self._entered
+            self.timings[self.stage.name] = round(self.timings.get(self.stage.name, 0.0) + spent, 3)
@@ -0,0 +1,156 @@
+# results_store.py
+"""
+Finished analyses, persisted in the auth.py database.
+
+server.py saves each successful job here (judgeAnalysis, deliveryMetrics and
+a pointer to its run in the artifact store), so results pages and history
+lists are a single indexed row lookup instead of re-reading run folders.
+Rows carry an ETag (hash of the stored payload) for If-None-Match.
+
+Idempotency-Key submissions are recorded here as well (key → job id, a hash
+of the request parameters and the job's last status) for
+VOCIUS_IDEMPOTENCY_TTL_SEC, so a retry is recognised after the job has left
+the in-memory table or the server has restarted.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import JSON, Column, Index, and_, delete, or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import SQLModel, Field, Session, select
+
+from auth import engine
+
+class AnalysisResult(SQLModel, table=True):
+    __tablename__ = "analysis_result"
+    __table_args__ = (Index("ix_analysis_result_user_created", "user_id", "created_at"),)
+
+    id: str = Field(primary_key=True)                 # job id
+    user_id: int | None = Field(default=None, foreign_key="user.id")
+    kind: str                                         # "debate" | "speech"
+    audio_name: str | None = None
+    audio_sha256: str | None = None
+    run_id: str | None = None                         # artifacts.py run holding the files
+    judge_analysis: Dict[str, Any] | None = Field(default=None, sa_column=Column(JSON))
+    delivery_metrics: Dict[str, Any] | None = Field(default=None, sa_column=Column(JSON))
+    report: str | None = None                         # speech report preview
+    etag: str
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+IDEMPOTENCY_TTL_SEC = int(os.getenv("VOCIUS_IDEMPOTENCY_TTL_SEC", str(24 * 3600)))
+
+class IdempotencyRecord(SQLModel, table=True):
+    __tablename__ = "idempotency_key"
+
+    key: str = Field(primary_key=True)                # "idem:<user id>:<kind>:<Idempotency-Key>"
+    params_hash: str                                  # request parameters the key was first used with
+    job_id: str
+    kind: str
+    user_id: int | None = None
+    status: str = "queued"                            # the job's last known status
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+
+SQLModel.metadata.create_all(engine, tables=[AnalysisResult.__table__, IdempotencyRecord.__table__])
+
+def _etag(data: Dict[str, Any]) -> str:
+    blob = json.dumps(data, sort_keys=True, default=str).encode("utf-8")
+    return '"' + hashlib.sha256(blob).hexdigest()[:32] + '"'
+
+def save(job_id: str, kind: str, result: Dict[str, Any], params: Dict[str, Any],
+         user_id: Optional[int] = None) -> AnalysisResult:
+    data = {
+        "judge_analysis": result.get("judgeAnalysis"),
+        "delivery_metrics": result.get("deliveryMetrics"),
+        "report": result.get("report_preview"),
+        "run_id": params.get("run_id"),
+    }
+    row = AnalysisResult(
+        id=job_id,
+        user_id=user_id,
+        kind=kind,
+        audio_name=params.get("audio"),
+        audio_sha256=params.get("audio_sha256"),
+        etag=_etag(data),
+        **data,
+    )
+    with Session(engine) as s:
+        s.merge(row); s.commit()
+    return row
+
+def find_key(key: str) -> Optional[IdempotencyRecord]:
+    """The record for *key*, unless it is older than IDEMPOTENCY_TTL_SEC."""
+    cutoff = datetime.utcnow() - timedelta(seconds=IDEMPOTENCY_TTL_SEC)
+    with Session(engine) as s:
+        row = s.get(IdempotencyRecord, key)
+        return row if row is not None and row.created_at >= cutoff else None
+
+def remember_key(key: str, params_hash: str, job_id: str, kind: str,
+                 user_id: Optional[int] = None) -> IdempotencyRecord:
+    """Record *key* → *job_id*; if a live record already exists it wins and is returned."""
+    cutoff = datetime.utcnow() - timedelta(seconds=IDEMPOTENCY_TTL_SEC)
+    with Session(engine) as s:
+        s.exec(delete(IdempotencyRecord).where(IdempotencyRecord.created_at < cutoff))
+        s.commit()
+        row = IdempotencyRecord(key=key, params_hash=params_hash, job_id=job_id, kind=kind, user_id=user_id)
+        s.add(row)
+        try:
+            s.commit()
+        except IntegrityError:
+            s.rollback()
+            return s.get(IdempotencyRecord, key)
+        s.refresh(row)
+        return row
+
+def forget_key(key: str) -> None:
+    with Session(engine) as s:
+        s.exec(delete(IdempotencyRecord).where(IdempotencyRecord.key == key))
+        s.commit()
+
+def key_job_finished(job_id: str, status: str) -> None:
+    with Session(engine) as s:
+        s.exec(update(IdempotencyRecord).where(IdempotencyRecord.job_id == job_id).values(status=status))
+        s.commit()
+
+def get(result_id: str) -> Optional[AnalysisResult]:
+    with Session(engine) as s:
+        return s.get(AnalysisResult, result_id)
+
+def cursor(row: AnalysisResult) -> str:
+    """Keyset cursor "<created_at ISO>Z,<id>" for the page after *row*."""
+    return f"{row.created_at.isoformat()}Z,{row.id}"
+
+def parse_cursor(before: str) -> Tuple[datetime, str]:
+    """Inverse of cursor(); raises ValueError on anything malformed."""
+    ts, sep, rid = before.rpartition(",")
+    if not sep or not rid:
+        raise ValueError(f"bad cursor: {before!r}")
+    return datetime.fromisoformat(ts.rstrip("Z")), rid
+
+def list_for_user(user_id: int, limit: int = 20,
+                  before: Optional[Tuple[datetime, str]] = None) -> List[AnalysisResult]:
+    """Newest first; pass parse_cursor() of the last page's cursor as *before* for the next page."""
+    stmt = select(AnalysisResult).where(AnalysisResult.user_id == user_id)
+    if before is not None:
+        ts, rid = before
+        stmt = stmt.where(or_(AnalysisResult.created_at < ts,
+                              and_(AnalysisResult.created_at == ts, AnalysisResult.id < rid)))
+    stmt = stmt.order_by(AnalysisResult.created_at.desc(), AnalysisResult.id.desc()).limit(limit)
+    with Session(engine) as s:
+        return list(s.exec(stmt).all())
+
+def to_dict(row: AnalysisResult) -> Dict[str, Any]:
+    return {
+        "id": row.id,
+        "kind": row.kind,
+        "audioFileName": row.audio_name,
+        "createdAt": row.created_at.isoformat() + "Z",
+        "judgeAnalysis": row.judge_analysis,
+        "deliveryMetrics": row.delivery_metrics,
+        "report": row.report,
+        "runId": row.run_id,
+    }
@@ -1,21 +1,85 @@
 #!/usr/bin/env python3
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import json
 import os
-import shutil
-import subprocess
-import tempfile
+import secrets
+import threading
 import time
 import uuid
+from contextlib import asynccontextmanager
+from functools import partial
 from pathlib import Path
 from typing import Any, Dict, Optional, Tuple, List
 
-from fastapi import FastAPI, UploadFile, File, Form, Request
+from fastapi import Depends, FastAPI, UploadFile, File, Form, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 
-app = FastAPI(title="Vocius Local Backend", version="1.2")
+import aai_client
+import audio_fingerprint
+import results_store
+import stt_cache
+import stt_journal
+from batch import rounds_from_records
+from admission import Admission, GateFull, Reservation
+from artifacts import ArtifactStore, Run
+from auth import User, flush_last_logins, require_user, require_user_optional
+from content_store import Blob, ContentStore
+import manifest
+from jobs import FINISHED, Job, JobManager, ProcResult, QueueFull
+from progress import STAGES, stage_percent
+from workers import ENTRY_POINTS, WorkerPool
+
+jobs = JobManager()
+store = ContentStore()
+artifacts = ArtifactStore(content=store)
+admission = Admission()
+# Perceptual fingerprints map re-encoded duplicates onto the first upload's STT results.
+fingerprints = (audio_fingerprint.Index(store.root / "fingerprints.db")
+                if os.getenv("VOCIUS_FINGERPRINT", "1") != "0" else None)
+
+# Resources each job kind passes through (see admission.py).
+# Debate jobs decode the audio on the cpu gate only to fingerprint it.
+KIND_RESOURCES = {"speech": ("cpu", "stt"), "debate": ("cpu", "stt", "llm") if fingerprints else ("stt", "llm"),
+                  "full": ("cpu", "stt", "llm")}
+
+# Warm in-process workers (workers.py); VOCIUS_WARM_WORKERS=0 falls back to `python -u script.py`.
+# At most one gated step per slot runs at a time, so that many workers are ever busy.
+WARM_WORKERS = int(os.getenv("VOCIUS_WARM_WORKERS", str(admission.total_slots)))
+pool: Optional[WorkerPool] = None
+
+# AssemblyAI webhooks (AAI_WEBHOOK=1) are received once, by POST /aai-webhook
+# below, and handed to the waiting worker through aai_client's inbox directory.
+# Workers inherit one shared secret and never listen themselves, so any pool
+# size works.
+os.environ.setdefault("AAI_WEBHOOK_SECRET", secrets.token_urlsafe(16))
+os.environ.pop("AAI_WEBHOOK_BIND", None)
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    global pool
+    # API keys are never persisted, so transcripts a previous run left in the
+    # STT journal can't be resumed here; they resume when the same audio is
+    # submitted again (e.g. POST /batches/{id}/resume).  Say so, and list them in GET /jobs.
+    left = stt_journal.journal().in_flight()
+    if left:
+        print(f"⏸️  {len(left)} AssemblyAI transcription(s) interrupted by the last shutdown; "
+              f"resubmit the same audio to resume them", flush=True)
+    if WARM_WORKERS > 0:
+        pool = WorkerPool(WARM_WORKERS)
+        pool.start()
+    yield
+    jobs.shutdown()
+    flush_last_logins()
+    if pool is not None:
+        pool.shutdown()
+        pool = None
+
+app = FastAPI(title="Vocius Local Backend", version="1.3", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -26,33 +90,33 @@ app.add_middleware(
 )
 
 # ---------- helpers -----------------------------------------------------------
-def make_run_dir(prefix: str) -> Path:
-    return Path(tempfile.mkdtemp(prefix=prefix))
-
-def write_upload(upload: UploadFile, dest: Path) -> None:
-    dest.parent.mkdir(parents=True, exist_ok=True)
-    with dest.open("wb") as f:
-        shutil.copyfileobj(upload.file, f)
+def write_upload(upload: UploadFile, dest: Path) -> Blob:
+    """Hash the upload into the content store and link it to *dest*."""
+    blob = store.ingest(upload.file, upload.filename or dest.name)
     upload.file.seek(0)
+    store.link(blob.path, dest)
+    manifest.record(dest, "upload", root=dest.parent, sha256=blob.sha256)
+    return blob
 
-def run(cmd: list[str], env: Optional[Dict[str, str]] = None, cwd: Optional[Path] = None):
-    return subprocess.run(cmd, env=env, cwd=cwd, capture_output=True, text=True)
+def run_script(job: Job, script: str, argv: List[str], env_overrides: Dict[str, str]) -> ProcResult:
+    """Run a pipeline script on a warm worker when one serves it, else as a child interpreter."""
+    entry = next((e for e, mod in ENTRY_POINTS.items() if f"{mod}.py" == script), None)
+    if pool is not None and entry is not None:
+        return job.run_entry(pool, entry, argv, env=env_overrides, cwd=Path(".").resolve())
+    env = {**os.environ, **env_overrides}
+    return job.run_process(["python", "-u", script, *argv], env=env, cwd=Path("."))
+
+def gated(job: Job, reservation: Reservation, resource: str):
+    """Hold a *resource* slot for one pipeline step; the job shows waiting_<resource> while queued."""
+    return reservation.slot(resource, job.check_cancelled,
+                            on_wait=lambda: job.set_stage(f"waiting_{resource}"))
 
 def tail(text: str, n: int = 120) -> str:
     lines = (text or "").splitlines()
     return "\n".join(lines[-n:]) if len(lines) > n else (text or "")
 
 def list_files(p: Path) -> list[str]:
-    if not p.exists():
-        return []
-    out = []
-    for c in p.rglob("*"):
-        if c.is_file():
-            try:
-                out.append(str(c.relative_to(p)))
-            except Exception:
-                out.append(str(c))
-    return sorted(out)
+    return manifest.files(p)
 
 def coerce_flow_notes(raw: Any) -> List[Dict[str, str]]:
     """Normalize several possible shapes into [{speech,time,notes}]."""
@@ -139,51 +203,100 @@ def extract_feedback(work_dir: Path) -> Tuple[Optional[Dict[str, Any]], Optional
 
     return judgeAnalysis, deliveryMetrics, extras
 
-# ---------- routes ------------------------------------------------------------
-@app.get("/health")
-def health():
-    return {"ok": True, "status": "up", "time": int(time.time())}
+# ---------- pipelines (run on the job executor) -------------------------------
+def normalize_audio(job: Job, reservation: Reservation, run_dir: Path, audio_path: Path, audio_sha: str) -> Path:
+    """Decode once per recording: the 16 kHz WAV lives in the content store."""
+    with gated(job, reservation, "cpu"):
+        job.set_stage("normalizing")
+        try:
+            wav = store.normalized_wav(audio_path, audio_sha)
+            audio_path = store.link(wav, run_dir / "audio_16k.wav")
+            manifest.record(audio_path, "normalize", root=run_dir)
+        except Exception as e:
+            job.publish("log", line=f"normalization skipped: {e!r}")
+    return audio_path
 
-@app.post("/analyze/speech")
-async def analyze_speech(
-    request: Request,
-    file: UploadFile = File(...),
-    aai_key: Optional[str] = Form(None),
-    first: Optional[str] = Form(None),
-):
-    run_dir = make_run_dir("vocius_speech_")
-    work_dir = run_dir / "out"
-    work_dir.mkdir(parents=True, exist_ok=True)
+def canonical_sha(job: Job, reservation: Reservation, audio_path: Path, audio_sha: str, timed: bool) -> str:
+    """Content hash to key STT results by: an earlier upload's, when this one is a re-encoded copy of it.
+
+    These exact bytes' own cached results win, and only a miss is fingerprinted.
+    *timed* callers (diarization) only take a match whose timestamps line up
+    and whose duration agrees.
+    """
+    if fingerprints is None:
+        return audio_sha
+    if stt_cache.seen(audio_sha, store.stt_dir):
+        return audio_sha
+    match = fingerprints.known(audio_sha)
+    if match is None:
+        with gated(job, reservation, "cpu"):
+            job.set_stage("fingerprinting")
+            try:
+                wav = store.normalized_wav(audio_path, audio_sha)
+                match = fingerprints.resolve(wav, audio_sha)
+            except Exception as e:
+                job.publish("log", line=f"fingerprinting skipped: {e!r}")
+                return audio_sha
+    if match.sha256 == audio_sha or (timed and not match.aligned):
+        return audio_sha
+    job.publish("log", line=f"♻️  Same recording as an earlier upload ({match.sha256[:12]}, "
+                            f"offset {match.offset_sec:+.2f}s); reusing its transcripts")
+    return match.sha256
 
-    audio_name = file.filename or f"audio_{uuid.uuid4().hex}.m4a"
-    audio_path = run_dir / audio_name
-    write_upload(file, audio_path)
+def speech_pipeline(
+    job: Job,
+    run_dir: Path,
+    audio_path: Path,
+    audio_sha: str,
+    aai_key: Optional[str],
+    first: Optional[str],
+    reservation: Reservation,
+) -> Dict[str, Any]:
+    work_dir = run_dir / "out"
 
-    env = os.environ.copy()
+    env: Dict[str, str] = {"VOCIUS_STT_CACHE_DIR": str(store.stt_dir),
+                           manifest.ROOT_ENV: str(run_dir)}
     if aai_key:
         env["ASSEMBLYAI_API_KEY"] = aai_key
 
     script = "AnalyzeSpeechV2.py" if Path("AnalyzeSpeechV2.py").exists() else "AnalyzeSpeech.py"
     if not Path(script).exists():
-        return JSONResponse(
-            status_code=200,
-            content={
-                "ok": True,
-                "kind": "speech",
-                "message": "No AnalyzeSpeech script found. Returning placeholder.",
-                "run_dir": str(run_dir),
-                "work_dir": str(work_dir),
-                "files": list_files(run_dir),
-            },
-        )
-
-    cmd = ["python", "-u", script, str(audio_path), "--work-dir", str(work_dir)]
+        return {
+            "ok": True,
+            "kind": "speech",
+            "message": "No AnalyzeSpeech script found. Returning placeholder.",
+            "run_dir": str(run_dir),
+            "work_dir": str(work_dir),
+            "files": list_files(run_dir),
+        }
+
+    audio_path = normalize_audio(job, reservation, run_dir, audio_path, audio_sha)
+    audio_sha = canonical_sha(job, reservation, audio_path, audio_sha, timed=True)
+
+    argv = [str(audio_path), "--work-dir", str(work_dir), "--audio-sha256", audio_sha]
     if aai_key:
-        cmd += ["--aai-key", aai_key]
+        argv += ["--aai-key", aai_key]
     if first:
-        cmd += ["--first", first]
+        argv += ["--first", first]
 
-    proc = run(cmd, env=env, cwd=Path("."))
+    if script == "AnalyzeSpeechV2.py":
+        # Diarize (stt) and measure (cpu) as separate steps so each holds only its own resource.
+        diar_json = work_dir / "diarization.json"
+        diar_argv = [str(audio_path), "--out", str(diar_json), "--audio-sha256", audio_sha,
+                     "--aai-key", aai_key or os.getenv("ASSEMBLYAI_API_KEY", "")]
+        job.track(STAGES["speech"], ceiling=stage_percent(STAGES["speech"], "diarized"))
+        with gated(job, reservation, "stt"):
+            proc = run_script(job, "RunDiarizationAAI.py", diar_argv, env)
+        if proc.returncode == 0:
+            second = ["--second", "Neg" if first == "Aff" else "Aff"] if first else []
+            job.track(STAGES["speech"])
+            with gated(job, reservation, "cpu"):
+                proc = run_script(job, script, argv + second + ["--diarization-json", str(diar_json)], env)
+    else:
+        job.track(STAGES["speech"])
+        with gated(job, reservation, "stt"), gated(job, reservation, "cpu"):
+            proc = run_script(job, script, argv, env)
+        manifest.sync(run_dir, script.removesuffix(".py"))     # fallback script keeps no manifest
     report = work_dir / "analyze_speech.txt"
     payload: Dict[str, Any] = {
         "ok": proc.returncode == 0,
@@ -197,48 +310,33 @@ async def analyze_speech(
     }
     if report.exists():
         payload["report_preview"] = tail(report.read_text(encoding="utf-8"), 400)
+    return payload
 
-    # Always 200; UI decides based on ok
-    return JSONResponse(status_code=200, content=payload)
-
-@app.post("/analyze/debate")
-async def analyze_debate(
-    request: Request,
-    file: UploadFile = File(...),
-    aai_key: Optional[str] = Form(None),
-    or_key: Optional[str] = Form(None),
-    topic: Optional[str] = Form(None),
-    style: Optional[str] = Form(None),
-    model: Optional[str] = Form(None),
-    first: Optional[str] = Form(None),
-):
-    # Validate → still return 200, but with ok:false
-    missing = []
-    if not file: missing.append("file")
-    if not aai_key: missing.append("aai_key")
-    if not or_key: missing.append("or_key")
-    if missing:
-        return JSONResponse(status_code=200, content={"ok": False, "kind": "debate", "error": f"Missing: {', '.join(missing)}"})
-
-    topic = topic or "N/A"
-    style = style or "tech"
-    model = model or "openai/gpt-4o-2024-11-20"
-    first = first or "Aff"
-
-    run_dir = make_run_dir("vocius_debate_")
+def debate_pipeline(
+    job: Job,
+    run_dir: Path,
+    audio_path: Path,
+    audio_sha: str,
+    aai_key: str,
+    or_key: str,
+    topic: str,
+    style: str,
+    model: str,
+    first: str,
+    reservation: Reservation,
+) -> Dict[str, Any]:
     work_dir = run_dir / "out"
-    work_dir.mkdir(parents=True, exist_ok=True)
 
-    audio_path = run_dir / (file.filename or f"audio_{uuid.uuid4().hex}.m4a")
-    write_upload(file, audio_path)
-
-    env = os.environ.copy()
-    env["ASSEMBLYAI_API_KEY"] = aai_key or ""
-    env["OPENROUTER_API_KEY"] = or_key or ""
+    env = {
+        "ASSEMBLYAI_API_KEY": aai_key or "",
+        "OPENROUTER_API_KEY": or_key or "",
+        "VOCIUS_STT_CACHE_DIR": str(store.stt_dir),
+        manifest.ROOT_ENV: str(run_dir),
+    }
 
     script = "AnalyzeDebateV2.py" if Path("AnalyzeDebateV2.py").exists() else "AnalyzeDebate.py"
     if not Path(script).exists():
-        payload = {
+        return {
             "ok": True,
             "kind": "debate",
             "message": "No AnalyzeDebate script found. Returning placeholder.",
@@ -246,23 +344,39 @@ async def analyze_debate(
             "work_dir": str(work_dir),
             "files": list_files(run_dir),
         }
-        return JSONResponse(status_code=200, content=payload)
 
-    cmd = [
-        "python", "-u", script,
+    audio_sha = canonical_sha(job, reservation, audio_path, audio_sha, timed=False)
+    argv = [
         "--audio", str(audio_path),
         "--topic", topic,
         "--first", first,
         "--style", style,
         "--model", model,
         "--work-dir", str(work_dir),
+        "--audio-sha256", audio_sha,
     ]
 
-    proc = run(cmd, env=env, cwd=Path("."))
+    if script == "AnalyzeDebateV2.py":
+        # Transcribe (stt) then judge (llm), each step holding only its own resource.
+        job.track(STAGES["debate"], ceiling=stage_percent(STAGES["debate"], "transcribed"))
+        with gated(job, reservation, "stt"):
+            proc = run_script(job, script, argv + ["--no-gpt"], env)
+        if proc.returncode == 0:
+            job.track(STAGES["debate"])
+            with gated(job, reservation, "llm"):
+                proc = run_script(job, script, argv + ["--reuse-transcript"], env)
+    else:
+        job.track(STAGES["debate"])
+        with gated(job, reservation, "stt"), gated(job, reservation, "llm"):
+            proc = run_script(job, script, argv, env)
+        manifest.sync(run_dir, script.removesuffix(".py"))     # fallback script keeps no manifest
+    return debate_payload("debate", proc, run_dir, work_dir)
+
+def debate_payload(kind: str, proc: ProcResult, run_dir: Path, work_dir: Path) -> Dict[str, Any]:
     stdout, stderr = tail(proc.stdout), tail(proc.stderr)
 
     # Try to merge run.json + judge_feedback
-    base: Dict[str, Any] = {"ok": proc.returncode == 0, "kind": "debate"}
+    base: Dict[str, Any] = {"ok": proc.returncode == 0, "kind": kind}
     run_json = work_dir / "run.json"
     if run_json.exists():
         try:
@@ -283,6 +397,655 @@ async def analyze_debate(
         "stderr_tail": stderr,
         **extras,
     })
+    return base
+
+def full_pipeline(
+    job: Job,
+    run_dir: Path,
+    audio_path: Path,
+    audio_sha: str,
+    aai_key: str,
+    or_key: str,
+    topic: str,
+    style: str,
+    model: str,
+    first: str,
+    reservation: Reservation,
+) -> Dict[str, Any]:
+    """Debate judging + delivery metrics from one decode and one diarized AssemblyAI job."""
+    work_dir = run_dir / "out"
+    env = {
+        "ASSEMBLYAI_API_KEY": aai_key or "",
+        "OPENROUTER_API_KEY": or_key or "",
+        "VOCIUS_STT_CACHE_DIR": str(store.stt_dir),
+        manifest.ROOT_ENV: str(run_dir),
+    }
+    table = STAGES["full"]
+    audio_path = normalize_audio(job, reservation, run_dir, audio_path, audio_sha)
+    audio_sha = canonical_sha(job, reservation, audio_path, audio_sha, timed=True)
+
+    # One diarized request; its text doubles as the judging transcript.
+    diar_json = work_dir / "diarization.json"
+    job.track(table, ceiling=stage_percent(table, "diarized"))
+    with gated(job, reservation, "stt"):
+        proc = run_script(job, "RunDiarizationAAI.py", [
+            str(audio_path), "--out", str(diar_json), "--transcript-out", str(work_dir / "transcript.txt"),
+            "--aai-key", aai_key, "--audio-sha256", audio_sha,
+        ], env)
+
+    speech_proc: Optional[ProcResult] = None
+    if proc.returncode == 0:
+        job.track(table, ceiling=stage_percent(table, "measured"))
+        with gated(job, reservation, "cpu"):
+            speech_proc = run_script(job, "AnalyzeSpeechV2.py", [
+                str(audio_path), "--work-dir", str(work_dir), "--first", first,
+                "--second", "Neg" if first == "Aff" else "Aff", "--diarization-json", str(diar_json),
+            ], env)
+        job.track(table)
+        with gated(job, reservation, "llm"):
+            proc = run_script(job, "AnalyzeDebateV2.py", [
+                "--audio", str(audio_path), "--topic", topic, "--first", first, "--style", style,
+                "--model", model, "--work-dir", str(work_dir), "--reuse-transcript",
+            ], env)
+
+    payload = debate_payload("full", proc, run_dir, work_dir)
+    report = work_dir / "analyze_speech.txt"
+    if speech_proc is not None:
+        payload["ok"] = payload["ok"] and speech_proc.returncode == 0
+        payload["speech_returncode"] = speech_proc.returncode
+        payload["speech_stderr_tail"] = tail(speech_proc.stderr)
+    if report.exists():
+        payload["report_preview"] = tail(report.read_text(encoding="utf-8"), 400)
+    return payload
+
+# ---------- job plumbing ------------------------------------------------------
+JOB_KINDS = ("speech", "debate", "full")
+
+async def stage_upload(file: UploadFile, kind: str, user_id: Optional[int]) -> Tuple[str, Path, Path, Blob]:
+    """Create *user_id*'s run in the artifact store and hash the upload into it off the event loop."""
+    run = await run_in_threadpool(artifacts.create, kind, user_id)
+    run_dir = run.path
+    (run_dir / "out").mkdir(parents=True, exist_ok=True)
+    audio_path = run_dir / Path(file.filename or f"audio_{uuid.uuid4().hex}.m4a").name
+    blob = await run_in_threadpool(write_upload, file, audio_path)
+    return run.id, run_dir, audio_path, blob
+
+def debate_missing(file: Optional[UploadFile], aai_key: Optional[str], or_key: Optional[str]) -> List[str]:
+    missing = []
+    if not file: missing.append("file")
+    if not aai_key: missing.append("aai_key")
+    if not or_key: missing.append("or_key")
+    return missing
+
+class IdempotencyConflict(Exception):
+    """An Idempotency-Key was reused with different request parameters."""
+
+def upload_sha256(upload: UploadFile) -> str:
+    """SHA-256 of the spooled upload, leaving it rewound for write_upload."""
+    h = hashlib.sha256()
+    upload.file.seek(0)
+    for chunk in iter(lambda: upload.file.read(1024 * 1024), b""):
+        h.update(chunk)
+    upload.file.seek(0)
+    return h.hexdigest()
+
+def request_hash(kind: str, audio_sha: str, topic: Optional[str], style: Optional[str],
+                 model: Optional[str], first: Optional[str]) -> str:
+    """What an Idempotency-Key is bound to: the recording's bytes and the job parameters (API keys left out)."""
+    blob = json.dumps({"kind": kind, "audio": audio_sha, "topic": topic,
+                       "style": style, "model": model, "first": first}, sort_keys=True)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+def replayed_job(rec: results_store.IdempotencyRecord) -> Optional[Job]:
+    """A finished job that has left the job table, rebuilt from the results DB (None if it never finished)."""
+    if rec.status not in FINISHED:
+        return None                  # lost to a restart while queued or running
+    job = Job(id=rec.job_id, kind=rec.kind, params={}, user_id=rec.user_id,
+              status=rec.status, stage=rec.status, percent=1.0)
+    row = results_store.get(rec.job_id) if rec.status == "succeeded" else None
+    if row is not None:
+        job.params["run_id"] = row.run_id
+        job.result = {"ok": True, "kind": rec.kind, **results_store.to_dict(row)}
+    elif rec.status != "cancelled":
+        job.error = "result no longer available"
+    return job
+
+async def submit_job(
+    kind: str,
+    file: UploadFile,
+    aai_key: Optional[str],
+    or_key: Optional[str],
+    topic: Optional[str],
+    style: Optional[str],
+    model: Optional[str],
+    first: Optional[str],
+    user: Optional[User] = None,
+    idempotency_key: Optional[str] = None,
+) -> Job:
+    """Stage the upload and queue the pipeline. Raises QueueFull/GateFull when saturated.
+
+    A repeated Idempotency-Key, or the same audio and parameters as a job still
+    in flight, returns that existing job instead of starting another pipeline.
+    Keys are kept in the results DB for VOCIUS_IDEMPOTENCY_TTL_SEC, so retries
+    outlive the job table and restarts; reusing one with different parameters
+    raises IdempotencyConflict.
+    """
+    user_id = user.id if user else None
+    idem = f"idem:{user_id}:{kind}:{idempotency_key}" if idempotency_key else None
+    if idem:
+        audio_sha = await run_in_threadpool(upload_sha256, file)
+        params_hash = request_hash(kind, audio_sha, topic, style, model, first)
+        rec = await run_in_threadpool(results_store.find_key, idem)
+        if rec is not None:
+            if rec.params_hash != params_hash:
+                raise IdempotencyConflict("Idempotency-Key was already used with different parameters")
+            existing = jobs.get(rec.job_id) or await run_in_threadpool(replayed_job, rec)
+            if existing is not None:
+                return existing
+            await run_in_threadpool(results_store.forget_key, idem)     # never finished: run it again
+        existing = jobs.find(idem, include_finished=True)
+        if existing is not None:
+            return existing
+    # Refuse before touching the upload if any resource this job needs is backed up.
+    reservation = admission.admit(KIND_RESOURCES[kind])
+    try:
+        run_id, run_dir, audio_path, blob = await stage_upload(file, kind, user_id)
+        job = queue_job(kind, run_id, run_dir, audio_path, blob.sha256, reservation,
+                        aai_key, or_key, topic, style, model, first, user_id, idem)
+    except BaseException:
+        reservation.close()
+        raise
+    if job.params.get("run_id") != run_id:
+        await run_in_threadpool(artifacts.discard, run_id)      # coalesced into an earlier job
+    if idem:
+        await run_in_threadpool(results_store.remember_key, idem, params_hash, job.id, kind, user_id)
+    return job
+
+def queue_job(
+    kind: str,
+    run_id: str,
+    run_dir: Path,
+    audio_path: Path,
+    audio_sha: str,
+    reservation: Reservation,
+    aai_key: Optional[str],
+    or_key: Optional[str],
+    topic: Optional[str],
+    style: Optional[str],
+    model: Optional[str],
+    first: Optional[str],
+    user_id: Optional[int] = None,
+    idempotency_key: Optional[str] = None,
+) -> Job:
+    """Queue the pipeline for an already staged run. Raises QueueFull when saturated.
+
+    When an equivalent job is already in flight that job is returned instead
+    (its params["run_id"] is then not *run_id*; the caller owns the unused run).
+    """
+    if kind == "speech":
+        params = {"first": first, "audio": audio_path.name, "audio_sha256": audio_sha, "run_id": run_id}
+        fn = partial(speech_pipeline, run_dir=run_dir, audio_path=audio_path, audio_sha=audio_sha,
+                     aai_key=aai_key, first=first, reservation=reservation)
+    else:
+        topic = topic or "N/A"
+        style = style or "tech"
+        model = model or "openai/gpt-4o-2024-11-20"
+        first = first or "Aff"
+        params = {"topic": topic, "style": style, "model": model, "first": first,
+                  "audio": audio_path.name, "audio_sha256": audio_sha, "run_id": run_id}
+        pipeline = full_pipeline if kind == "full" else debate_pipeline
+        fn = partial(pipeline, run_dir=run_dir, audio_path=audio_path, audio_sha=audio_sha,
+                     aai_key=aai_key or "", or_key=or_key or "",
+                     topic=topic, style=style, model=model, first=first, reservation=reservation)
+    job, created = jobs.submit_once(kind, params, fn, coalesce_key=coalesce_key(kind, params, user_id),
+                                    idempotency_key=idempotency_key, user_id=user_id)
+    if not created:
+        reservation.close()
+        return job
+    job.future.add_done_callback(lambda _f: on_job_done(job, run_id, reservation, user_id))
+    return job
+
+def coalesce_key(kind: str, params: Dict[str, Any], user_id: Optional[int]) -> str:
+    """Same user, kind, audio content and analysis parameters → same job."""
+    same = {k: v for k, v in params.items() if k not in ("audio", "run_id")}
+    blob = json.dumps({"kind": kind, "user": user_id, **same}, sort_keys=True)
+    return "job:" + hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+def on_job_done(job: Job, run_id: str, reservation: Reservation, user_id: Optional[int]) -> None:
+    """Runs once per job, whether it succeeded, failed or was cancelled."""
+    reservation.close()
+    # Record the run's size and trim the store.
+    artifacts.finalize(run_id)
+    if job.status == "succeeded" and job.result is not None:
+        results_store.save(job.id, job.kind, job.result, job.params, user_id)
+    results_store.key_job_finished(job.id, job.status)
+
+def idempotency_conflict_response(kind: str, e: IdempotencyConflict) -> JSONResponse:
+    return JSONResponse(status_code=422, content={"ok": False, "kind": kind, "error": str(e)})
+
+def queue_full_response(kind: str, e: Exception) -> JSONResponse:
+    retry_after = e.retry_after if isinstance(e, GateFull) else 30
+    return JSONResponse(status_code=429, headers={"Retry-After": str(retry_after)},
+                        content={"ok": False, "kind": kind, "error": f"Server busy: {e}"})
+
+# ---------- tournament batches ------------------------------------------------
+# A batch is a list of staged debate runs fed to the job queue by a background
+# thread as admission allows.  Each batch is persisted as batches/<id>.json in
+# the artifact store, so its index survives restarts; API keys are held only in
+# memory, so rounds cut off by a restart are resumed via POST /batches/{id}/resume.
+BATCH_DIR = artifacts.root / "batches"
+BATCH_DIR.mkdir(parents=True, exist_ok=True)
+batches: Dict[str, Dict[str, Any]] = {}
+batch_lock = threading.Lock()
+feeding: set = set()      # batch ids with a live feeder thread
+BATCH_POLL_SEC = 2.0      # feeder back-off while admission is saturated
+
+def save_batch(b: Dict[str, Any]) -> None:
+    with batch_lock:
+        tmp = BATCH_DIR / f"{b['id']}.json.tmp"
+        tmp.write_text(json.dumps(b, indent=2), encoding="utf-8")
+        os.replace(tmp, BATCH_DIR / f"{b['id']}.json")
+
+def load_batch(batch_id: str) -> Optional[Dict[str, Any]]:
+    if batch_id in batches:
+        return batches[batch_id]
+    p = BATCH_DIR / f"{Path(batch_id).name}.json"
+    if not p.exists():
+        return None
+    b = json.loads(p.read_text(encoding="utf-8"))
+    batches[batch_id] = b
+    return b
+
+def round_status(rnd: Dict[str, Any]) -> Dict[str, Any]:
+    job_id = rnd.get("job_id")
+    job = jobs.get(job_id) if job_id else None
+    if job is not None:
+        return {"status": job.status, "stage": job.stage, "percent": round(job.percent, 3), "error": job.error}
+    if job_id and results_store.get(job_id) is not None:
+        return {"status": "succeeded", "stage": "succeeded", "percent": 1.0, "error": None}
+    return {"status": "interrupted" if job_id else "pending", "stage": None, "percent": 0.0, "error": None}
+
+def feed_batch(b: Dict[str, Any], aai_key: str, or_key: str) -> None:
+    """Queue the batch's unsubmitted rounds in order, backing off while the server is saturated."""
+    for rnd in b["rounds"]:
+        if rnd.get("job_id") and round_status(rnd)["status"] != "interrupted":
+            continue
+        run = artifacts.get(rnd["run_id"], touch=False)
+        if run is None:
+            rnd["error"] = "run evicted before it was judged"
+            save_batch(b)
+            continue
+        while True:
+            try:
+                reservation = admission.admit(KIND_RESOURCES["debate"])
+            except GateFull as e:
+                time.sleep(min(e.retry_after, BATCH_POLL_SEC))
+                continue
+            try:
+                job = queue_job("debate", run.id, run.path, run.path / rnd["audio"], rnd["audio_sha256"],
+                                reservation, aai_key, or_key, rnd["topic"], rnd["style"], rnd["model"],
+                                rnd["first"], b.get("user_id"))
+                if job.params.get("run_id") != run.id:
+                    artifacts.finalize(run.id)                  # identical round already in flight
+                break
+            except QueueFull:
+                reservation.close()
+                time.sleep(BATCH_POLL_SEC)
+        rnd["job_id"] = job.id
+        save_batch(b)
+
+def start_batch_feeder(b: Dict[str, Any], aai_key: str, or_key: str) -> bool:
+    """Start feeding *b* unless a feeder is already running for it."""
+    with batch_lock:
+        if b["id"] in feeding:
+            return False
+        feeding.add(b["id"])
+
+    def run() -> None:
+        try:
+            feed_batch(b, aai_key, or_key)
+        finally:
+            with batch_lock:
+                feeding.discard(b["id"])
+
+    threading.Thread(target=run, name=f"vocius-batch-{b['id'][:8]}", daemon=True).start()
+    return True
+
+def can_see(owner_id: Optional[int], user: Optional[User]) -> bool:
+    return owner_id is None or can_manage(owner_id, user)
+
+def can_manage(owner_id: Optional[int], user: Optional[User]) -> bool:
+    """Owner or admin; runs without an owner are left to admins."""
+    return user is not None and ((owner_id is not None and user.id == owner_id) or user.role == "admin")
+
+async def wait_for_job(job: Job) -> Dict[str, Any]:
+    """Await a job without blocking the loop; used by the legacy synchronous routes."""
+    if job.future is not None:
+        await asyncio.wrap_future(job.future)
+    ids = {"jobId": job.id, "runId": job.params.get("run_id")}
+    if job.result is not None:
+        # a succeeded job's result row shares its id (see on_job_done)
+        return {**job.result, **ids, "resultId": job.id if job.status == "succeeded" else None}
+    return {"ok": False, "kind": job.kind, "status": job.status, "error": job.error or job.status, **ids}
+
+SSE_KEEPALIVE_SEC = 15.0
+
+def format_sse(ev: Dict[str, Any]) -> str:
+    return f"id: {ev['seq']}\nevent: {ev['type']}\ndata: {json.dumps(ev)}\n\n"
+
+async def job_event_stream(job: Job, since: int, request: Request):
+    """Replay events after *since*, then forward live ones until the job finishes."""
+    backlog, queue = job.subscribe(asyncio.get_running_loop(), since)
+    try:
+        for ev in backlog:
+            yield format_sse(ev)
+            if ev["type"] == "done":
+                return
+        if job.done:
+            return
+        while True:
+            try:
+                ev = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_SEC)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    return
+                yield ": keep-alive\n\n"
+                continue
+            yield format_sse(ev)
+            if ev["type"] == "done":
+                return
+    finally:
+        job.unsubscribe(queue)
+
+# ---------- routes ------------------------------------------------------------
+@app.get("/health")
+def health():
+    return {"ok": True, "status": "up", "time": int(time.time())}
+
+@app.post("/aai-webhook")
+async def aai_webhook(request: Request):
+    """AssemblyAI's completion callback; the worker waiting on the transcript picks it up."""
+    receiver = aai_client.webhook_receiver(listen=False)
+    if receiver is None:
+        return JSONResponse(status_code=404, content={"ok": False, "error": "Webhooks are off"})
+    if not receiver.authorized(request.headers.get(aai_client.WEBHOOK_HEADER)):
+        return JSONResponse(status_code=403, content={"ok": False, "error": "Bad webhook secret"})
+    try:
+        data = await request.json()
+        receiver.deliver(str(data["transcript_id"]), str(data.get("status", "")))
+    except (ValueError, KeyError, TypeError):
+        return JSONResponse(status_code=400, content={"ok": False, "error": "Bad webhook body"})
+    return {"ok": True}
+
+@app.get("/jobs")
+def jobs_status():
+    return {"ok": True, "jobs": jobs.stats(), "admission": admission.stats(),
+            "workers": pool.stats() if pool is not None else None, "artifacts": artifacts.stats(),
+            "stt_in_flight": [{"stage": e.stage, "transcriptId": e.transcript_id, "updatedAt": e.updated_at}
+                              for e in stt_journal.journal().in_flight()]}
+
+@app.post("/analyze/speech")
+async def analyze_speech(
+    request: Request,
+    file: UploadFile = File(...),
+    aai_key: Optional[str] = Form(None),
+    first: Optional[str] = Form(None),
+    user: Optional[User] = Depends(require_user_optional),
+    idempotency_key: Optional[str] = Header(None),
+):
+    try:
+        job = await submit_job("speech", file, aai_key, None, None, None, None, first, user, idempotency_key)
+    except (QueueFull, GateFull) as e:
+        return queue_full_response("speech", e)
+    except IdempotencyConflict as e:
+        return idempotency_conflict_response("speech", e)
+
+    # Always 200; UI decides based on ok
+    return JSONResponse(status_code=200, content=await wait_for_job(job))
+
+@app.post("/analyze/debate")
+async def analyze_debate(
+    request: Request,
+    file: UploadFile = File(...),
+    aai_key: Optional[str] = Form(None),
+    or_key: Optional[str] = Form(None),
+    topic: Optional[str] = Form(None),
+    style: Optional[str] = Form(None),
+    model: Optional[str] = Form(None),
+    first: Optional[str] = Form(None),
+    user: Optional[User] = Depends(require_user_optional),
+    idempotency_key: Optional[str] = Header(None),
+):
+    # Validate → still return 200, but with ok:false
+    missing = debate_missing(file, aai_key, or_key)
+    if missing:
+        return JSONResponse(status_code=200, content={"ok": False, "kind": "debate", "error": f"Missing: {', '.join(missing)}"})
+
+    try:
+        job = await submit_job("debate", file, aai_key, or_key, topic, style, model, first, user, idempotency_key)
+    except (QueueFull, GateFull) as e:
+        return queue_full_response("debate", e)
+    except IdempotencyConflict as e:
+        return idempotency_conflict_response("debate", e)
+
+    # Always 200
+    return JSONResponse(status_code=200, content=await wait_for_job(job))
+
+@app.post("/analyze/full")
+async def analyze_full(
+    request: Request,
+    file: UploadFile = File(...),
+    aai_key: Optional[str] = Form(None),
+    or_key: Optional[str] = Form(None),
+    topic: Optional[str] = Form(None),
+    style: Optional[str] = Form(None),
+    model: Optional[str] = Form(None),
+    first: Optional[str] = Form(None),
+    user: Optional[User] = Depends(require_user_optional),
+    idempotency_key: Optional[str] = Header(None),
+):
+    missing = debate_missing(file, aai_key, or_key)
+    if missing:
+        return JSONResponse(status_code=200, content={"ok": False, "kind": "full", "error": f"Missing: {', '.join(missing)}"})
+
+    try:
+        job = await submit_job("full", file, aai_key, or_key, topic, style, model, first, user, idempotency_key)
+    except (QueueFull, GateFull) as e:
+        return queue_full_response("full", e)
+    except IdempotencyConflict as e:
+        return idempotency_conflict_response("full", e)
 
     # Always 200
-    return JSONResponse(status_code=200, content=base)
+    return JSONResponse(status_code=200, content=await wait_for_job(job))
+
+@app.post("/jobs/{kind}")
+async def create_job(
+    kind: str,
+    file: UploadFile = File(...),
+    aai_key: Optional[str] = Form(None),
+    or_key: Optional[str] = Form(None),
+    topic: Optional[str] = Form(None),
+    style: Optional[str] = Form(None),
+    model: Optional[str] = Form(None),
+    first: Optional[str] = Form(None),
+    user: Optional[User] = Depends(require_user_optional),
+    idempotency_key: Optional[str] = Header(None),
+):
+    if kind not in JOB_KINDS:
+        return JSONResponse(status_code=404, content={"ok": False, "error": f"Unknown job kind: {kind}"})
+    if kind in ("debate", "full"):
+        missing = debate_missing(file, aai_key, or_key)
+        if missing:
+            return JSONResponse(status_code=400, content={"ok": False, "kind": kind, "error": f"Missing: {', '.join(missing)}"})
+
+    try:
+        job = await submit_job(kind, file, aai_key, or_key, topic, style, model, first, user, idempotency_key)
+    except (QueueFull, GateFull) as e:
+        return queue_full_response(kind, e)
+    except IdempotencyConflict as e:
+        return idempotency_conflict_response(kind, e)
+    return JSONResponse(status_code=202, content={"ok": True, "job": job.snapshot(include_result=False)})
+
+def visible_job(job_id: str, user: Optional[User]) -> Optional[Job]:
+    """The job, unless it belongs to someone else (reported as unknown, like /results)."""
+    job = jobs.get(job_id)
+    return job if job is not None and can_see(job.user_id, user) else None
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str, user: Optional[User] = Depends(require_user_optional)):
+    job = visible_job(job_id, user)
+    if job is None:
+        return JSONResponse(status_code=404, content={"ok": False, "error": "Unknown job"})
+    return {"ok": True, "job": job.snapshot()}
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str, request: Request, user: Optional[User] = Depends(require_user_optional)):
+    job = visible_job(job_id, user)
+    if job is None:
+        return JSONResponse(status_code=404, content={"ok": False, "error": "Unknown job"})
+    last_id = request.headers.get("last-event-id") or request.query_params.get("since") or "0"
+    since = int(last_id) if last_id.isdigit() else 0
+    return StreamingResponse(
+        job_event_stream(job, since, request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.delete("/jobs/{job_id}")
+def cancel_job(job_id: str, user: Optional[User] = Depends(require_user_optional)):
+    job = visible_job(job_id, user)
+    if job is not None:
+        job = jobs.cancel(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"ok": False, "error": "Unknown job"})
+    return {"ok": True, "job": job.snapshot(include_result=False)}
+
+def visible_run(run_id: str, user: Optional[User], touch: bool = False) -> Optional[Run]:
+    """The run, unless the job that created it belongs to someone else (reported as unknown)."""
+    run = artifacts.get(run_id, touch=touch)
+    return run if run is not None and can_see(run.user_id, user) else None
+
+@app.get("/runs/{run_id}")
+def get_run(run_id: str, user: Optional[User] = Depends(require_user_optional)):
+    run = visible_run(run_id, user, touch=True)
+    if run is None:
+        return JSONResponse(status_code=404, content={"ok": False, "error": "Unknown run"})
+    entries = manifest.current(run.path)
+    return {"ok": True, "run": run.to_dict(), "files": list_files(run.path),
+            "manifest": sorted(entries.values(), key=lambda e: e["path"]) if entries is not None else None}
+
+@app.get("/runs/{run_id}/bundle")
+def get_run_bundle(run_id: str, user: Optional[User] = Depends(require_user_optional)):
+    zip_path = artifacts.bundle(run_id) if visible_run(run_id, user) else None
+    if zip_path is None:
+        return JSONResponse(status_code=404, content={"ok": False, "error": "Unknown run"})
+    return FileResponse(zip_path, media_type="application/zip", filename=f"{run_id}.zip")
+
+def set_pin(run_id: str, pinned: bool, user: Optional[User]):
+    run = visible_run(run_id, user)
+    if run is None:
+        return JSONResponse(status_code=404, content={"ok": False, "error": "Unknown run"})
+    if not can_manage(run.user_id, user):
+        return JSONResponse(status_code=403, content={"ok": False, "error": "Only the run's owner or an admin can pin it"})
+    return {"ok": True, "run": artifacts.pin(run_id, pinned).to_dict()}
+
+@app.post("/runs/{run_id}/pin")
+def pin_run(run_id: str, user: Optional[User] = Depends(require_user_optional)):
+    return set_pin(run_id, True, user)
+
+@app.delete("/runs/{run_id}/pin")
+def unpin_run(run_id: str, user: Optional[User] = Depends(require_user_optional)):
+    return set_pin(run_id, False, user)
+
+@app.get("/results")
+def list_results(limit: int = 20, before: Optional[str] = None, user: User = Depends(require_user)):
+    """Newest first; pass the previous page's `next` as *before* for the next page."""
+    limit = min(max(limit, 1), 100)
+    try:
+        cursor = results_store.parse_cursor(before) if before else None
+    except ValueError:
+        return JSONResponse(status_code=400, content={"ok": False, "error": "Invalid cursor"})
+    rows = results_store.list_for_user(user.id, limit, cursor)
+    return {"ok": True, "results": [results_store.to_dict(r) for r in rows],
+            "next": results_store.cursor(rows[-1]) if len(rows) == limit else None}
+
+@app.get("/results/{result_id}")
+def get_result(result_id: str, request: Request, user: Optional[User] = Depends(require_user_optional)):
+    row = results_store.get(result_id)
+    if row is None or not can_see(row.user_id, user):
+        return JSONResponse(status_code=404, content={"ok": False, "error": "Unknown result"})
+    headers = {"ETag": row.etag, "Cache-Control": "private, no-cache"}
+    if request.headers.get("if-none-match") == row.etag:
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(content={"ok": True, "result": results_store.to_dict(row)}, headers=headers)
+
+@app.post("/batches")
+async def create_batch(
+    files: List[UploadFile] = File(...),
+    rounds: Optional[str] = Form(None),
+    aai_key: Optional[str] = Form(None),
+    or_key: Optional[str] = Form(None),
+    topic: Optional[str] = Form(None),
+    style: Optional[str] = Form(None),
+    model: Optional[str] = Form(None),
+    first: Optional[str] = Form(None),
+    user: Optional[User] = Depends(require_user_optional),
+):
+    """
+    Judge many rounds at once. *rounds* is an optional JSON list of
+    {file, topic?, first?, style?, model?, id?} matched to the uploads by file
+    name; the plain form fields are defaults for anything unspecified.
+    """
+    missing = [k for k, v in (("aai_key", aai_key), ("or_key", or_key)) if not v]
+    if missing:
+        return JSONResponse(status_code=400, content={"ok": False, "error": f"Missing: {', '.join(missing)}"})
+    by_name = {Path(f.filename or "").name: f for f in files}
+    try:
+        records = json.loads(rounds) if rounds else [{"file": name} for name in by_name]
+        specs = rounds_from_records(records, {"topic": topic or "N/A", "first": first,
+                                              "style": style, "model": model})
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"ok": False, "error": f"Bad rounds: {e}"})
+    unknown = [r.audio for r in specs if r.audio not in by_name]
+    if unknown:
+        return JSONResponse(status_code=400, content={"ok": False, "error": f"No upload named: {', '.join(unknown)}"})
+
+    b: Dict[str, Any] = {"id": uuid.uuid4().hex, "created_at": time.time(),
+                         "user_id": user.id if user else None, "rounds": []}
+    for spec in specs:
+        run_id, _run_dir, audio_path, blob = await stage_upload(by_name[spec.audio], "debate", b["user_id"])
+        b["rounds"].append({"id": spec.id, "audio": audio_path.name, "audio_sha256": blob.sha256,
+                            "topic": spec.topic, "first": spec.first, "style": spec.style,
+                            "model": spec.model, "run_id": run_id, "job_id": None})
+    batches[b["id"]] = b
+    await run_in_threadpool(save_batch, b)
+    start_batch_feeder(b, aai_key, or_key)
+    return JSONResponse(status_code=202, content={"ok": True, "batch": {"id": b["id"], "rounds": len(b["rounds"])}})
+
+@app.get("/batches/{batch_id}")
+def get_batch(batch_id: str, user: Optional[User] = Depends(require_user_optional)):
+    b = load_batch(batch_id)
+    if b is None or not can_see(b.get("user_id"), user):
+        return JSONResponse(status_code=404, content={"ok": False, "error": "Unknown batch"})
+    index, counts = [], {}
+    for rnd in b["rounds"]:
+        st = round_status(rnd)
+        counts[st["status"]] = counts.get(st["status"], 0) + 1
+        index.append({**rnd, **st, "result": f"/results/{rnd['job_id']}" if st["status"] == "succeeded" else None})
+    return {"ok": True, "batch": {"id": b["id"], "created_at": b["created_at"], "rounds": len(index),
+                                  "counts": counts, "index": index}}
+
+@app.post("/batches/{batch_id}/resume")
+def resume_batch(
+    batch_id: str,
+    aai_key: Optional[str] = Form(None),
+    or_key: Optional[str] = Form(None),
+    user: Optional[User] = Depends(require_user_optional),
+):
+    b = load_batch(batch_id)
+    if b is None or not can_see(b.get("user_id"), user):
+        return JSONResponse(status_code=404, content={"ok": False, "error": "Unknown batch"})
+    if not aai_key or not or_key:
+        return JSONResponse(status_code=400, content={"ok": False, "error": "Missing: aai_key, or_key"})
+    started = start_batch_feeder(b, aai_key, or_key)
+    return JSONResponse(status_code=202, content={"ok": True, "batch": {"id": b["id"], "resumed": started}})
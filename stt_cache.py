@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+stt_cache.py
+────────────
+Speech-to-text result cache keyed by (audio content hash, provider params).
+
+Re-judging a round with a different style/model, or re-running delivery
+metrics, shouldn't pay for another AssemblyAI round trip.  The pipelines ask
+this module for a key, look it up, and store the provider's JSON after a
+successful run.
+
+Keys cover the audio bytes, the provider options the caller passes and the
+upload codec (AAI_UPLOAD_CODEC), since a lossy upload can change
+the words AssemblyAI returns.
+
+The cache lives in VOCIUS_STT_CACHE_DIR (server.py points it into the content
+store) or, for CLI runs, ~/.cache/vocius/stt; set VOCIUS_STT_CACHE_DIR=off to
+disable it, in which case key_for() returns None and callers fall through to a
+normal transcription.  It is an on-disk LRU: hits refresh an entry's mtime and
+each put evicts the least recently used entries beyond VOCIUS_STT_CACHE_MB.
+
+put() also leaves an empty by_audio/<sha> marker when given the audio hash,
+so server.py can tell that these exact bytes were transcribed before (seen())
+without knowing each pipeline's provider params, and skip fingerprinting.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import aai_client
+
+CACHE_DIR_ENV = "VOCIUS_STT_CACHE_DIR"
+DEFAULT_DIR   = Path.home() / ".cache" / "vocius" / "stt"
+CACHE_MB_ENV  = "VOCIUS_STT_CACHE_MB"
+DEFAULT_MB    = 2048
+
+
+def cache_dir() -> Optional[Path]:
+    d = os.getenv(CACHE_DIR_ENV)
+    if d is not None and d.strip().lower() in ("", "0", "off", "none"):
+        return None
+    return Path(d).expanduser() if d else DEFAULT_DIR
+
+
+def file_sha256(path: Path, chunk_size: int = 1024 * 1024) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def content_key(audio: Path, params: Dict[str, Any], audio_sha: Optional[str] = None) -> str:
+    """Hash of (audio content, provider params); identifies a transcription whether or not caching is on."""
+    sha = audio_sha or file_sha256(audio)
+    if params.get("provider") == "assemblyai":
+        codec = aai_client.upload_codec()
+        params = {**params, "upload_codec": f"opus{aai_client.upload_opus_kbps()}k" if codec == "opus" else codec}
+    blob = json.dumps({"audio": sha, "params": params}, sort_keys=True)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def key_for(audio: Path, params: Dict[str, Any], audio_sha: Optional[str] = None) -> Optional[str]:
+    """Cache key for *audio* transcribed with *params*, or None when caching is off."""
+    if cache_dir() is None:
+        return None
+    return content_key(audio, params, audio_sha)
+
+
+def _path(key: str) -> Optional[Path]:
+    d = cache_dir()
+    return d / key[:2] / f"{key}.json" if d else None
+
+
+def get(key: Optional[str]) -> Optional[Dict[str, Any]]:
+    p = _path(key) if key else None
+    if p is None or not p.exists():
+        return None
+    try:
+        data = json.loads(p.read_text(encoding="utf-8"))
+    except Exception:
+        return None
+    try:
+        os.utime(p)                       # mark as recently used
+    except OSError:
+        pass
+    return data
+
+
+def _marker(audio_sha: str, root: Optional[Path] = None) -> Optional[Path]:
+    d = root or cache_dir()
+    return d / "by_audio" / audio_sha[:2] / audio_sha if d else None
+
+
+def seen(audio_sha: str, root: Optional[Path] = None) -> bool:
+    """Whether a result for exactly these audio bytes was cached (with any params)."""
+    p = _marker(audio_sha, root)
+    return p is not None and p.exists()
+
+
+def put(key: Optional[str], data: Dict[str, Any], audio_sha: Optional[str] = None) -> None:
+    p = _path(key) if key else None
+    if p is None:
+        return
+    p.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=p.parent, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp, p)
+    if audio_sha:
+        m = _marker(audio_sha)
+        m.parent.mkdir(parents=True, exist_ok=True)
+        m.touch()
+    evict(p.parent.parent)
+
+
+def evict(root: Optional[Path] = None, max_bytes: Optional[float] = None) -> int:
+    """Delete least recently used entries until the cache fits its budget. Returns the count removed."""
+    root = root or cache_dir()
+    if root is None or not root.exists():
+        return 0
+    if max_bytes is None:
+        max_bytes = float(os.getenv(CACHE_MB_ENV, DEFAULT_MB)) * 1024 * 1024
+    entries = []
+    for f in root.glob("*/*.json"):
+        try:
+            st = f.stat()
+        except OSError:
+            continue                      # removed by a concurrent evict
+        entries.append((st.st_mtime, st.st_size, f))
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    entries.sort(key=lambda e: e[0])
+    for _, size, f in entries:
+        if total <= max_bytes:
+            break
+        f.unlink(missing_ok=True)
+        total -= size
+        removed += 1
+    if removed:
+        # markers older than every surviving entry can't point at one any more
+        oldest = entries[removed][0] if removed < len(entries) else float("inf")
+        for m in root.glob("by_audio/*/*"):
+            try:
+                if m.stat().st_mtime < oldest:
+                    m.unlink()
+            except OSError:
+                continue
+    return removed
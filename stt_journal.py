@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+stt_journal.py
+──────────────
+Crash-safe record of in-flight AssemblyAI work.
+
+Each transcription is identified by stt_cache.content_key (audio hash +
+provider params), scoped to the AssemblyAI account (AAIClient.key_id, a
+hash of the API key), since uploads and transcripts belong to the account
+that made them.  As it progresses the journal stores the upload_url and
+then the transcript id in a small SQLite file, so when a server, warm worker
+or batch run dies mid-job, the next attempt at the same audio resumes polling
+the existing transcript (or reuses the upload) instead of re-uploading and
+paying for the recording again.  Entries are removed once the transcript is
+finished.  A reused upload that AssemblyAI refuses with a 4xx (expired or
+otherwise unusable) is dropped and the audio uploaded again.
+
+Nothing resumes on its own: API keys are never stored, so an entry waits
+until the same audio is submitted again.  server.py reports leftover entries
+(in_flight()) at startup and lists them in GET /jobs.
+
+The journal lives at VOCIUS_STT_JOURNAL (default ~/.cache/vocius/stt_journal.db).
+"""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional
+
+import aai_client
+
+JOURNAL_ENV        = "VOCIUS_STT_JOURNAL"
+DEFAULT_PATH       = Path.home() / ".cache" / "vocius" / "stt_journal.db"
+UPLOAD_URL_TTL_SEC = 12 * 3600          # reuse an upload only while AssemblyAI still holds it
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS stt_jobs (
+    key           TEXT PRIMARY KEY,
+    upload_url    TEXT,
+    uploaded_at   REAL,
+    transcript_id TEXT,
+    stage         TEXT NOT NULL,          -- uploaded | queued
+    pid           INTEGER,
+    updated_at    REAL NOT NULL
+);
+"""
+
+
+@dataclass
+class Entry:
+    key: str
+    upload_url: Optional[str]
+    uploaded_at: Optional[float]
+    transcript_id: Optional[str]
+    stage: str
+    updated_at: float
+
+    @property
+    def upload_fresh(self) -> bool:
+        return bool(self.upload_url) and time.time() - (self.uploaded_at or 0) < UPLOAD_URL_TTL_SEC
+
+
+class Journal:
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path or os.getenv(JOURNAL_ENV) or DEFAULT_PATH).expanduser()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._db() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(_SCHEMA)
+
+    @contextmanager
+    def _db(self) -> Iterator[sqlite3.Connection]:
+        # Several processes (server, warm workers, batch CLI) share the file.
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def get(self, key: str) -> Optional[Entry]:
+        with self._db() as db:
+            row = db.execute(
+                "SELECT key, upload_url, uploaded_at, transcript_id, stage, updated_at"
+                " FROM stt_jobs WHERE key = ?", (key,)).fetchone()
+        return Entry(*row) if row else None
+
+    def uploaded(self, key: str, upload_url: str) -> None:
+        now = time.time()
+        with self._db() as db:
+            db.execute(
+                "INSERT INTO stt_jobs (key, upload_url, uploaded_at, transcript_id, stage, pid, updated_at)"
+                " VALUES (?, ?, ?, NULL, 'uploaded', ?, ?)"
+                " ON CONFLICT(key) DO UPDATE SET upload_url = excluded.upload_url,"
+                " uploaded_at = excluded.uploaded_at, transcript_id = NULL, stage = 'uploaded',"
+                " pid = excluded.pid, updated_at = excluded.updated_at",
+                (key, upload_url, now, os.getpid(), now))
+
+    def queued(self, key: str, transcript_id: str) -> None:
+        with self._db() as db:
+            db.execute("UPDATE stt_jobs SET transcript_id = ?, stage = 'queued', pid = ?, updated_at = ?"
+                       " WHERE key = ?", (transcript_id, os.getpid(), time.time(), key))
+
+    def done(self, key: str) -> None:
+        with self._db() as db:
+            db.execute("DELETE FROM stt_jobs WHERE key = ?", (key,))
+
+    def in_flight(self) -> list[Entry]:
+        with self._db() as db:
+            rows = db.execute("SELECT key, upload_url, uploaded_at, transcript_id, stage, updated_at"
+                              " FROM stt_jobs ORDER BY updated_at").fetchall()
+        return [Entry(*r) for r in rows]
+
+
+_journals: Dict[Path, Journal] = {}
+
+
+def journal() -> Journal:
+    """The journal at VOCIUS_STT_JOURNAL (re-read on every call)."""
+    path = Path(os.getenv(JOURNAL_ENV) or DEFAULT_PATH).expanduser()
+    if path not in _journals:
+        _journals[path] = Journal(path)
+    return _journals[path]
+
+
+def transcribe(aai: aai_client.AAIClient, key: str,
+               upload: Callable[[], str],
+               create: Callable[[str], str],
+               wait: Callable[[str], Dict[str, Any]],
+               log: Callable[[str], None] = lambda msg: print(msg, flush=True)) -> Dict[str, Any]:
+    """upload → create → wait, journaled under *key*, resuming whatever an earlier attempt got to.
+
+    The callables are the caller's own steps (with its logging and error
+    handling); *aai* scopes *key* to its account and checks that a journaled
+    transcript still exists.  *create* should let AAIError through so a
+    refused earlier upload can be replaced.
+    """
+    j = journal()
+    key = f"{aai.key_id}:{key}"
+    entry = j.get(key)
+    if entry is not None and entry.transcript_id:
+        try:
+            status = aai.get_transcript(entry.transcript_id).get("status")
+        except aai_client.AAIError as e:
+            if e.status not in (400, 404):
+                raise
+            status = "missing"
+        if status in ("queued", "processing", "completed"):
+            log(f"🔁  Resuming AssemblyAI transcript {entry.transcript_id}")
+            js = wait(entry.transcript_id)
+            j.done(key)
+            return js
+        entry = None                      # errored or gone: start over
+
+    reused = entry is not None and entry.upload_fresh
+    if reused:
+        log("🔁  Reusing earlier AssemblyAI upload")
+        upload_url = entry.upload_url
+    else:
+        upload_url = upload()
+        j.uploaded(key, upload_url)
+    try:
+        transcript_id = create(upload_url)
+    except aai_client.AAIError as e:
+        if not reused or not 400 <= e.status < 500 or e.status == 429:
+            raise
+        log(f"⚠️  Earlier AssemblyAI upload was refused ({e.status}); uploading again")
+        j.done(key)
+        upload_url = upload()
+        j.uploaded(key, upload_url)
+        transcript_id = create(upload_url)
+    j.queued(key, transcript_id)
+    js = wait(transcript_id)
+    j.done(key)
+    return js
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+stt_shards.py
+─────────────
+Time-sharded transcription for long recordings.
+
+AssemblyAI turnaround grows with file length, so a multi-hour tournament
+recording is cut into N shards at silence boundaries (librosa.effects.split,
+as in AnalyzeSpeech), the shards are transcribed concurrently, and the word
+timestamps are shifted back onto the original timeline and stitched.
+
+Each shard carries OVERLAP_SEC of audio past its cut on both sides, so a word
+that straddles a missed pause is still heard whole; when stitching, a word
+belongs to the shard whose cut range contains its midpoint, which drops the
+duplicate from the neighbour.  The two shards time a word at the cut slightly
+differently, so a word both of them placed on their own side is deduplicated
+by text and time overlap, and a word both placed on the other side is kept
+from whichever shard heard it.  Utterances are re-offset and kept by the same
+midpoint rule (speaker letters are per shard), confidence is weighted by each
+shard's share of the recording, and other top-level fields come from the
+first shard.
+"""
+
+from __future__ import annotations
+
+import tempfile
+import wave
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+SAMPLE_RATE   = 16_000
+FRAME_LENGTH  = 2048
+HOP_LENGTH    = 512
+SILENCE_TOP_DB = 35.0        # dB below peak counted as silence (AnalyzeSpeech's threshold)
+MIN_SHARD_SEC = 300.0        # shorter shards cost more in per-job overhead than they save
+SEARCH_FRAC   = 0.15         # look this far (fraction of a shard) either side of the even cut
+OVERLAP_SEC   = 2.0
+
+
+@dataclass
+class Shard:
+    index: int
+    start: float             # seconds: audio sent for this shard (cut ± overlap)
+    end: float
+    keep_from: float         # seconds: words whose midpoint falls in [keep_from, keep_to) are kept
+    keep_to: float
+
+
+def count(seconds: float, shards: int) -> int:
+    """Shards actually used for a recording of *seconds* when *shards* are requested."""
+    return max(1, min(shards, int(seconds // MIN_SHARD_SEC)))
+
+
+def load(audio: Path) -> np.ndarray:
+    try:
+        import librosa  # type: ignore
+    except Exception as e:
+        raise SystemExit(f"librosa is required for --shards but not installed: {e}")
+    y, _ = librosa.load(str(audio), sr=SAMPLE_RATE, mono=True)
+    return y
+
+
+def plan(y: np.ndarray, shards: int, overlap_sec: float = OVERLAP_SEC) -> List[Shard]:
+    """Cut points near every len/shards, moved into the longest nearby silence."""
+    import librosa  # type: ignore
+
+    total = len(y) / SAMPLE_RATE
+    n = count(total, shards)
+    if n == 1:
+        return [Shard(0, 0.0, total, 0.0, total)]
+
+    voiced = librosa.effects.split(y, top_db=SILENCE_TOP_DB,
+                                   frame_length=FRAME_LENGTH, hop_length=HOP_LENGTH) / SAMPLE_RATE
+    gap_lo, gap_hi = voiced[:-1, 1], voiced[1:, 0]
+    mids, lengths = (gap_lo + gap_hi) / 2, gap_hi - gap_lo
+
+    cuts = [0.0]
+    window = SEARCH_FRAC * total / n
+    for k in range(1, n):
+        target = k * total / n
+        near = np.flatnonzero(np.abs(mids - target) <= window)
+        if near.size:
+            cut = float(mids[near[lengths[near].argmax()]])
+        elif mids.size:
+            cut = float(mids[np.abs(mids - target).argmin()])
+        else:
+            cut = target
+        cuts.append(max(cut, cuts[-1]))
+    cuts.append(total)
+
+    return [Shard(i, max(0.0, lo - overlap_sec), min(total, hi + overlap_sec), lo, hi)
+            for i, (lo, hi) in enumerate(zip(cuts, cuts[1:])) if hi > lo]
+
+
+def write_wav(y: np.ndarray, path: Path) -> Path:
+    with wave.open(str(path), "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(SAMPLE_RATE)
+        w.writeframes((np.clip(y, -1.0, 1.0) * 32767).astype("<i2").tobytes())
+    return path
+
+
+def _norm(text: str) -> str:
+    return "".join(c for c in text.lower() if c.isalnum())
+
+
+def _overlap(a: Dict[str, Any], b: Dict[str, Any]) -> bool:
+    """Whether *a* and *b* share over half of the shorter one (neighbouring words may touch)."""
+    shared = min(a["end"], b["end"]) - max(a["start"], b["start"])
+    return shared > 0.5 * max(1, min(a["end"] - a["start"], b["end"] - b["start"]))
+
+
+def _shifted(item: Dict[str, Any], shift: int) -> Dict[str, Any]:
+    out = {**item, "start": item["start"] + shift, "end": item["end"] + shift}
+    if item.get("words"):
+        out["words"] = [{**w, "start": w["start"] + shift, "end": w["end"] + shift} for w in item["words"]]
+    return out
+
+
+def _dedupe(words: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Drop a word that repeats its predecessor's text over the same stretch of time."""
+    out: List[Dict[str, Any]] = []
+    for w in words:
+        if out and _norm(out[-1]["text"]) == _norm(w["text"]) and _overlap(out[-1], w):
+            continue
+        out.append(w)
+    return out
+
+
+def stitch(parts: List[Dict[str, Any]], plan_: List[Shard]) -> Dict[str, Any]:
+    """One transcript JSON from per-shard results: timestamps shifted to the original timeline, overlaps deduplicated."""
+    words: List[Dict[str, Any]] = []
+    spare: List[Dict[str, Any]] = []          # words a shard heard outside its own cut range
+    utterances: List[Dict[str, Any]] = []
+    conf_sum = conf_weight = 0.0
+    for js, sh in zip(parts, plan_):
+        shift = int(round(sh.start * 1000))
+        lo, hi = sh.keep_from * 1000, sh.keep_to * 1000
+        for w in js.get("words") or []:
+            w = _shifted(w, shift)
+            (words if lo <= (w["start"] + w["end"]) / 2 < hi else spare).append(w)
+        for u in js.get("utterances") or []:
+            u = _shifted(u, shift)
+            if lo <= (u["start"] + u["end"]) / 2 < hi:
+                utterances.append(u)
+        if js.get("confidence") is not None:
+            conf_sum += js["confidence"] * (sh.keep_to - sh.keep_from)
+            conf_weight += sh.keep_to - sh.keep_from
+    words.sort(key=lambda w: w["start"])
+
+    # A word both neighbours timed onto the other's side of the cut was dropped twice.
+    starts = [w["start"] for w in words]
+    rescued = []
+    for w in spare:
+        i = bisect_left(starts, w["start"])
+        if not any(_overlap(w, k) for k in words[max(0, i - 2):i + 2]):
+            rescued.append(w)
+    words = _dedupe(sorted(words + _dedupe(sorted(rescued, key=lambda w: w["start"])),
+                           key=lambda w: w["start"]))
+    utterances.sort(key=lambda u: u["start"])
+
+    first = parts[0] if parts else {}
+    skip = {"id", "status", "text", "words", "utterances", "confidence", "audio_duration", "audio_url"}
+    return {
+        **{k: v for k, v in first.items() if k not in skip},
+        "status": "completed",
+        "text": " ".join(w["text"] for w in words),
+        "words": words,
+        "utterances": utterances if any(js.get("utterances") for js in parts) else None,
+        "confidence": conf_sum / conf_weight if conf_weight else None,
+        "audio_duration": plan_[-1].keep_to if plan_ else 0,
+        "shards": [{"id": js.get("id"), "start": sh.start, "end": sh.end} for js, sh in zip(parts, plan_)],
+    }
+
+
+def transcribe(audio: Path, shards: int,
+               transcribe_one: Callable[[Shard, Path], Dict[str, Any]],
+               log: Callable[[str], None] = lambda msg: print(msg, flush=True)) -> Dict[str, Any]:
+    """Split *audio* into up to *shards* pieces and run *transcribe_one(shard, wav)* on all of them at once."""
+    y = load(audio)
+    p = plan(y, shards)
+    log(f"✂️  Transcribing in {len(p)} shard(s): "
+        + ", ".join(f"{sh.keep_from / 60:.1f}–{sh.keep_to / 60:.1f} min" for sh in p))
+    with tempfile.TemporaryDirectory(prefix="vocius_shards_") as tmp:
+        wavs = [write_wav(y[int(sh.start * SAMPLE_RATE):int(sh.end * SAMPLE_RATE)],
+                          Path(tmp) / f"shard{sh.index:02d}.wav") for sh in p]
+        del y
+        with ThreadPoolExecutor(max_workers=len(p), thread_name_prefix="stt-shard") as pool:
+            parts = list(pool.map(transcribe_one, p, wavs))
+    for js, sh in zip(parts, p):
+        if js.get("status") != "completed":
+            raise SystemExit(f"❌ AssemblyAI error on shard {sh.index}: {js.get('error')}")
+    return stitch(parts, p)
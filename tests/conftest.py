@@ -0,0 +1,23 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# The modules live at the repository root, not in a package.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# Module-level settings are read at import time: point every store at a scratch
+# directory before any test imports server/auth.
+_scratch = Path(tempfile.mkdtemp(prefix="vocius-tests-"))
+os.environ.update({
+    "DB_URL": f"sqlite:///{_scratch / 'vocius.db'}",
+    "VOCIUS_STORE_DIR": str(_scratch / "store"),
+    "VOCIUS_ARTIFACT_DIR": str(_scratch / "runs"),
+    "VOCIUS_STT_CACHE_DIR": str(_scratch / "stt"),
+    "VOCIUS_STT_JOURNAL": str(_scratch / "stt_journal.db"),
+    "AAI_HISTORY_PATH": str(_scratch / "aai_history.json"),
+    "VOCIUS_WARM_WORKERS": "0",
+    "VOCIUS_FINGERPRINT": "0",
+    "BCRYPT_ROUNDS": "4",
+    "LAST_LOGIN_FLUSH_SEC": "3600",
+})
@@ -0,0 +1,49 @@
+import pytest
+import requests
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+
+import aai_client
+
+
+class FlakySession:
+    """Raises each queued exception in turn, then answers 200."""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def request(self, method, url, **kwargs):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        resp = requests.Response()
+        resp.status_code = 200
+        return resp
+
+
+def client(*errors):
+    c = aai_client.AAIClient("key", base_url="https://aai.test", max_retries=3, backoff_sec=0)
+    c.session = FlakySession(*errors)
+    return c
+
+
+def refused():
+    return requests.ConnectionError(MaxRetryError(None, "/transcript", NewConnectionError(None, "refused")))
+
+
+@pytest.mark.parametrize("error", [requests.ConnectTimeout("connect"), refused()])
+def test_unsent_requests_are_retried_even_when_not_idempotent(error):
+    c = client(error)
+    assert c.request("POST", "transcript", "create", idempotent=False).status_code == 200
+    assert c.session.calls == 2
+
+
+@pytest.mark.parametrize("error", [requests.ReadTimeout("read"),
+                                   requests.ConnectionError("Connection aborted")])
+def test_requests_that_may_have_arrived_are_not_resent(error):
+    c = client(error)
+    with pytest.raises(type(error)):
+        c.request("POST", "transcript", "create", idempotent=False)
+    assert c.session.calls == 1
+    c = client(type(error)("again"))
+    assert c.request("GET", "transcript/t1", "poll").status_code == 200    # idempotent calls still retry
@@ -0,0 +1,99 @@
+import threading
+import time
+
+import pytest
+
+from admission import DEFAULT_HOLD_SEC, Admission, Gate, GateFull
+
+
+def test_gate_serves_waiters_in_arrival_order():
+    gate = Gate("cpu", 1)
+    order = []
+    release = threading.Event()
+
+    def holder():
+        with gate.slot():
+            release.wait(5)
+
+    def waiter(i):
+        with gate.slot():
+            order.append(i)
+
+    first = threading.Thread(target=holder)
+    first.start()
+    while gate.active == 0:
+        time.sleep(0.01)
+    threads = []
+    for i in range(5):
+        t = threading.Thread(target=waiter, args=(i,))
+        t.start()
+        while gate.stats()["waiting"] < i + 1:        # queue them one at a time
+            time.sleep(0.01)
+        threads.append(t)
+    release.set()
+    for t in [first, *threads]:
+        t.join(5)
+    assert order == [0, 1, 2, 3, 4]
+    assert gate.served == 6 and gate.active == 0
+
+
+def test_gate_never_exceeds_its_slots():
+    gate = Gate("stt", 2)
+    peak, lock = [0], threading.Lock()
+
+    def work():
+        with gate.slot():
+            with lock:
+                peak[0] = max(peak[0], gate.active)
+            time.sleep(0.02)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5)
+    assert peak[0] == 2
+
+
+def test_abandoned_wait_leaves_the_queue():
+    gate = Gate("llm", 1)
+    with gate.slot():
+        with pytest.raises(RuntimeError):
+            with gate.slot(check=lambda: (_ for _ in ()).throw(RuntimeError("cancelled"))):
+                pass
+        assert gate.stats()["waiting"] == 0
+
+
+def test_admit_raises_gate_full_with_retry_after():
+    adm = Admission(cpu=1, stt=2, llm=1, max_queue=2)
+    adm.admit(["stt"])
+    adm.admit(["stt"])
+    with pytest.raises(GateFull) as e:
+        adm.admit(["cpu", "stt"])
+    assert e.value.resource == "stt"
+    # 2 queued + this one over 2 slots, at the default hold time
+    assert e.value.retry_after == int(3 / 2 * DEFAULT_HOLD_SEC)
+    assert adm.gates["cpu"].reserved == 0          # nothing reserved when refused
+
+
+def test_retry_after_follows_observed_hold_time():
+    gate = Gate("cpu", 1)
+    with gate.slot():
+        time.sleep(0.05)
+    assert gate.retry_after() == 1                 # ceil((0 + 1) / 1 * ~0.05)
+    gate._avg_hold = 1000.0
+    assert gate.retry_after() == 600               # capped
+
+
+def test_reservation_releases_unused_claims():
+    adm = Admission(cpu=1, stt=1, llm=1, max_queue=1)
+    r = adm.admit(["cpu", "llm"])
+    with r.slot("cpu"):
+        assert adm.gates["cpu"].reserved == 0
+    assert adm.gates["llm"].reserved == 1
+    with pytest.raises(GateFull):
+        adm.admit(["llm"])
+    r.close()
+    r.close()                                      # idempotent
+    assert adm.gates["llm"].reserved == 0
+    adm.admit(["llm"])
@@ -0,0 +1,113 @@
+import io
+import os
+import time
+
+from artifacts import ArtifactStore
+from content_store import ContentStore
+
+MB = 1024 * 1024
+
+
+def make_run(store, kind="speech", size=0):
+    run = store.create(kind)
+    (run.path / "out.bin").write_bytes(b"x" * size)
+    return run
+
+
+def test_lru_runs_are_evicted_to_fit_the_quota(tmp_path):
+    store = ArtifactStore(tmp_path, quota_mb=1, keep_recent=0)
+    a, b, c = (make_run(store, size=MB // 2) for _ in range(3))
+    for r in (a, b):
+        store.finalize(r.id)
+    store.get(a.id)                                 # a is now more recent than b
+    store.finalize(c.id)
+    assert store.get(b.id, touch=False) is None and not b.path.exists()
+    assert store.get(a.id, touch=False) is not None and store.get(c.id, touch=False) is not None
+
+
+def test_expired_runs_go_even_under_quota(tmp_path):
+    store = ArtifactStore(tmp_path, quota_mb=100, ttl_sec=60, keep_recent=0)
+    old, fresh = make_run(store), make_run(store)
+    store.finalize(old.id)
+    store.finalize(fresh.id)
+    with store._db() as db:
+        db.execute("UPDATE runs SET last_access = ? WHERE id = ?", (time.time() - 120, old.id))
+    assert store.evict() == [old.id]
+
+
+def test_pinned_recent_and_active_runs_are_kept(tmp_path):
+    store = ArtifactStore(tmp_path, quota_mb=0, keep_recent=1)
+    pinned, active, older, newest = (make_run(store, size=1000) for _ in range(4))
+    store.pin(pinned.id)
+    for r in (pinned, older, newest):
+        store.finalize(r.id)
+    kept = {r.id for r in (pinned, active, older, newest) if store.get(r.id, touch=False)}
+    assert kept == {pinned.id, active.id, newest.id}
+    store.pin(pinned.id, False)
+    store.evict()
+    assert store.get(pinned.id, touch=False) is None
+
+
+def test_stale_active_runs_expire(tmp_path):
+    store = ArtifactStore(tmp_path, quota_mb=100, ttl_sec=60, keep_recent=0)
+    run = make_run(store)
+    with store._db() as db:
+        db.execute("UPDATE runs SET last_access = ? WHERE id = ?", (time.time() - 120, run.id))
+    assert store.evict() == [run.id]
+
+
+def test_bundle_counts_against_the_quota_and_is_evicted(tmp_path):
+    store = ArtifactStore(tmp_path, quota_mb=100, keep_recent=0)
+    run = make_run(store, size=1000)
+    store.finalize(run.id)
+    zip_path = store.bundle(run.id)
+    assert zip_path.exists()
+    assert store.get(run.id).bytes == 1000 + zip_path.stat().st_size
+    store.discard(run.id)
+    assert not zip_path.exists() and not run.path.exists()
+
+
+def test_linked_uploads_count_against_the_quota_and_are_collected(tmp_path):
+    content = ContentStore(tmp_path / "store")
+    store = ArtifactStore(tmp_path / "runs", quota_mb=1, keep_recent=0, content=content)
+    runs = []
+    for i in range(3):
+        blob = content.ingest(io.BytesIO(bytes([i]) * (MB // 2 + 1)), ".m4a")
+        os.utime(blob.path, (time.time() - 7200,) * 2)          # past the GC grace period
+        run = store.create("speech")
+        content.link(blob.path, run.path / "round.m4a")
+        runs.append((run, blob))
+        store.finalize(run.id)
+    # Each run only holds a hard link, yet the store's bytes push it over quota.
+    assert [store.get(r.id, touch=False) is not None for r, _ in runs] == [False, False, True]
+    assert [b.path.exists() for _, b in runs] == [False, False, True]
+    assert store.stats()["content_bytes"] == MB // 2 + 1
+
+
+def test_blob_shared_by_two_runs_survives_until_both_are_gone(tmp_path):
+    content = ContentStore(tmp_path / "store")
+    store = ArtifactStore(tmp_path / "runs", quota_mb=100, keep_recent=0, content=content)
+    blob = content.ingest(io.BytesIO(b"a" * 1000), ".m4a")
+    os.utime(blob.path, (time.time() - 7200,) * 2)
+    a, b = store.create("speech"), store.create("debate")
+    for r in (a, b):
+        content.link(blob.path, r.path / "round.m4a")
+    store.discard(a.id)
+    store.evict()
+    assert blob.path.exists()
+    store.discard(b.id)
+    store.evict()
+    assert not blob.path.exists()
+
+
+def test_fresh_unlinked_uploads_are_not_collected(tmp_path):
+    content = ContentStore(tmp_path / "store")
+    blob = content.ingest(io.BytesIO(b"a" * 1000), ".m4a")
+    assert content.gc() == 0 and blob.path.exists()
+    assert content.gc(grace_sec=-1) == 1000 and not blob.path.exists()
+
+
+def test_runs_record_their_owner(tmp_path):
+    store = ArtifactStore(tmp_path)
+    assert store.create("speech", user_id=7).user_id == 7
+    assert store.get(store.create("debate").id).user_id is None
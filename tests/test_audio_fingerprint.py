@@ -0,0 +1,84 @@
+import wave
+
+import numpy as np
+import pytest
+
+import audio_fingerprint as af
+
+SR = af.SAMPLE_RATE
+
+
+def tones(seconds, seed):
+    """Speech-band tone bursts over faint noise: stable spectral peaks, like syllables."""
+    rng = np.random.default_rng(seed)
+    n = int(seconds * SR)
+    t = np.arange(6000) / SR
+    y = 0.01 * rng.standard_normal(n).astype(np.float32)
+    for _ in range(int(seconds * 4)):
+        start, length = rng.integers(0, n - 6000), rng.integers(1000, 6000)
+        y[start:start + length] += 0.3 * np.sin(2 * np.pi * rng.uniform(300, 3500) * t[:length])
+    return y
+
+
+def write(path, y):
+    with wave.open(str(path), "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(SR)
+        w.writeframes((np.clip(y, -1, 1) * 32767).astype("<i2").tobytes())
+    return path
+
+
+@pytest.fixture(scope="module")
+def recording():
+    return tones(90, seed=1)
+
+
+@pytest.fixture
+def index(tmp_path, recording):
+    idx = af.Index(tmp_path / "fp.db")
+    idx.resolve(write(tmp_path / "orig.wav", recording), "orig")
+    return idx
+
+
+def test_re_encoded_copy_matches_and_is_aligned(tmp_path, index, recording):
+    m = index.resolve(write(tmp_path / "quiet.wav", recording * 0.5), "quiet")
+    assert m.sha256 == "orig" and m.aligned
+    assert index.known("quiet").sha256 == "orig"
+
+
+def test_trimmed_copy_matches_with_its_offset(tmp_path, index, recording):
+    m = index.resolve(write(tmp_path / "trim.wav", recording[3 * SR:]), "trim")
+    assert m.sha256 == "orig"
+    assert m.offset_sec == pytest.approx(3.0, abs=2 * af.FRAME_SEC)
+    assert not m.aligned                           # timestamps would be 3 s off
+
+
+def test_tail_trim_keeps_offset_but_is_not_aligned(tmp_path, index, recording):
+    m = index.resolve(write(tmp_path / "short.wav", recording[:-5 * SR]), "short")
+    assert m.sha256 == "orig" and m.offset_sec == 0.0
+    assert m.trim_sec == pytest.approx(-5.0)
+    assert not m.aligned                           # word timestamps past 85 s don't exist here
+    assert not index.known("short").aligned
+
+
+def test_different_recording_is_rejected(tmp_path, index):
+    m = index.resolve(write(tmp_path / "other.wav", tones(90, seed=2)), "other")
+    assert m.sha256 == "other"
+    assert index.known("other").sha256 == "other"
+
+
+def test_length_mismatch_beyond_max_trim_is_rejected(tmp_path, index, recording):
+    longer = np.concatenate([recording, tones(af.MAX_TRIM_SEC + 5, seed=3)])
+    assert index.resolve(write(tmp_path / "long.wav", longer), "long").sha256 == "long"
+
+
+def test_compare_without_an_index(tmp_path, recording):
+    a = af.fingerprint(write(tmp_path / "a.wav", recording))
+    b = af.fingerprint(write(tmp_path / "b.wav", recording[2 * SR:] * 0.7))
+    score, offset = af.compare(b, a)
+    # 2 s is 62.5 frames: peaks land half a hop apart, which costs most hashes but not the match
+    assert score >= af.MIN_RATIO and offset == pytest.approx(2.0, abs=2 * af.FRAME_SEC)
+    hop_aligned = af.fingerprint(write(tmp_path / "h.wav", recording[64 * af.HOP:]))
+    assert af.compare(hop_aligned, a)[0] > 0.9
+    assert af.compare(af.fingerprint(write(tmp_path / "c.wav", tones(60, seed=4))), a)[0] < 0.05
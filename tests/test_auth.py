@@ -0,0 +1,166 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from passlib.context import CryptContext
+from sqlalchemy import delete
+from sqlmodel import Session, select
+
+import auth
+from auth import User
+
+
+@pytest.fixture
+def client():
+    with Session(auth.engine) as s:
+        for table in reversed(auth.SQLModel.metadata.sorted_tables):
+            s.exec(delete(table))
+        s.commit()
+    auth._have_users = False
+    auth.invalidate_principal()
+    app = FastAPI()
+    app.include_router(auth.router)
+    with TestClient(app) as c:
+        yield c
+
+
+def register(c, name, email=None, password="pw"):
+    return c.post("/auth/register", json={"username": name, "email": email or f"{name}@x.org",
+                                          "password": password})
+
+
+def users():
+    with Session(auth.engine) as s:
+        return s.exec(select(User).order_by(User.id)).all()
+
+
+# ---------- ON CONFLICT upserts ---------------------------------------------------
+def test_first_user_becomes_admin(client):
+    assert register(client, "ada").json()["user"]["role"] == "admin"
+    assert register(client, "bob").json()["user"]["role"] == "user"
+
+
+def test_register_conflicts_are_409_without_a_second_row(client):
+    register(client, "ada")
+    r = register(client, "ada", email="other@x.org")
+    assert r.status_code == 409 and r.json()["detail"] == "Username already taken"
+    r = register(client, "ada2", email="ada@x.org")
+    assert r.status_code == 409 and r.json()["detail"] == "Email already registered"
+    assert [u.username for u in users()] == ["ada"]
+
+
+def test_oauth_upsert_creates_then_updates_one_row(client):
+    first = client.post("/auth/oauth/upsert", json={"email": "Cy@X.org"}).json()["user"]
+    assert first["username"] == "cy" and first["provider"] == "google" and first["last_login"]
+    again = client.post("/auth/oauth/upsert", json={"email": "cy@x.org", "name": "Cy",
+                                                    "provider": "github"}).json()["user"]
+    assert again["id"] == first["id"]
+    assert (again["name"], again["provider"]) == ("Cy", "github")
+    # an existing name is never overwritten by the provider's
+    client.post("/auth/oauth/upsert", json={"email": "cy@x.org", "name": "Other", "provider": "google"})
+    [u] = users()
+    assert (u.name, u.provider) == ("Cy", "google")
+
+
+def test_oauth_login_creates_once(client):
+    a = auth._oauth_login_sync("dee@x.org", "dee", "Dee", "github")
+    b = auth._oauth_login_sync("dee@x.org", "dee", "Dee", "github")
+    assert a.id == b.id and len(users()) == 1
+
+
+
+def test_login_rehashes_a_cheaper_bcrypt_hash(client, monkeypatch):
+    register(client, "ada")
+    with Session(auth.engine) as s:
+        user = s.exec(select(User).where(User.username == "ada")).one()
+        assert user.password_hash.startswith("$2b$04$")
+    monkeypatch.setattr(auth, "pwd", CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=5))
+    assert client.post("/auth/login", json={"identifier": "ada", "password": "pw"}).status_code == 200
+    [user] = users()
+    assert user.password_hash.startswith("$2b$05$") and auth._verify("pw", user.password_hash)
+    assert client.post("/auth/login", json={"identifier": "ada@x.org", "password": "pw"}).status_code == 200
+    assert client.post("/auth/login", json={"identifier": "ada", "password": "nope"}).status_code == 401
+
+# ---------- last_login write-behind -----------------------------------------------
+def stored_login(uid):
+    with Session(auth.engine) as s:
+        return s.get(User, uid).last_login
+
+
+def test_login_buffers_last_login_until_flush(client):
+    uid = register(client, "ada").json()["user"]["id"]
+    auth.flush_last_logins()
+    before = stored_login(uid)
+    r = client.post("/auth/login", json={"identifier": "ada", "password": "pw"})
+    assert r.status_code == 200
+    stamp = auth._last_logins.pending(uid)
+    assert stamp is not None and stored_login(uid) == before
+    assert auth.flush_last_logins() == 1
+    assert stored_login(uid) == stamp and auth._last_logins.pending(uid) is None
+    assert auth.flush_last_logins() == 0
+
+
+def test_flush_batches_users_and_never_moves_backwards(client):
+    buf = auth._LastLoginBuffer(flush_sec=3600, batch=100)
+    a = auth._oauth_login_sync("a@x.org", "a", None, "google")
+    b = auth._oauth_login_sync("b@x.org", "b", None, "google")
+    buf.touch(a)
+    buf.touch(b)
+    later = datetime.utcnow() + timedelta(hours=1)
+    with Session(auth.engine) as s:
+        s.exec(auth.update(User).where(User.id == b.id).values(last_login=later))
+        s.commit()
+    assert buf.flush() == 2
+    assert stored_login(a.id) == a.last_login
+    assert stored_login(b.id) == later
+
+
+# ---------- keyset pagination -----------------------------------------------------
+@pytest.fixture
+def admin(client):
+    token = register(client, "root").json()["token"]
+    client.headers["Authorization"] = f"Bearer {token}"
+    return client
+
+
+def add_users(n, provider="google", created_at=None):
+    created_at = created_at or datetime.utcnow()
+    with Session(auth.engine) as s:
+        for i in range(n):
+            s.add(User(username=f"{provider}{i}", email=f"{provider}{i}@x.org",
+                       provider=provider, created_at=created_at))
+        s.commit()
+
+
+def walk(c, **params):
+    ids, before = [], None
+    while True:
+        page = c.get("/auth/admin/users", params={**params, **({"before": before} if before else {})}).json()
+        ids += [u["id"] for u in page["users"]]
+        before = page["next"]
+        if before is None:
+            return ids
+
+
+def test_pages_cover_ties_on_created_at_exactly_once(admin):
+    add_users(5, created_at=datetime(2026, 1, 1))
+    root = users()[0].id
+    tied = sorted((u.id for u in users()[1:]), reverse=True)
+    assert walk(admin, limit=2) == [root] + tied
+
+
+def test_filters_apply_to_pages_and_count(admin):
+    add_users(3, provider="github")
+    add_users(2, provider="google")
+    assert len(walk(admin, limit=2, provider="github")) == 3
+    assert admin.get("/auth/admin/users/count", params={"provider": "github"}).json()["count"] == 3
+    assert admin.get("/auth/admin/users/count", params={"role": "admin"}).json()["count"] == 1
+
+
+def test_bad_cursor_is_400_and_non_admins_are_refused(admin):
+    r = admin.get("/auth/admin/users", params={"before": "yesterday"})
+    assert r.status_code == 400 and r.json()["detail"] == "Invalid cursor"
+    token = register(admin, "bob").json()["token"]
+    r = admin.get("/auth/admin/users", headers={"Authorization": f"Bearer {token}"})
+    assert r.status_code == 403
@@ -0,0 +1,53 @@
+import pytest
+
+import manifest
+
+
+@pytest.fixture
+def run(tmp_path, monkeypatch):
+    monkeypatch.setenv(manifest.ROOT_ENV, str(tmp_path))
+    (tmp_path / "out").mkdir()
+    return tmp_path
+
+
+def write(path, text):
+    path.write_text(text)
+    return path
+
+
+def test_listing_comes_from_the_manifest_not_the_disk(run):
+    manifest.record(write(run / "out" / "a.txt", "a"), "judge")
+    write(run / "stray.tmp", "x")                      # never recorded
+    assert manifest.files(run) == ["out/a.txt"]
+
+
+def test_forget_drops_a_deleted_output(run):
+    f = write(run / "out" / "run.json", "{}")
+    manifest.record(f, "finalize")
+    f.unlink()
+    manifest.forget(f, "cleanup")
+    assert manifest.files(run) == []
+    manifest.record(write(f, "{}"), "finalize")
+    assert manifest.files(run) == ["out/run.json"]
+
+
+def test_sync_records_fallback_outputs_once(run):
+    manifest.record(write(run / "audio.mp3", "mp3"), "upload")
+    manifest.record(write(run / "out" / "old.txt", "old"), "judge")
+    (run / "out" / "clips").mkdir()
+    write(run / "out" / "clips" / "c1.wav", "wav")
+    (run / "out" / "old.txt").unlink()
+    entries = manifest.sync(run, "AnalyzeSpeech")
+    assert sorted(entries) == ["audio.mp3", "out/clips/c1.wav"]
+    assert entries["audio.mp3"]["stage"] == "upload"
+    assert entries["out/clips/c1.wav"]["stage"] == "AnalyzeSpeech"
+    size = (run / manifest.MANIFEST_NAME).stat().st_size
+    manifest.sync(run, "AnalyzeSpeech")
+    assert (run / manifest.MANIFEST_NAME).stat().st_size == size
+
+
+def test_runs_without_a_manifest_are_walked(tmp_path, monkeypatch):
+    monkeypatch.delenv(manifest.ROOT_ENV, raising=False)
+    write(tmp_path / "a.txt", "a")
+    assert manifest.record(tmp_path / "a.txt", "judge") is None
+    assert manifest.files(tmp_path) == ["a.txt"]
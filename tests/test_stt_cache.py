@@ -0,0 +1,80 @@
+import os
+import time
+
+import pytest
+
+import stt_cache
+
+PARAMS = {"provider": "assemblyai", "punctuate": True}
+SHA = "a" * 64
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setenv(stt_cache.CACHE_DIR_ENV, str(tmp_path))
+    monkeypatch.delenv("AAI_UPLOAD_CODEC", raising=False)
+    monkeypatch.delenv("AAI_UPLOAD_OPUS_KBPS", raising=False)
+    return tmp_path
+
+
+def test_round_trip(cache):
+    k = stt_cache.key_for(None, PARAMS, SHA)
+    assert stt_cache.get(k) is None
+    stt_cache.put(k, {"text": "hi"})
+    assert stt_cache.get(k) == {"text": "hi"}
+
+
+def test_off_disables_the_cache(cache, monkeypatch):
+    monkeypatch.setenv(stt_cache.CACHE_DIR_ENV, "off")
+    assert stt_cache.key_for(None, PARAMS, SHA) is None
+    assert stt_cache.content_key(None, PARAMS, SHA)              # journaling still gets a key
+    stt_cache.put(None, {"text": "hi"})
+    assert stt_cache.get(None) is None
+
+
+def test_keys_cover_audio_and_params(cache):
+    base = stt_cache.content_key(None, PARAMS, SHA)
+    assert stt_cache.content_key(None, PARAMS, "b" * 64) != base
+    assert stt_cache.content_key(None, {**PARAMS, "speaker_labels": True}, SHA) != base
+    assert stt_cache.content_key(None, dict(reversed(list(PARAMS.items()))), SHA) == base
+
+
+def test_keys_depend_on_the_upload_codec(cache, monkeypatch):
+    flac = stt_cache.content_key(None, PARAMS, SHA)
+    monkeypatch.setenv("AAI_UPLOAD_CODEC", "opus")
+    opus32 = stt_cache.content_key(None, PARAMS, SHA)
+    monkeypatch.setenv("AAI_UPLOAD_OPUS_KBPS", "16")
+    opus16 = stt_cache.content_key(None, PARAMS, SHA)
+    monkeypatch.setenv("AAI_UPLOAD_CODEC", "raw")
+    raw = stt_cache.content_key(None, PARAMS, SHA)
+    assert len({flac, opus32, opus16, raw}) == 4
+    # other providers are not affected by the AssemblyAI upload codec
+    other = {"provider": "whisper"}
+    monkeypatch.setenv("AAI_UPLOAD_CODEC", "flac")
+    assert stt_cache.content_key(None, other, SHA) == stt_cache.content_key(None, other, SHA)
+
+
+def test_evict_drops_least_recently_used_first(cache):
+    keys = [stt_cache.content_key(None, PARAMS, c * 64) for c in "abc"]
+    now = time.time()
+    for i, k in enumerate(keys):
+        stt_cache.put(k, {"text": "x" * 1000})
+        os.utime(stt_cache._path(k), (now - 100 + i, now - 100 + i))
+    stt_cache.get(keys[0])                                       # refreshes the oldest entry
+    size = stt_cache._path(keys[0]).stat().st_size
+    assert stt_cache.evict(cache, max_bytes=2 * size) == 1
+    assert [stt_cache.get(k) is not None for k in keys] == [True, False, True]
+
+
+def test_put_evicts_to_the_configured_budget(cache, monkeypatch):
+    monkeypatch.setenv(stt_cache.CACHE_MB_ENV, "0")
+    k = stt_cache.content_key(None, PARAMS, SHA)
+    stt_cache.put(k, {"text": "hi"})
+    assert stt_cache.get(k) is None
+
+
+def test_seen_marks_exact_audio_bytes(cache):
+    assert not stt_cache.seen(SHA)
+    stt_cache.put(stt_cache.content_key(None, PARAMS, SHA), {"text": "hi"}, SHA)
+    assert stt_cache.seen(SHA) and stt_cache.seen(SHA, cache)
+    assert not stt_cache.seen("b" * 64)
@@ -0,0 +1,143 @@
+import pytest
+
+import aai_client
+import stt_journal
+
+
+K = "acct:k"                                        # the journal key of "k" under FakeAAI's API key
+
+
+class FakeAAI:
+    key_id = "acct"
+
+    def __init__(self, statuses):
+        self.statuses = statuses                    # transcript id -> status, or an AAIError
+
+    def get_transcript(self, tid):
+        s = self.statuses[tid]
+        if isinstance(s, Exception):
+            raise s
+        return {"id": tid, "status": s}
+
+
+class Steps:
+    def __init__(self):
+        self.calls = []
+
+    def upload(self):
+        self.calls.append("upload")
+        return "https://cdn/upload"
+
+    def create(self, url):
+        self.calls.append(("create", url))
+        return "t-new"
+
+    def wait(self, tid):
+        self.calls.append(("wait", tid))
+        return {"id": tid, "status": "completed"}
+
+    def run(self, aai, key="k"):
+        return stt_journal.transcribe(aai, key, self.upload, self.create, self.wait, log=lambda m: None)
+
+
+@pytest.fixture
+def journal(tmp_path, monkeypatch):
+    monkeypatch.setenv(stt_journal.JOURNAL_ENV, str(tmp_path / "journal.db"))
+    return stt_journal.journal()
+
+
+def test_fresh_run_is_journaled_and_cleared(journal):
+    steps = Steps()
+    assert steps.run(FakeAAI({}))["id"] == "t-new"
+    assert steps.calls == ["upload", ("create", "https://cdn/upload"), ("wait", "t-new")]
+    assert journal.get(K) is None and journal.in_flight() == []
+
+
+def test_resumes_a_queued_transcript(journal):
+    journal.uploaded(K, "https://cdn/old")
+    journal.queued(K, "t-old")
+    assert [e.transcript_id for e in journal.in_flight()] == ["t-old"]
+    steps = Steps()
+    assert steps.run(FakeAAI({"t-old": "processing"}))["id"] == "t-old"
+    assert steps.calls == [("wait", "t-old")]
+    assert journal.get(K) is None
+
+
+@pytest.mark.parametrize("status", ["error", aai_client.AAIError("poll", 404, "not found")])
+def test_failed_or_missing_transcript_starts_over_with_the_upload(journal, status):
+    journal.uploaded(K, "https://cdn/old")
+    journal.queued(K, "t-old")
+    steps = Steps()
+    steps.run(FakeAAI({"t-old": status}))
+    # the transcript is gone, so the upload is not trusted either
+    assert steps.calls == ["upload", ("create", "https://cdn/upload"), ("wait", "t-new")]
+
+
+def test_reuses_a_fresh_upload(journal):
+    journal.uploaded(K, "https://cdn/old")
+    steps = Steps()
+    steps.run(FakeAAI({}))
+    assert steps.calls == [("create", "https://cdn/old"), ("wait", "t-new")]
+
+
+def test_stale_upload_is_redone(journal, monkeypatch):
+    journal.uploaded(K, "https://cdn/old")
+    monkeypatch.setattr(stt_journal, "UPLOAD_URL_TTL_SEC", -1)
+    steps = Steps()
+    steps.run(FakeAAI({}))
+    assert steps.calls[0] == "upload"
+
+
+def test_server_errors_while_checking_propagate(journal):
+    journal.uploaded(K, "https://cdn/old")
+    journal.queued(K, "t-old")
+    with pytest.raises(aai_client.AAIError):
+        Steps().run(FakeAAI({"t-old": aai_client.AAIError("poll", 500, "boom")}))
+    assert journal.get(K).transcript_id == "t-old"
+
+
+def test_interrupted_wait_stays_in_flight(journal):
+    steps = Steps()
+
+    def crash(tid):
+        raise KeyboardInterrupt
+    with pytest.raises(KeyboardInterrupt):
+        stt_journal.transcribe(FakeAAI({}), "k", steps.upload, steps.create, crash, log=lambda m: None)
+    [entry] = journal.in_flight()
+    assert (entry.stage, entry.transcript_id, entry.upload_url) == ("queued", "t-new", "https://cdn/upload")
+
+
+class Refusing(Steps):
+    def create(self, url):
+        if url == "https://cdn/old":
+            self.calls.append(("create", url))
+            raise aai_client.AAIError("create", 400, "upload not found")
+        return super().create(url)
+
+
+def test_refused_reused_upload_is_dropped_and_redone(journal):
+    journal.uploaded(K, "https://cdn/old")
+    steps = Refusing()
+    assert steps.run(FakeAAI({}))["id"] == "t-new"
+    assert steps.calls == [("create", "https://cdn/old"), "upload",
+                           ("create", "https://cdn/upload"), ("wait", "t-new")]
+    assert journal.in_flight() == []
+
+
+def test_refused_fresh_upload_propagates(journal):
+    class Broken(Steps):
+        def create(self, url):
+            raise aai_client.AAIError("create", 400, "bad request")
+    with pytest.raises(aai_client.AAIError):
+        Broken().run(FakeAAI({}))
+    assert journal.get(K).stage == "uploaded"
+
+
+def test_entries_are_scoped_to_the_account(journal):
+    journal.uploaded(K, "https://cdn/old")
+    other = FakeAAI({})
+    other.key_id = "other"
+    steps = Steps()
+    steps.run(other)
+    assert steps.calls[0] == "upload"
+    assert journal.get(K).upload_url == "https://cdn/old"
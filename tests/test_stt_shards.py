@@ -0,0 +1,102 @@
+import numpy as np
+import pytest
+
+import stt_shards
+from stt_shards import Shard
+
+# 20 s recording cut at 10 s with 2 s of overlap: shard 1's audio starts at 8 s.
+PLAN = [Shard(0, 0.0, 12.0, 0.0, 10.0), Shard(1, 8.0, 20.0, 10.0, 20.0)]
+
+
+def w(text, start, end, **extra):
+    return {"text": text, "start": start, "end": end, **extra}
+
+
+def texts(js):
+    return [x["text"] for x in js["words"]]
+
+
+def test_words_are_shifted_onto_the_original_timeline():
+    parts = [{"id": "t0", "words": [w("one", 1000, 1400)]},
+             {"id": "t1", "words": [w("two", 5000, 5400)]}]
+    js = stt_shards.stitch(parts, PLAN)
+    assert js["words"] == [w("one", 1000, 1400), w("two", 13000, 13400)]
+    assert js["text"] == "one two"
+    assert js["shards"] == [{"id": "t0", "start": 0.0, "end": 12.0}, {"id": "t1", "start": 8.0, "end": 20.0}]
+    assert js["audio_duration"] == 20.0
+
+
+def test_overlap_words_come_from_the_shard_owning_their_midpoint():
+    # Both shards hear "a" (9.0 s) and "b" (11.0 s) in the overlap.
+    parts = [{"words": [w("a", 9000, 9400), w("b", 11000, 11400)]},
+             {"words": [w("a", 1000, 1400), w("b", 3000, 3400)]}]
+    assert texts(stt_shards.stitch(parts, PLAN)) == ["a", "b"]
+
+
+def test_word_at_cut_kept_by_both_shards_appears_once():
+    # Shard 0 times "cut" with its midpoint at 9.95 s, shard 1 at 10.1 s.
+    parts = [{"words": [w("a", 9000, 9400), w("cut", 9700, 10200)]},
+             {"words": [w("Cut,", 1850, 2350), w("b", 2600, 3000)]}]
+    assert texts(stt_shards.stitch(parts, PLAN)) == ["a", "cut", "b"]
+
+
+def test_word_at_cut_dropped_by_both_shards_is_kept_once():
+    # Shard 0 puts the midpoint at 10.05 s, shard 1 at 9.975 s: each leaves it to the other.
+    parts = [{"words": [w("a", 9000, 9400), w("cut", 9850, 10250)]},
+             {"words": [w("cut", 1750, 2200), w("b", 2600, 3000)]}]
+    js = stt_shards.stitch(parts, PLAN)
+    assert texts(js) == ["a", "cut", "b"]
+    assert js["words"][1]["start"] in (9750, 9850)
+
+
+def test_neighbouring_words_touching_the_cut_are_not_merged():
+    parts = [{"words": [w("the", 9500, 9990)]},
+             {"words": [w("the", 1990, 2400)]}]          # the same text, but the next word in time
+    assert texts(stt_shards.stitch(parts, PLAN)) == ["the", "the"]
+
+
+def test_utterances_are_shifted_and_kept_by_midpoint():
+    utt0 = {"speaker": "A", "text": "hello", "start": 500, "end": 2000, "words": [w("hello", 500, 2000)]}
+    utt_overlap = {"speaker": "B", "text": "echo", "start": 500, "end": 1000, "words": [w("echo", 500, 1000)]}
+    utt1 = {"speaker": "B", "text": "there", "start": 4000, "end": 6000, "words": [w("there", 4000, 6000)]}
+    js = stt_shards.stitch([{"utterances": [utt0]}, {"utterances": [utt_overlap, utt1]}], PLAN)
+    assert [u["text"] for u in js["utterances"]] == ["hello", "there"]
+    assert (js["utterances"][1]["start"], js["utterances"][1]["end"]) == (12000, 14000)
+    assert js["utterances"][1]["words"][0]["start"] == 12000
+
+
+def test_confidence_is_weighted_by_shard_duration():
+    plan = [Shard(0, 0.0, 6.0, 0.0, 4.0), Shard(1, 2.0, 20.0, 4.0, 20.0)]
+    js = stt_shards.stitch([{"confidence": 0.5}, {"confidence": 1.0}], plan)
+    assert js["confidence"] == pytest.approx((0.5 * 4 + 1.0 * 16) / 20)
+
+
+def test_other_fields_come_from_the_first_shard():
+    parts = [{"id": "t0", "language_code": "en_us", "punctuate": True, "audio_url": "u0"},
+             {"id": "t1", "language_code": "en_us", "audio_url": "u1"}]
+    js = stt_shards.stitch(parts, PLAN)
+    assert js["language_code"] == "en_us" and js["punctuate"] is True
+    assert "audio_url" not in js and "id" not in js
+    assert js["utterances"] is None and js["confidence"] is None
+
+
+def test_count_respects_the_minimum_shard_length():
+    assert stt_shards.count(100, 4) == 1
+    assert stt_shards.count(stt_shards.MIN_SHARD_SEC * 2.5, 4) == 2
+    assert stt_shards.count(stt_shards.MIN_SHARD_SEC * 10, 4) == 4
+
+
+def test_plan_cuts_in_silence_and_covers_the_recording():
+    pytest.importorskip("librosa")
+    sr = stt_shards.SAMPLE_RATE
+    total = int(stt_shards.MIN_SHARD_SEC * 2) * sr
+    rng = np.random.default_rng(0)
+    y = 0.3 * rng.standard_normal(total).astype(np.float32)
+    gap = slice(int(total * 0.55), int(total * 0.55) + 2 * sr)   # the only pause, near the even cut
+    y[gap] = 0.0
+    plan = stt_shards.plan(y, 2)
+    assert [sh.index for sh in plan] == [0, 1]
+    assert plan[0].keep_from == 0.0 and plan[-1].keep_to == pytest.approx(total / sr)
+    assert plan[0].keep_to == plan[1].keep_from
+    assert gap.start / sr <= plan[0].keep_to <= gap.stop / sr
+    assert plan[1].start == pytest.approx(plan[1].keep_from - stt_shards.OVERLAP_SEC)
@@ -13,10 +13,14 @@ export async function POST(req: NextRequest) {
     // ---- call the FastAPI backend ----------------------------------------
     const backend = process.env.BACKEND_URL || "http://127.0.0.1:5057"
     const url = `${backend}/analyze/${type}`
+    const headers: Record<string, string> = {}
+    const idempotencyKey = req.headers.get("idempotency-key")
+    if (idempotencyKey) headers["idempotency-key"] = idempotencyKey
 
       const upstream = await fetch(url, {
       method: "POST",
       body: formData as any,
+      headers,
       // @ts-expect-error  ── Node fetch needs this, but TS types don’t know yet
       duplex: "half",
   })
@@ -22,8 +22,10 @@ import { Card, CardContent, CardDescription, CardHeader, CardTitle } from "@/com
 /* ----------------------------------------------------------------------------
    Utils
 ---------------------------------------------------------------------------- */
-async function postForm(url: string, form: FormData) {
-  const res = await fetch(url, { method: "POST", body: form })
+async function postForm(url: string, form: FormData, idempotencyKey?: string) {
+  const headers: Record<string, string> = {}
+  if (idempotencyKey) headers["idempotency-key"] = idempotencyKey
+  const res = await fetch(url, { method: "POST", body: form, headers })
   if (!res.ok) {
     const msg = await res.text().catch(() => res.statusText)
     throw new Error(msg || "Request failed")
@@ -83,6 +85,14 @@ export default function PlaygroundPage() {
   // keep a copy so "View Results" never re-runs
   const [lastResult, setLastResult] = useState<any | null>(null)
 
+  // Idempotency-Key for the current submission: reused when a failed run is
+  // retried (so it attaches to the job already started), new once the file or
+  // form changes or the previous run finished
+  const submissionKey = useRef<string | null>(null)
+  useEffect(() => {
+    submissionKey.current = null
+  }, [file, apiKeys, debateMeta])
+
   /* ---------------------------   HELPERS   --------------------------- */
   const canAnalyze = useMemo(() => !!file && canNext, [file, canNext])
 
@@ -166,7 +176,9 @@ export default function PlaygroundPage() {
       form.append("first", debateMeta.first)
       form.append("model", "openai/gpt-4o-2024-11-20")
 
-      const data = await postForm("/api/analyze?type=debate", form)
+      if (!submissionKey.current) submissionKey.current = crypto.randomUUID()
+      const data = await postForm("/api/analyze?type=debate", form, submissionKey.current)
+      submissionKey.current = null
 
       stopTicker(true)
       appendLog("Completed ✓")
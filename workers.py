@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+workers.py
+──────────
+Warm worker pool for server.py.
+
+Spawning `python -u AnalyzeDebateV2.py …` per request re-imports numpy,
+librosa, openai and requests every time.  Instead we start a few long-lived
+worker processes that import the pipelines once and then run their `main(argv)`
+entry points on demand.
+
+• Each task's stdout/stderr (including any helper subprocesses it starts) is
+  captured at the file-descriptor level and streamed back line by line.
+• A worker retires itself after VOCIUS_WORKER_MAX_JOBS tasks or once its RSS
+  passes VOCIUS_WORKER_MAX_RSS_MB; the pool replaces it with a fresh one.
+• Killing a worker (job cancel) is safe: the pool notices and respawns.
+"""
+
+from __future__ import annotations
+
+import importlib
+import multiprocessing as mp
+import os
+import queue
+import resource
+import sys
+import threading
+import traceback
+from collections import deque
+from pathlib import Path
+from typing import Callable, Deque, Dict, List, Optional
+
+from jobs import ProcResult, JOB_TAIL_LINES
+
+WORKER_MAX_JOBS   = int(os.getenv("VOCIUS_WORKER_MAX_JOBS", "50"))
+WORKER_MAX_RSS_MB = int(os.getenv("VOCIUS_WORKER_MAX_RSS_MB", "2048"))
+WORKER_START      = os.getenv("VOCIUS_WORKER_START", "spawn")   # spawn | forkserver | fork
+
+# entry name → module whose main(argv) runs it
+ENTRY_POINTS: Dict[str, str] = {
+    "debate":  "AnalyzeDebateV2",
+    "speech":  "AnalyzeSpeechV2",
+    "diarize": "RunDiarizationAAI",
+}
+
+_END = "\x00vocius-task-end"
+
+
+# ───────────────────────────── worker side ─────────────────────────────
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except Exception:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024   # peak, KiB on Linux
+
+def _exit_code(e: SystemExit) -> int:
+    if e.code is None:
+        return 0
+    if isinstance(e.code, int):
+        return e.code
+    print(e.code, file=sys.stderr, flush=True)   # mirror the interpreter: message → stderr, rc 1
+    return 1
+
+def _forward(fd: int, tag: str, send: Callable, done: threading.Event) -> None:
+    with open(fd, "r", encoding="utf-8", errors="replace", closefd=False) as stream:
+        for raw in stream:
+            line = raw.rstrip("\n")
+            if line == _END:
+                done.set()
+            else:
+                send((tag, line))
+
+def _worker_main(conn, max_jobs: int, max_rss_mb: int) -> None:
+    # Import the pipelines (and with them numpy/librosa/openai/requests) once.
+    modules, import_errors = {}, {}
+    for entry, mod in ENTRY_POINTS.items():
+        try:
+            modules[entry] = importlib.import_module(mod)
+        except Exception as e:
+            import_errors[entry] = repr(e)
+
+    # Route fds 1/2 through pipes so helper subprocesses are captured too.
+    send_lock = threading.Lock()
+    def send(msg):
+        with send_lock:
+            conn.send(msg)
+
+    ends = {}
+    for fd, tag in ((1, "out"), (2, "err")):
+        r, w = os.pipe()
+        os.dup2(w, fd)
+        os.close(w)
+        ends[tag] = threading.Event()
+        threading.Thread(target=_forward, args=(r, tag, send, ends[tag]), daemon=True).start()
+    sys.stdout = open(1, "w", buffering=1, encoding="utf-8", closefd=False)
+    sys.stderr = open(2, "w", buffering=1, encoding="utf-8", closefd=False)
+
+    done_jobs = 0
+    while True:
+        try:
+            entry, argv, env, cwd = conn.recv()
+        except (EOFError, OSError):
+            return
+        saved_env, saved_cwd = dict(os.environ), os.getcwd()
+        rc = 0
+        try:
+            os.environ.update(env or {})
+            if cwd:
+                os.chdir(cwd)
+            if entry not in modules:
+                raise RuntimeError(f"entry point {entry!r} unavailable: {import_errors.get(entry, 'unknown')}")
+            modules[entry].main(list(argv))
+        except SystemExit as e:
+            rc = _exit_code(e)
+        except BaseException:
+            traceback.print_exc()
+            rc = 1
+        finally:
+            os.environ.clear(); os.environ.update(saved_env)
+            os.chdir(saved_cwd)
+        for tag, stream in (("out", sys.stdout), ("err", sys.stderr)):
+            stream.flush()
+            stream.write(_END + "\n"); stream.flush()
+            ends[tag].wait(); ends[tag].clear()
+        done_jobs += 1
+        retire = done_jobs >= max_jobs or _rss_mb() > max_rss_mb
+        send(("exit", rc, retire))
+        if retire:
+            return
+
+
+# ───────────────────────────── parent side ─────────────────────────────
+
+class _Worker:
+    def __init__(self, ctx, max_jobs: int, max_rss_mb: int):
+        self.conn, child = ctx.Pipe()
+        self.proc = ctx.Process(target=_worker_main, args=(child, max_jobs, max_rss_mb),
+                                name="vocius-worker", daemon=True)
+        self.proc.start()
+        child.close()
+
+    # poll/terminate let a Job treat a leased worker like a Popen handle
+    def poll(self) -> Optional[int]:
+        return None if self.proc.is_alive() else self.proc.exitcode
+
+    def terminate(self) -> None:
+        if self.proc.is_alive():
+            self.proc.kill()
+
+    def close(self) -> None:
+        self.terminate()
+        self.proc.join(timeout=5)
+        self.conn.close()
+
+
+class WorkerPool:
+    def __init__(self, size: int, max_jobs: int = WORKER_MAX_JOBS,
+                 max_rss_mb: int = WORKER_MAX_RSS_MB, start_method: str = WORKER_START):
+        self.size = max(1, size)
+        self.max_jobs = max_jobs
+        self.max_rss_mb = max_rss_mb
+        self._ctx = mp.get_context(start_method)
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._all: List[_Worker] = []
+        self._lock = threading.Lock()
+        self.recycled = 0
+
+    def start(self) -> None:
+        for _ in range(self.size):
+            self._idle.put(self._spawn())
+
+    def shutdown(self) -> None:
+        with self._lock:
+            workers, self._all = self._all, []
+        for w in workers:
+            w.close()
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": self.size, "idle": self._idle.qsize(), "recycled": self.recycled}
+
+    def run(self, entry: str, argv: List[str], env: Optional[Dict[str, str]] = None,
+            cwd: Optional[Path] = None, on_line: Optional[Callable[[str], None]] = None,
+            on_start: Optional[Callable[[_Worker], None]] = None) -> ProcResult:
+        """Run ENTRY_POINTS[entry].main(argv) on an idle worker, blocking until it returns."""
+        w = self._idle.get()
+        if w.poll() is not None:
+            w = self._replace(w)
+        out_tail: Deque[str] = deque(maxlen=JOB_TAIL_LINES)
+        err_tail: Deque[str] = deque(maxlen=JOB_TAIL_LINES)
+        rc, retire, dispatched, finished = -9, False, False, False
+        try:
+            if on_start is not None:
+                on_start(w)
+            w.conn.send((entry, list(argv), dict(env or {}), str(cwd) if cwd else None))
+            dispatched = True
+            while True:
+                try:
+                    msg = w.conn.recv()
+                except (EOFError, OSError):
+                    err_tail.append("worker process exited unexpectedly")
+                    w.proc.join(timeout=5)
+                    rc = w.proc.exitcode if w.proc.exitcode is not None else -9
+                    retire = True
+                    break
+                if msg[0] == "out":
+                    out_tail.append(msg[1])
+                    if on_line is not None:
+                        on_line(msg[1])
+                elif msg[0] == "err":
+                    err_tail.append(msg[1])
+                elif msg[0] == "exit":
+                    rc, retire = msg[1], msg[2]
+                    break
+            finished = True
+        finally:
+            # a worker abandoned mid-task may still be running it: never hand it out again
+            if retire or (dispatched and not finished) or w.poll() is not None:
+                w = self._replace(w)
+            self._idle.put(w)
+        return ProcResult(rc, "\n".join(out_tail), "\n".join(err_tail))
+
+    def _spawn(self) -> _Worker:
+        w = _Worker(self._ctx, self.max_jobs, self.max_rss_mb)
+        with self._lock:
+            self._all.append(w)
+        return w
+
+    def _replace(self, w: _Worker) -> _Worker:
+        w.close()
+        with self._lock:
+            if w in self._all:
+                self._all.remove(w)
+            self.recycled += 1
+        return self._spawn()